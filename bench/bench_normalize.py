@@ -0,0 +1,82 @@
+"""分辨率归一化的基准测试：预处理与描摹的耗时、内存随扫描分辨率的变化
+
+用法：python ./bench/bench_normalize.py [--image-dir ./images/test1-number] [--scales 1 4 12] [--normalize 256]
+
+把样例图像按各倍数放大（模拟不同 DPI 的扫描件），分别在不归一化与 --normalize 下逐字形处理，
+打印每字形的预处理、描摹耗时与二值化图像大小；再把生成的字体与原始分辨率的源图比较（见 fidelity），
+确认归一化后的字形与不归一化时一致。
+"""
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from main import process_glyph, list_images
+from preprocess import set_normalize_size
+from generate_font import build_font
+from fidelity import open_font, check_chunk, char_code_from_name
+from fontTools.ttLib import TTFont
+
+def scale_images(image_dir, scale, output_dir):
+    """把 image_dir 中的 PNG 放大 scale 倍写入 output_dir"""
+    os.makedirs(output_dir, exist_ok=True)
+    for image_filename in list_images(image_dir):
+        img = cv2.imread(os.path.join(image_dir, image_filename), cv2.IMREAD_UNCHANGED)
+        if scale != 1:
+            img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+        cv2.imwrite(os.path.join(output_dir, image_filename), img)
+
+def run(input_dir, normalize, font_path):
+    """逐字形处理并写出字体，返回 {阶段: 每字形平均毫秒}、二值化图像的最大字节数"""
+    set_normalize_size(normalize)
+    seconds = {'preprocess': 0.0, 'trace': 0.0}
+    largest = 0
+    entries = []
+    image_filenames = list_images(input_dir)
+    for image_filename in image_filenames:
+        _, entry, records = process_glyph(input_dir, image_filename, instrument=True)
+        for record in records:
+            if record['stage'] in seconds:
+                seconds[record['stage']] += record['seconds']
+            if record['stage'] == 'preprocess':
+                largest = max(largest, record['bytes'])
+        if entry:
+            entries.append(entry)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        build_font(entries, font_path)
+    return {stage: total * 1000 / len(image_filenames) for stage, total in seconds.items()}, largest
+
+def fidelity_iou(font_path, source_dir):
+    """字体中各字形与原始分辨率源图的 IoU"""
+    cmap = TTFont(font_path, lazy=True).getBestCmap()
+    items = [(os.path.join(source_dir, f), cmap[char_code_from_name(os.path.splitext(f)[0])])
+             for f in list_images(source_dir)]
+    open_font(font_path)
+    return check_chunk(items)[0]
+
+def main(image_dir, scales, normalize):
+    print(f"{'scale':>6}{'normalize':>11}{'preprocess ms':>15}{'trace ms':>10}{'bitmap KB':>11}"
+          f"{'median IoU':>12}{'min IoU':>9}")
+    with tempfile.TemporaryDirectory() as work_dir:
+        for scale in scales:
+            input_dir = os.path.join(work_dir, f'x{scale}')
+            scale_images(image_dir, scale, input_dir)
+            for size in (0, normalize):
+                font_path = os.path.join(work_dir, f'x{scale}-{size}.ttf')
+                milliseconds, largest = run(input_dir, size, font_path)
+                iou = fidelity_iou(font_path, image_dir)
+                print(f"{scale:>6}{size or 'off':>11}{milliseconds['preprocess']:>15.1f}{milliseconds['trace']:>10.1f}"
+                      f"{largest / 1024:>11.0f}{np.median(iou):>12.3f}{iou.min():>9.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark resolution normalization across scan sizes.")
+    parser.add_argument('--image-dir', type=str, default='./images/test1-number', help='Directory of glyph images')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 4, 12], help='Upscaling factors to simulate')
+    parser.add_argument('--normalize', type=int, default=256, help='Ink box size in pixels')
+    args = parser.parse_args()
+    main(args.image_dir, args.scales, args.normalize)
@@ -0,0 +1,112 @@
+"""轮廓格式基准测试：三次曲线 glyf（truetype）、CFF，以及作为对照的二次曲线 glyf
+
+用法：python ./bench/bench_outline_formats.py [--glyphs 1000] [--sizes 16 48] [-o results.json]
+
+字形由 bench_pipeline 的合成图像经同一条流水线（预处理、描摹、svg_to_glyph）得到，只做一次，
+然后分别以各格式组装并保存字体，比较构建耗时、文件大小、轮廓点数，
+以及用 Pillow（FreeType）在给定字号下栅格化全部字形的耗时。
+二次曲线对照用 cu2qu 在 1 个字体单位的误差内转换，对应不支持三次 glyf 的旧渲染器所需的兼容输出。
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+from fontTools.pens.cu2quPen import Cu2QuPen
+from fontTools.pens.recordingPen import RecordingPen
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+from fontTools.ttLib import TTFont
+from PIL import ImageFont
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import main as pipeline
+from generate_font import build_font
+from bench_pipeline import generate_images, git_revision
+
+# cu2qu 转换允许的最大误差（字体单位）
+QUADRATIC_MAX_ERR = 1.0
+# 每种格式构建与栅格化的重复次数，取最小值
+REPEATS = 3
+
+def to_quadratic(glyph):
+    """三次曲线 glyf 字形转换为二次曲线"""
+    pen = TTGlyphPen(None)
+    glyph.draw(Cu2QuPen(pen, QUADRATIC_MAX_ERR, reverse_direction=False), None)
+    return pen.glyph()
+
+def count_points(font_path):
+    """字体中全部字形的轮廓点数（含控制点）"""
+    font = TTFont(font_path)
+    glyph_set = font.getGlyphSet()
+    total = 0
+    for glyph_name in font.getGlyphOrder():
+        pen = RecordingPen()
+        glyph_set[glyph_name].draw(pen)
+        total += sum(len(args) for _, args in pen.value)
+    return total
+
+def rasterize(font_path, chars, size):
+    """以 FreeType 在 size 像素下栅格化每个字符，返回总耗时（秒）"""
+    font = ImageFont.truetype(font_path, size)
+    start = time.perf_counter()
+    for char in chars:
+        font.getmask(char)
+    return time.perf_counter() - start
+
+def make_entries(count, seed):
+    with tempfile.TemporaryDirectory() as image_dir, open(os.devnull, 'w') as devnull, \
+            contextlib.redirect_stdout(devnull):
+        generate_images(image_dir, count, seed)
+        entries = []
+        for filename in pipeline.list_images(image_dir):
+            _, entry, _ = pipeline.process_glyph(image_dir, filename)
+            if entry:
+                entries.append(entry)
+    return entries
+
+def main(count, sizes, seed, output_path):
+    entries = make_entries(count, seed)
+    chars = [chr(char_code) for _, char_code, _ in entries]
+    variants = {
+        'truetype': (entries, 'truetype', '.ttf'),
+        'cff': (entries, 'cff', '.otf'),
+        'truetype_quadratic': ([(name, code, to_quadratic(glyph)) for name, code, glyph in entries], 'truetype', '.ttf'),
+    }
+    results = {'revision': git_revision(), 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+               'glyphs': len(entries), 'seed': seed, 'formats': {}}
+    print(f"{'format':<20}{'build s':>10}{'bytes':>10}{'points':>10}" + ''.join(f"{f'raster {s}px s':>16}" for s in sizes))
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name, (variant_entries, outline_format, extension) in variants.items():
+            font_path = os.path.join(work_dir, f'bench{extension}')
+            build_seconds = []
+            for _ in range(REPEATS):
+                start = time.perf_counter()
+                with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                    build_font(variant_entries, font_path, outline_format)
+                build_seconds.append(time.perf_counter() - start)
+            result = {
+                'build_seconds': round(min(build_seconds), 4),
+                'font_bytes': os.path.getsize(font_path),
+                'points': count_points(font_path),
+                'raster_seconds': {size: round(min(rasterize(font_path, chars, size) for _ in range(REPEATS)), 4)
+                                   for size in sizes},
+            }
+            results['formats'][name] = result
+            print(f"{name:<20}{result['build_seconds']:>10.3f}{result['font_bytes']:>10}{result['points']:>10}"
+                  + ''.join(f"{result['raster_seconds'][s]:>16.4f}" for s in sizes))
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output_path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare TrueType and CFF outline output.")
+    parser.add_argument('--glyphs', type=int, default=1000, help='Number of synthetic glyphs')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[16, 48], help='Pixel sizes for rasterization')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the synthetic glyphs')
+    parser.add_argument('-o', '--output', type=str, default='bench_outline_formats.json', help='Output JSON file')
+    args = parser.parse_args()
+    main(args.glyphs, args.sizes, args.seed, args.output)
@@ -0,0 +1,182 @@
+"""图像 → 字体流水线的规模基准测试
+
+用法：python ./bench/bench_pipeline.py [--sizes 100 1000 10000] [--tracer potrace] [--cache DIR] [-o results.json]
+
+按给定规模生成合成字形 PNG（多种笔画风格与分辨率），分阶段计时：
+preprocess（preprocess_image_otsu）、trace（描摹后端）、convert_svg（svg_to_path_data）、
+svg_to_glyph 与 font（FontBuilder 设置与保存），并以 main.main 跑一遍完整流水线。
+每个规模在独立进程中运行，结果（吞吐量、单字形 p50/p95 延迟、峰值内存）写入 JSON 文件。
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import resource
+import main as pipeline
+from preprocess import preprocess_image_otsu
+from convert_svg import svg_to_path_data
+from tracer import TRACERS
+from generate_font import svg_to_glyph, glyph_name_for, build_font, build_font_streaming
+from cache import GlyphCache
+
+# 合成字形的分辨率与笔画风格
+RESOLUTIONS = (128, 256, 512)
+STYLES = ('pen', 'brush', 'outline')
+# 合成字形使用的起始编码（CJK 统一表意文字）
+FIRST_CHAR_CODE = 0x4E00
+
+def make_glyph_image(index, rng):
+    """生成一张白底黑字的合成字形图像：若干随机笔画，风格与分辨率按序号轮换"""
+    size = RESOLUTIONS[index % len(RESOLUTIONS)]
+    style = STYLES[(index // len(RESOLUTIONS)) % len(STYLES)]
+    image = Image.new('RGB', (size, size), 'white')
+    draw = ImageDraw.Draw(image)
+    margin = size // 8
+    for _ in range(rng.integers(3, 8)):
+        points = [tuple(p) for p in rng.integers(margin, size - margin, size=(rng.integers(2, 5), 2)).tolist()]
+        if style == 'pen':
+            draw.line(points, fill='black', width=max(2, size // 40))
+        elif style == 'brush':
+            width = int(rng.integers(size // 24, size // 10))
+            draw.line(points, fill='black', width=width, joint='curve')
+            for x, y in points:
+                draw.ellipse((x - width // 2, y - width // 2, x + width // 2, y + width // 2), fill='black')
+        else:
+            (x0, y0), (x1, y1) = points[0], points[-1]
+            box = (min(x0, x1), min(y0, y1), max(x0, x1) + 4, max(y0, y1) + 4)
+            draw.ellipse(box, outline='black', width=max(3, size // 30))
+    # 模拟扫描件的边缘模糊
+    return image.filter(ImageFilter.GaussianBlur(size / 256))
+
+def generate_images(image_dir, count, seed=0):
+    rng = np.random.default_rng(seed)
+    for index in range(count):
+        make_glyph_image(index, rng).save(os.path.join(image_dir, f'{chr(FIRST_CHAR_CODE + index)}.png'))
+
+def peak_rss_mb():
+    # Linux 上 ru_maxrss 以 KB 为单位，macOS 上以字节为单位
+    unit = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / (1024 * 1024)
+
+def summarize(latencies, count, elapsed=None):
+    """由单字形耗时（秒）计算吞吐量与 p50/p95 延迟（毫秒）"""
+    elapsed = sum(latencies) if elapsed is None else elapsed
+    result = {'seconds': round(elapsed, 4), 'glyph_per_s': round(count / elapsed, 1) if elapsed else None}
+    if latencies:
+        result['p50_ms'] = round(float(np.percentile(latencies, 50)) * 1000, 3)
+        result['p95_ms'] = round(float(np.percentile(latencies, 95)) * 1000, 3)
+    return result
+
+def run_size(count, tracer, cache_dir, jobs, seed):
+    """在独立进程中跑一个规模，返回该规模的结果字典"""
+    stages = {}
+    with tempfile.TemporaryDirectory() as work_dir, open(os.devnull, 'w') as devnull, \
+            contextlib.redirect_stdout(devnull):
+        image_dir = os.path.join(work_dir, 'images')
+        os.makedirs(image_dir)
+        generate_images(image_dir, count, seed)
+        filenames = pipeline.list_images(image_dir)
+
+        timings = {name: [] for name in ('preprocess', 'trace', 'convert_svg', 'svg_to_glyph')}
+        entries = []
+        for filename in filenames:
+            start = time.perf_counter()
+            img_np = preprocess_image_otsu(os.path.join(image_dir, filename))
+            timings['preprocess'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            svg_content = TRACERS[tracer](img_np)
+            timings['trace'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            path_data = svg_to_path_data(svg_content)
+            timings['convert_svg'].append(time.perf_counter() - start)
+
+            char = os.path.splitext(filename)[0]
+            start = time.perf_counter()
+            glyph = svg_to_glyph(path_data, ord(char)) if len(path_data.ops) else None
+            timings['svg_to_glyph'].append(time.perf_counter() - start)
+            if glyph:
+                entries.append((glyph_name_for(char, ord(char)), ord(char), glyph))
+        for name, latencies in timings.items():
+            stages[name] = summarize(latencies, count)
+
+        font_path = os.path.join(work_dir, 'bench.ttf')
+        start = time.perf_counter()
+        build_font(entries, font_path)
+        stages['font'] = summarize([], count, time.perf_counter() - start)
+        font_bytes = os.path.getsize(font_path)
+
+        start = time.perf_counter()
+        build_font_streaming(iter(entries), font_path)
+        stages['font_large_charset'] = summarize([], count, time.perf_counter() - start)
+        del entries
+
+        # 完整流水线（含进程池与缓存），缓存目录给定时再跑一遍以测量热缓存
+        runs = [('pipeline', None)] if cache_dir is None else [('pipeline_cold', cache_dir), ('pipeline_warm', cache_dir)]
+        for name, directory in runs:
+            cache = GlyphCache(directory) if directory else None
+            start = time.perf_counter()
+            pipeline.main(image_dir, font_path, jobs=jobs, cache=cache, tracer=tracer)
+            stages[name] = summarize([], count, time.perf_counter() - start)
+
+    return {'glyphs': count, 'font_bytes': font_bytes, 'peak_rss_mb': round(peak_rss_mb(), 1), 'stages': stages}
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(sizes, tracer, cache_dir, jobs, seed, output_path):
+    results = {
+        'revision': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'tracer': tracer,
+        'cache': cache_dir is not None,
+        'jobs': jobs,
+        'seed': seed,
+        'runs': [],
+    }
+    print(f"{'glyphs':>8}  {'stage':<20}{'seconds':>10}{'glyph/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for count in sizes:
+        # 每个规模使用全新的进程，使峰值内存互不影响；缓存目录也按规模区分
+        size_cache = os.path.join(cache_dir, str(count)) if cache_dir else None
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            run = executor.submit(run_size, count, tracer, size_cache, jobs, seed).result()
+        results['runs'].append(run)
+        for name, stage in run['stages'].items():
+            print(f"{count:>8}  {name:<20}{stage['seconds']:>10.3f}{stage['glyph_per_s']:>10.1f}"
+                  f"{stage.get('p50_ms', float('nan')):>10.3f}{stage.get('p95_ms', float('nan')):>10.3f}")
+        print(f"{count:>8}  peak RSS {run['peak_rss_mb']:.1f} MB, font {run['font_bytes']} bytes")
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output_path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the image-to-font pipeline at several scales.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000], help='Glyph counts to benchmark')
+    parser.add_argument('--tracer', choices=sorted(TRACERS), default='potrace', help='Bitmap tracing backend')
+    parser.add_argument('--cache', type=str, default=None,
+                        help='Cache directory for the end-to-end run (measured cold, then warm)')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='Worker processes for the end-to-end run (0 = all CPU cores)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the synthetic glyphs')
+    parser.add_argument('-o', '--output', type=str, default='bench_pipeline.json', help='Output JSON file')
+    args = parser.parse_args()
+    main(args.sizes, args.tracer, args.cache, args.jobs or os.cpu_count(), args.seed, args.output)
@@ -0,0 +1,89 @@
+"""批量预处理的一致性检查与基准测试
+
+用法：python ./bench/bench_preprocess.py [--glyphs 256] [--image-dir ./images/test1-number]
+
+对合成字形图像与给定目录中的图像，分别用 preprocess_image_otsu 逐张处理、用 preprocess_images_otsu 批量处理，
+逐像素比较二值化结果，任何差异都以非零状态退出；同时打印两种方式的耗时。
+另外在不同对比度系数与纯色、噪声图像上单独检查各向量化步骤与 PIL/OpenCV 的结果一致。
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+from PIL import Image, ImageEnhance, ImageFilter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from preprocess import preprocess_image_otsu, preprocess_images_otsu, _contrast_stack, _sharpen_stack, _otsu_thresholds
+from bench_pipeline import make_glyph_image
+
+# 单独检查对比度增强时使用的系数
+CONTRAST_FACTORS = (0.7, 1.3, 2.0)
+
+def check_steps(rng):
+    """各向量化步骤与 PIL/OpenCV 逐张结果不一致的像素（或阈值）数"""
+    images = [rng.integers(0, 256, (40, 37), dtype=np.uint8) for _ in range(8)]
+    images += [np.clip(rng.normal(200, 40, (40, 37)), 0, 255).astype(np.uint8) for _ in range(8)]
+    images += [np.full((40, 37), value, dtype=np.uint8) for value in (0, 7, 255)]
+    stack = np.stack(images)
+    mismatches = {}
+    for factor in CONTRAST_FACTORS:
+        result = stack.copy()
+        _contrast_stack(result, factor)
+        expected = np.stack([np.asarray(ImageEnhance.Contrast(Image.fromarray(img)).enhance(factor)) for img in images])
+        mismatches[f'contrast {factor}'] = int((result != expected).sum())
+    result = stack.copy()
+    _sharpen_stack(result)
+    expected = np.stack([np.asarray(Image.fromarray(img).filter(ImageFilter.SHARPEN)) for img in images])
+    mismatches['sharpen'] = int((result != expected).sum())
+    expected = [int(cv2.threshold(img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[0]) for img in images]
+    mismatches['otsu'] = sum(int(t) != e for t, e in zip(_otsu_thresholds(stack), expected))
+    return mismatches
+
+def compare(image_paths):
+    """逐张与批量处理的 (不一致的图像数, 逐张耗时, 批量耗时)"""
+    start = time.perf_counter()
+    expected = [preprocess_image_otsu(image_path) for image_path in image_paths]
+    single_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    results = preprocess_images_otsu(image_paths)
+    batch_seconds = time.perf_counter() - start
+    mismatched = sum(not np.array_equal(a, b) for a, b in zip(expected, results))
+    return mismatched, single_seconds, batch_seconds
+
+def main(count, image_dir, seed):
+    rng = np.random.default_rng(seed)
+    failed = False
+    for step, mismatches in check_steps(rng).items():
+        print(f"{step:<16}{mismatches:>8} mismatches")
+        failed |= mismatches > 0
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        synthetic = []
+        for index in range(count):
+            path = os.path.join(work_dir, f'{index}.png')
+            make_glyph_image(index, rng).save(path)
+            synthetic.append(path)
+        sets = {'synthetic': synthetic}
+        if image_dir:
+            sets[image_dir] = [os.path.join(image_dir, f) for f in sorted(os.listdir(image_dir)) if f.endswith('.png')]
+        print(f"{'images':<28}{'count':>8}{'mismatched':>12}{'single s':>10}{'batch s':>10}")
+        for name, image_paths in sets.items():
+            mismatched, single_seconds, batch_seconds = compare(image_paths)
+            print(f"{name:<28}{len(image_paths):>8}{mismatched:>12}{single_seconds:>10.3f}{batch_seconds:>10.3f}")
+            failed |= mismatched > 0
+
+    if failed:
+        print("Batch preprocessing differs from preprocess_image_otsu")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check and benchmark batched preprocessing.")
+    parser.add_argument('--glyphs', type=int, default=256, help='Number of synthetic glyph images')
+    parser.add_argument('--image-dir', type=str, default='./images/test1-number', help='Directory of real glyph images')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the synthetic glyphs')
+    args = parser.parse_args()
+    main(args.glyphs, args.image_dir, args.seed)
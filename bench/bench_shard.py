@@ -0,0 +1,72 @@
+"""分片构建的基准测试：在本机以独立进程运行各分片，合并后与单机构建逐字节比较
+
+用法：python ./bench/bench_shard.py ./images/ZhangSan [--shards 4] [--ranges 4E00-62FF 6300-10FFFF] [--format ttf]
+
+先以 main.py 单机构建参考字体，再在共享的临时目录上同时启动 --shards 个 shard.py build 进程
+（给定 --ranges 时改为每个范围一个进程），最后运行 shard.py merge。打印各阶段耗时、分片存储大小，
+合并结果与参考字体不同时以非零状态退出。两次构建使用相同的 SOURCE_DATE_EPOCH 与字体文件名。
+"""
+import argparse
+import hashlib
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+def digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def run(args, env):
+    """运行 python args 并等待结束，返回耗时秒数"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable] + args, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+def run_shards(input_dir, store_dir, splits, env, jobs):
+    """同时启动全部分片进程，返回全部结束时的耗时秒数"""
+    start = time.perf_counter()
+    processes = [subprocess.Popen([sys.executable, 'src/shard.py', 'build', input_dir, store_dir, '-j', str(jobs)] + split,
+                                  cwd=ROOT, env=env, stdout=subprocess.DEVNULL) for split in splits]
+    for process in processes:
+        if process.wait():
+            raise SystemExit(f"Shard {process.args[-2:]} exited with status {process.returncode}")
+    return time.perf_counter() - start
+
+def main(input_dir, shards, ranges, font_format, jobs):
+    input_dir = os.path.abspath(input_dir)
+    env = dict(os.environ, SOURCE_DATE_EPOCH=os.environ.get('SOURCE_DATE_EPOCH', '1700000000'))
+    splits = [['--range', spec] for spec in ranges] if ranges else [['--shard', f"{i + 1}/{shards}"] for i in range(shards)]
+    with tempfile.TemporaryDirectory() as work_dir:
+        # 名称表取自文件名，两次构建使用相同的文件名
+        single_path = os.path.join(work_dir, 'single', f'font.{font_format}')
+        merged_path = os.path.join(work_dir, 'merged', f'font.{font_format}')
+        store_dir = os.path.join(work_dir, 'store')
+        os.makedirs(os.path.dirname(single_path))
+        os.makedirs(os.path.dirname(merged_path))
+
+        single = run(['src/main.py', input_dir, single_path, '-j', str(jobs)], env)
+        build = run_shards(input_dir, store_dir, splits, env, jobs)
+        merge = run(['src/shard.py', 'merge', store_dir, merged_path], env)
+        store_bytes = sum(os.path.getsize(os.path.join(store_dir, f)) for f in os.listdir(store_dir))
+        identical = digest(single_path) == digest(merged_path)
+
+        print(f"single node:  {single:8.2f}s")
+        print(f"{len(splits)} shards:    {build:8.2f}s  (store {store_bytes / 1024:.0f} KB)")
+        print(f"merge:        {merge:8.2f}s  (font {os.path.getsize(merged_path) / 1024:.0f} KB)")
+        print(f"identical:    {identical}")
+    return identical
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark a sharded build against a single-node build.")
+    parser.add_argument('input_dir', type=str, help='Directory containing the images')
+    parser.add_argument('--shards', type=int, default=4, help='Number of shards split by glyph count')
+    parser.add_argument('--ranges', type=str, nargs='+', default=None, help='One shard per Unicode range instead')
+    parser.add_argument('--format', choices=['ttf', 'otf', 'woff', 'woff2'], default='ttf', help='Output font format')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='Worker processes of each build')
+    args = parser.parse_args()
+    if not main(args.input_dir, args.shards, args.ranges, args.format, args.jobs):
+        raise SystemExit(1)
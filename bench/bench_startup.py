@@ -0,0 +1,89 @@
+"""启动耗时基准测试：导入开销、--help 与缓存全部命中时的空构建
+
+用法：python ./bench/bench_startup.py [--image-dir ./images/test1-number] [--repeat 5] [-o startup.json]
+
+每项都在新的解释器进程中运行并计入导入耗时，取多次运行的最小值：
+空解释器（对照）、import main、main.py --help，以及先填充缓存、再对同一目录重复构建的空构建。
+空构建另以 -X importtime 统计各模块的导入耗时；导入了 HEAVY_MODULES 中的模块时以非零状态退出，
+这些模块只应在确实需要预处理、模板页、CFF、子集化或异步描摹时才导入。
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from bench_pipeline import git_revision
+
+# 缓存全部命中的构建不应导入的模块
+HEAVY_MODULES = ('cv2', 'PIL', 'matplotlib', 'fontTools.subset', 'fontTools.cffLib', 'asyncio',
+                 'concurrent.futures.process')
+# 打印的导入耗时最多的模块数
+TOP_IMPORTS = 10
+
+def run(args, env=None):
+    """在新进程中运行 python args，返回 (耗时秒数, 标准错误输出)"""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable] + args, cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, text=True, check=True)
+    return time.perf_counter() - start, result.stderr
+
+def best(args, repeat, env=None):
+    return min(run(args, env)[0] for _ in range(repeat))
+
+def parse_importtime(stderr):
+    """解析 -X importtime 的输出，返回 {模块名: 累计微秒}"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(cumulative)
+    return modules
+
+def main(image_dir, repeat, output_path):
+    env = dict(os.environ, PYTHONPATH=os.path.join(ROOT, 'src'))
+    results = {'revision': git_revision(), 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'seconds': {}}
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_dir = os.path.join(work_dir, 'images')
+        shutil.copytree(image_dir, input_dir)
+        build = ['src/main.py', input_dir, os.path.join(work_dir, 'font.ttf'), '--cache', os.path.join(work_dir, 'cache')]
+        # 第一次构建填充缓存
+        run(build)
+        results['seconds'] = {
+            'interpreter': best(['-c', 'pass'], repeat),
+            'import main': best(['-c', 'import main'], repeat, env),
+            'main.py --help': best(['src/main.py', '--help'], repeat),
+            'cached build': best(build, repeat),
+        }
+        modules = parse_importtime(run(['-X', 'importtime'] + build)[1])
+
+    for name, seconds in results['seconds'].items():
+        print(f"{name:<20}{seconds:>8.3f} s")
+    print(f"\nSlowest {TOP_IMPORTS} imports in the cached build (cumulative):")
+    for name, microseconds in sorted(modules.items(), key=lambda item: item[1], reverse=True)[:TOP_IMPORTS]:
+        print(f"  {name:<40}{microseconds / 1000:>8.1f} ms")
+    heavy = [name for name in HEAVY_MODULES if name in modules]
+    results['imports_ms'] = {name: microseconds / 1000 for name, microseconds in modules.items()}
+    results['heavy_imports'] = heavy
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output_path}")
+    if heavy:
+        print(f"Cached build imported: {', '.join(heavy)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark CLI startup and no-op cached builds.")
+    parser.add_argument('--image-dir', type=str, default='./images/test1-number', help='Directory of glyph images')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement, the minimum is reported')
+    parser.add_argument('-o', '--output', type=str, default='bench_startup.json', help='Output JSON file')
+    args = parser.parse_args()
+    main(args.image_dir, args.repeat, args.output)
@@ -0,0 +1,81 @@
+"""比较各描摹后端的吞吐量与轮廓保真度
+
+用法：python ./bench/bench_tracer.py [图像目录] [--repeat N]
+
+保真度：把描摹出的轮廓按源分辨率栅格化，与二值化输入计算 IoU。
+"""
+import argparse
+import os
+import sys
+import time
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from preprocess import preprocess_image_otsu
+from convert_svg import svg_to_path_data, iter_commands
+from tracer import TRACERS
+
+# 栅格化时每段贝塞尔曲线的采样数、亚像素精度与超采样倍数
+CURVE_STEPS = 16
+SHIFT = 4
+SUPERSAMPLE = 4
+
+def svg_commands(svg_content):
+    """提取 SVG 中全部路径的绝对坐标命令"""
+    return list(iter_commands(*svg_to_path_data(svg_content)))
+
+def rasterize(commands, shape):
+    """把 M/L/C/Z 命令按奇偶规则栅格化为掩码，超采样后以覆盖率 0.5 为界"""
+    polygons = []
+    current = []
+    u = np.linspace(0.0, 1.0, CURVE_STEPS + 1)[1:, None]
+    for cmd, params in commands:
+        if cmd == 'M':
+            current = [np.array([params])]
+            polygons.append(current)
+        elif cmd == 'L':
+            current.append(np.array([params]))
+        elif cmd == 'C':
+            p0 = current[-1][-1]
+            p1, p2, p3 = np.array(params[0:2]), np.array(params[2:4]), np.array(params[4:6])
+            current.append((1 - u) ** 3 * p0 + 3 * (1 - u) ** 2 * u * p1 + 3 * (1 - u) * u ** 2 * p2 + u ** 3 * p3)
+    height, width = shape
+    mask = np.zeros((height * SUPERSAMPLE, width * SUPERSAMPLE), dtype=np.uint8)
+    pts = [np.round((np.concatenate(poly) * SUPERSAMPLE - 0.5) * (1 << SHIFT)).astype(np.int32) for poly in polygons]
+    if pts:
+        cv2.fillPoly(mask, pts, 1, lineType=cv2.LINE_8, shift=SHIFT)
+    coverage = mask.reshape(height, SUPERSAMPLE, width, SUPERSAMPLE).mean(axis=(1, 3))
+    return coverage >= 0.5
+
+def iou(a, b):
+    union = np.logical_or(a, b).sum()
+    return np.logical_and(a, b).sum() / union if union else 1.0
+
+def main(image_dir, repeat):
+    images = [preprocess_image_otsu(os.path.join(image_dir, f))
+              for f in sorted(os.listdir(image_dir)) if f.endswith('.png')]
+    print(f"{len(images)} glyphs from {image_dir}, {repeat} repeats")
+    print(f"{'tracer':<10}{'glyph/s':>10}{'mean IoU':>10}{'min IoU':>10}{'segments':>10}")
+    for name, trace in TRACERS.items():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            svgs = [trace(img) for img in images]
+        elapsed = time.perf_counter() - start
+
+        scores = []
+        segments = 0
+        for img, svg in zip(images, svgs):
+            commands = svg_commands(svg)
+            segments += sum(1 for cmd, _ in commands if cmd in 'LC')
+            scores.append(iou(rasterize(commands, img.shape), img < 128))
+        print(f"{name:<10}{len(images) * repeat / elapsed:>10.1f}{np.mean(scores):>10.4f}"
+              f"{np.min(scores):>10.4f}{segments:>10}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark tracer backends.")
+    parser.add_argument('image_dir', nargs='?', default='./images/test1-number', help='Directory containing the images')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of timed passes over the images')
+    args = parser.parse_args()
+    main(args.image_dir, args.repeat)
@@ -0,0 +1,136 @@
+"""在内存中由图像生成字体的库接口，不读写文件系统
+
+    from api import build_font_bytes
+    font_bytes = build_font_bytes({'永': png_bytes, 0x4E00: gray_array}, font_name='ZhangSan')
+
+轮廓优化容差与归一化尺寸沿用模块级设置（见 main.init_worker），进程池需以 init_worker 或 warm_worker 为 initializer。
+"""
+import importlib
+import io
+import logging
+from collections import deque
+import numpy as np
+from preprocess import preprocess_image_otsu, preprocess_gray_otsu
+from tracer import TRACERS
+from generate_font import glyph_from_svg, assemble_font
+from webfont import check_flavor
+from main import init_worker
+
+log = logging.getLogger(__name__)
+
+# 每个进程池任务处理的字形数
+CHUNK_GLYPHS = 16
+# 每个工作进程排队等待的任务数；多个任务共用进程池时，各任务的字形组交替执行
+CHUNKS_PER_WORKER = 2
+# 输出格式对应的 (轮廓格式, WOFF 封装格式)
+FORMATS = {
+    'ttf': ('truetype', None),
+    'otf': ('cff', None),
+    'woff': ('truetype', 'woff'),
+    'woff2': ('truetype', 'woff2'),
+}
+
+def parse_char(key):
+    """字符键：单个字符、码位整数或 'U+4E00' 形式的字符串，返回对应的单个字符"""
+    if isinstance(key, (int, np.integer)):
+        return chr(key)
+    if len(key) == 1:
+        return key
+    if key[:2].upper() == 'U+':
+        return chr(int(key[2:], 16))
+    raise ValueError(f"Unrecognized character key {key!r}")
+
+def preprocess_source(source):
+    """图像字节（PNG 等）或数组（灰度、RGB 或 RGBA）的 Otsu 预处理，与读取同样图像文件的结果相同"""
+    if isinstance(source, np.ndarray):
+        from PIL import Image
+        return preprocess_gray_otsu(Image.fromarray(source).convert('L'))
+    return preprocess_image_otsu(io.BytesIO(source))
+
+def process_source(char, source, tracer='potrace'):
+    """单个字形的预处理 → 描摹 → 字形，返回 (字形名, 字符编码, 字形) 或 None"""
+    try:
+        svg_content = TRACERS[tracer](preprocess_source(source))
+    except Exception as e:
+        log.warning(f"Failed to trace {char!r}: {e}")
+        return None
+    return glyph_from_svg(svg_content, char, source_name=f"U+{ord(char):04X}")
+
+def process_sources(items, tracer='potrace'):
+    """在工作进程中依次处理一组 (字符, 图像) 字形"""
+    return [process_source(char, source, tracer) for char, source in items]
+
+def warm_worker(simplify=0.0, normalize=0):
+    """常驻进程池的 initializer：设置与父进程相同的参数，并预先导入预处理所需的模块，第一个任务不再付出导入开销"""
+    init_worker(simplify, normalize)
+    importlib.import_module('cv2')
+    importlib.import_module('PIL.Image')
+
+def trace_glyphs(glyphs, executor=None, workers=1, tracer='potrace', progress=None):
+    """按码位顺序处理 {字符键: 图像} 中的全部字形，返回 (有效字形列表, 失败的字符列表)
+
+    给定 executor 时以 CHUNK_GLYPHS 个字形为一组提交，最多 workers * CHUNKS_PER_WORKER 组在途；
+    progress(已完成数, 总数) 在调用线程中随每组完成调用。
+    多个键指向同一字符（如 'A'、'U+0041' 与 65）时抛出 ValueError。
+    """
+    sources = {}
+    for key, source in glyphs.items():
+        char = parse_char(key)
+        if char in sources:
+            raise ValueError(f"Character U+{ord(char):04X} ({char!r}) is given more than once, last as {key!r}")
+        sources[char] = source
+    items = sorted(sources.items(), key=lambda item: ord(item[0]))
+    chunks = deque(items[i:i + CHUNK_GLYPHS] for i in range(0, len(items), CHUNK_GLYPHS))
+    entries = []
+    failed = []
+    in_flight = deque()
+
+    def collect():
+        chunk, outputs = in_flight.popleft()
+        if executor is not None:
+            outputs = outputs.result()
+        for (char, _), entry in zip(chunk, outputs):
+            if entry:
+                entries.append(entry)
+            else:
+                failed.append(char)
+        if progress is not None:
+            progress(len(entries) + len(failed), len(items))
+
+    while chunks:
+        chunk = chunks.popleft()
+        if executor is not None:
+            in_flight.append((chunk, executor.submit(process_sources, chunk, tracer)))
+        else:
+            in_flight.append((chunk, process_sources(chunk, tracer)))
+        while len(in_flight) >= max(1, workers * CHUNKS_PER_WORKER):
+            collect()
+    while in_flight:
+        collect()
+    return entries, failed
+
+def font_bytes(entries, font_name='FontGenerator', font_format='ttf'):
+    """把字形组装为字体并返回文件字节；没有有效字形时抛出 ValueError"""
+    outline_format, flavor = FORMATS[font_format]
+    check_flavor(flavor)
+    # 名称表取自路径的文件名部分
+    fb = assemble_font(entries, f"{font_name}.{font_format}", outline_format)
+    if fb is None:
+        raise ValueError("No valid glyphs were processed")
+    fb.font.flavor = flavor
+    output = io.BytesIO()
+    fb.save(output)
+    return output.getvalue()
+
+def build_font_bytes(glyphs, font_name='FontGenerator', font_format='ttf', executor=None, workers=1,
+                     tracer='potrace', progress=None):
+    """由 {字符键: 图像字节或数组} 生成字体，返回字体文件的字节
+
+    字符键见 parse_char，指向同一字符的多个键抛出 ValueError；font_format 为 FORMATS 中的 ttf、otf、woff 或 woff2。
+    字形按码位排序；处理失败的字形记录警告后跳过。与同样图像经 main.py 构建的字体相同（名称表除外）。
+    """
+    if font_format not in FORMATS:
+        raise ValueError(f"Unknown font format {font_format!r}")
+    check_flavor(FORMATS[font_format][1])
+    entries, _ = trace_glyphs(glyphs, executor, workers, tracer, progress)
+    return font_bytes(entries, font_name, font_format)
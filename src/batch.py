@@ -0,0 +1,172 @@
+import argparse
+import json
+import logging
+import os
+import time
+from collections import deque
+from contextlib import nullcontext
+from main import list_images, process_glyph, lookup_cache, store_cache, peak_rss_line, init_worker
+from tracer import TRACERS
+from generate_font import build_font, OUTLINE_FORMATS
+from cache import GlyphCache
+from webfont import font_flavor
+
+log = logging.getLogger(__name__)
+
+# 每个进程池任务处理的字形数；任务按字形数划分而不是按字体划分，大字体的字形分散到全部工作进程
+CHUNK_GLYPHS = 16
+# 每个工作进程排队等待的任务数，父进程组装字体时工作进程不会空闲
+CHUNKS_PER_WORKER = 4
+
+class FontJob:
+    """清单中的一个字体：输入目录、输出路径，以及按文件名顺序收集的字形"""
+
+    def __init__(self, input_dir, output_font_path, outline_format=None):
+        self.input_dir = input_dir
+        self.output_font_path = output_font_path
+        self.outline_format = outline_format
+        self.image_filenames = list_images(input_dir)
+        self.entries = [None] * len(self.image_filenames)
+        self.remaining = len(self.image_filenames)
+
+def load_manifest(manifest_path):
+    """读取清单，返回 FontJob 列表
+
+    清单为 JSON 数组，每项形如 {"input_dir": "...", "output_font_path": "...", "outlines": "cff"}，
+    outlines 可省略；相对路径相对于清单所在目录。
+    """
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        items = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    jobs = []
+    outputs = set()
+    for index, item in enumerate(items):
+        if 'input_dir' not in item or 'output_font_path' not in item:
+            raise ValueError(f"{manifest_path}: job {index} needs input_dir and output_font_path")
+        outline_format = item.get('outlines')
+        if outline_format is not None and outline_format not in OUTLINE_FORMATS:
+            raise ValueError(f"{manifest_path}: job {index} has unknown outlines {outline_format!r}")
+        output_font_path = os.path.join(base_dir, item['output_font_path'])
+        if output_font_path in outputs:
+            raise ValueError(f"{manifest_path}: {item['output_font_path']} is the output of more than one job")
+        outputs.add(output_font_path)
+        font_flavor(output_font_path)
+        jobs.append(FontJob(os.path.join(base_dir, item['input_dir']), output_font_path, outline_format))
+    return jobs
+
+def process_chunk(tasks, tracer='potrace'):
+    """在工作进程中依次处理一组字形，tasks 为 (输入目录, 图像文件名, 缓存的 SVG 或 None) 列表"""
+    return [process_glyph(input_dir, image_filename, svg_content=cached_svg, tracer=tracer)
+            for input_dir, image_filename, cached_svg in tasks]
+
+def iter_glyphs(jobs, cache=None, tracer='potrace'):
+    """按清单与文件名顺序产出 (字体序号, 字形序号, 描摹缓存键, 缓存的 SVG, 缓存的字形)"""
+    for job_index, job in enumerate(jobs):
+        for position, image_filename in enumerate(job.image_filenames):
+            if cache is None:
+                yield job_index, position, None, None, None
+            else:
+                yield (job_index, position) + lookup_cache(cache, job.input_dir, image_filename, tracer)
+
+def run_batch(jobs, executor=None, workers=1, cache=None, tracer='potrace'):
+    """在同一个进程池上处理清单中全部字体的字形，某个字体的字形全部就绪后立即写出该字体
+
+    字形按清单顺序以 CHUNK_GLYPHS 个为一组提交，最多 workers * CHUNKS_PER_WORKER 组在途；
+    结果按提交顺序取回，因此各字体大致按清单顺序完成，输出与单独运行 main.py 相同。
+    返回写出失败的字体列表。
+    """
+    failed = []
+    in_flight = deque()
+
+    def finish(job):
+        log.info(f"{job.output_font_path}: all {len(job.entries)} glyphs ready")
+        if not build_font([entry for entry in job.entries if entry], job.output_font_path, job.outline_format):
+            failed.append(job)
+        # 写出后释放字形
+        job.entries = []
+
+    def record(job_index, position, entry):
+        job = jobs[job_index]
+        job.entries[position] = entry
+        job.remaining -= 1
+        if job.remaining == 0:
+            finish(job)
+
+    def collect():
+        chunk, outputs = in_flight.popleft()
+        if executor is not None:
+            outputs = outputs.result()
+        for (job_index, position, trace_key, _), (svg_content, entry, _) in zip(chunk, outputs):
+            if cache is not None and svg_content is not None:
+                store_cache(cache, trace_key, jobs[job_index].image_filenames[position], svg_content, entry)
+            record(job_index, position, entry)
+
+    def submit(chunk):
+        tasks = [(jobs[job_index].input_dir, jobs[job_index].image_filenames[position], cached_svg)
+                 for job_index, position, _, cached_svg in chunk]
+        if executor is not None:
+            in_flight.append((chunk, executor.submit(process_chunk, tasks, tracer)))
+        else:
+            in_flight.append((chunk, process_chunk(tasks, tracer)))
+        while len(in_flight) >= max(1, workers * CHUNKS_PER_WORKER):
+            collect()
+
+    for job in jobs:
+        if job.remaining == 0:
+            finish(job)
+    chunk = []
+    for job_index, position, trace_key, cached_svg, entry in iter_glyphs(jobs, cache, tracer):
+        if entry is not None:
+            record(job_index, position, entry)
+            continue
+        chunk.append((job_index, position, trace_key, cached_svg))
+        if len(chunk) == CHUNK_GLYPHS:
+            submit(chunk)
+            chunk = []
+    if chunk:
+        submit(chunk)
+    while in_flight:
+        collect()
+    return failed
+
+def main(font_jobs, jobs=1, cache=None, tracer='potrace', simplify=0.0, normalize=0):
+    """构建 load_manifest 得到的全部字体，全部成功时返回 True"""
+    glyph_count = sum(len(job.image_filenames) for job in font_jobs)
+    start = time.perf_counter()
+    init_worker(simplify, normalize)
+    if jobs > 1:
+        from concurrent.futures import ProcessPoolExecutor
+    with (ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(simplify, normalize))
+          if jobs > 1 else nullcontext()) as executor:
+        failed = run_batch(font_jobs, executor, jobs, cache, tracer)
+    if cache is not None:
+        cache.save()
+        print(cache.stats_line())
+    print(f"Built {len(font_jobs) - len(failed)} of {len(font_jobs)} fonts ({glyph_count} glyphs) "
+          f"in {time.perf_counter() - start:.2f}s with {jobs} workers")
+    print(peak_rss_line())
+    return not failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build several fonts from a manifest on one shared worker pool.")
+    parser.add_argument('manifest', type=str,
+                        help='JSON list of {"input_dir", "output_font_path", optional "outlines"} jobs')
+    parser.add_argument('-j', '--jobs', type=int, default=0, help='Number of worker processes (0 = all CPU cores)')
+    parser.add_argument('--cache', type=str, default=None, help='Directory of the incremental glyph cache')
+    parser.add_argument('--cache-size', type=int, default=512, help='Glyph cache size limit in MB')
+    parser.add_argument('--tracer', choices=sorted(TRACERS), default='potrace', help='Bitmap tracing backend')
+    parser.add_argument('--simplify', type=float, default=0.0,
+                        help='Outline simplification tolerance in font units (0 = off)')
+    parser.add_argument('--normalize', type=int, default=0,
+                        help='Crop each image to its ink box and scale that box to N pixels before tracing (0 = off)')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Log every finished font')
+    args = parser.parse_args()
+    try:
+        font_jobs = load_manifest(args.manifest)
+    except (OSError, ValueError, ImportError) as e:
+        parser.error(str(e))
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format='%(message)s')
+    cache = GlyphCache(args.cache, args.cache_size * 1024 * 1024) if args.cache else None
+    if not main(font_jobs, jobs=args.jobs or os.cpu_count(), cache=cache, tracer=args.tracer,
+                simplify=args.simplify, normalize=args.normalize):
+        raise SystemExit(1)
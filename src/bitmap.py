@@ -1,16 +1,93 @@
 import os
-from PIL import Image
+import subprocess
+import tempfile
+import numpy as np
+
+POTRACE_PATH = './potrace/bin/potrace'
+
+# 使用 potrace 的优化参数将位图转换为 SVG
+# --opttolerance 0.2
+# 作用：控制曲线优化的容忍度。数值较低时，输出的曲线更忠实于位图的边缘，可能使曲线平滑度较低。
+# --alphamax 3.5
+# 作用：控制输出矢量图像中曲线角的平滑度。数值越高，曲线越平滑（越少棱角）。
+# 参数：最大角度设置，可达最高4.0。
+OPTTOLERANCE = 0.4
+ALPHAMAX = 2.5
+# 单个字形一次描摹的超时（秒），用于 trace_scheduler 的异步调度
+TRACE_TIMEOUT = 30.0
 
 def bitmap_to_svg(bitmap_path, svg_path):
+    from PIL import Image
     # 转换图像格式为 BMP
     bmp_path = bitmap_path.replace('.png', '.bmp')
     image = Image.open(bitmap_path)
     image.save(bmp_path)
 
-    # 使用 potrace 的优化参数将 BMP 转换为 SVG
-    # --opttolerance 0.2
-    # 作用：控制曲线优化的容忍度。数值较低时，输出的曲线更忠实于位图的边缘，可能使曲线平滑度较低。
-    # --alphamax 3.5
-    # 作用：控制输出矢量图像中曲线角的平滑度。数值越高，曲线越平滑（越少棱角）。
-    # 参数：最大角度设置，可达最高4.0。
-    os.system(f'./potrace/bin/potrace {bmp_path} -s -o {svg_path} --opttolerance 0.4 --alphamax 2.5')
+    os.system(f'{POTRACE_PATH} {bmp_path} -s -o {svg_path} --opttolerance {OPTTOLERANCE} --alphamax {ALPHAMAX}')
+
+def array_to_pbm(img_np):
+    """将二值化数组（0 为墨迹，255 为背景）编码为 PBM (P4) 字节流"""
+    height, width = img_np.shape
+    bits = np.packbits(img_np < 128, axis=1)
+    return f'P4\n{width} {height}\n'.encode('ascii') + bits.tobytes()
+
+def bitmap_array_to_svg(img_np, svg_path=None):
+    """通过标准输入/输出与 potrace 交换数据，不产生 BMP/SVG 临时文件，返回 SVG 文本"""
+    result = subprocess.run(
+        [POTRACE_PATH, '-s', '-o', '-', '--opttolerance', str(OPTTOLERANCE), '--alphamax', str(ALPHAMAX)],
+        input=array_to_pbm(img_np), stdout=subprocess.PIPE, check=True)
+    svg_content = result.stdout.decode('utf-8')
+
+    # 仅在调试时写出 SVG
+    if svg_path:
+        with open(svg_path, 'w', encoding='utf-8') as f:
+            f.write(svg_content)
+    return svg_content
+
+def bitmap_arrays_to_svg(img_nps, svg_paths=None):
+    """批量描摹：一个 potrace 进程处理多张位图，分摊进程启动开销
+
+    potrace 在 SVG 模式下不能把多个输入写到标准输出，因此 PBM 与 SVG 放在临时目录中。
+    返回 (SVG 文本列表, {序号: 错误信息})，失败的位图对应 None。
+    potrace 遇到无法处理的文件即退出，此时记录该文件的错误，并从下一个文件起继续。
+    """
+    svgs = [None] * len(img_nps)
+    errors = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        paths = []
+        for index, img_np in enumerate(img_nps):
+            path = os.path.join(work_dir, f'{index}.pbm')
+            with open(path, 'wb') as f:
+                f.write(array_to_pbm(img_np))
+            paths.append(path)
+
+        remaining = list(range(len(img_nps)))
+        while remaining:
+            result = subprocess.run(
+                [POTRACE_PATH, '-s', '--opttolerance', str(OPTTOLERANCE), '--alphamax', str(ALPHAMAX)]
+                + [paths[index] for index in remaining],
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            stderr = result.stderr.decode('utf-8', 'replace')
+            # 出错的文件由错误信息中的路径确定；无法确定时取第一个没有输出的文件
+            failed = None
+            if result.returncode != 0:
+                failed = next((index for index in remaining if paths[index] in stderr), None)
+                if failed is None:
+                    failed = next((index for index in remaining
+                                   if not os.path.exists(paths[index][:-4] + '.svg')), remaining[-1])
+            for position, index in enumerate(remaining):
+                if index == failed:
+                    errors[index] = stderr.strip() or f'potrace exited with status {result.returncode}'
+                    remaining = remaining[position + 1:]
+                    break
+                with open(paths[index][:-4] + '.svg', 'r', encoding='utf-8') as f:
+                    svgs[index] = f.read()
+            else:
+                remaining = []
+
+    # 仅在调试时写出 SVG
+    for svg_content, svg_path in zip(svgs, svg_paths or []):
+        if svg_path and svg_content is not None:
+            with open(svg_path, 'w', encoding='utf-8') as f:
+                f.write(svg_content)
+    return svgs, errors
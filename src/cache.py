@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+import pickle
+from collections import OrderedDict
+
+INDEX_FILENAME = 'index.json'
+
+def content_key(data, params):
+    """由输入字节与阶段参数计算内容寻址键"""
+    digest = hashlib.sha256(data)
+    digest.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+class GlyphCache:
+    """内容寻址的增量构建缓存，按总字节数上限做 LRU 淘汰
+
+    每个条目以 <key>.pkl 单独存放在 cache_dir 下；index.json 按最近使用顺序记录
+    各条目的大小，在 save() 时写回。缓存只应由单个进程（主进程）读写。
+    """
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.index = OrderedDict()
+        index_path = os.path.join(cache_dir, INDEX_FILENAME)
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                self.index = OrderedDict(json.load(f))
+        except (OSError, ValueError):
+            pass
+        self.total_bytes = sum(self.index.values())
+        # 容量上限可能比上次运行时更小
+        self._evict()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.pkl')
+
+    def get(self, key):
+        """读取条目并标记为最近使用，未命中时返回 None"""
+        if key in self.index:
+            try:
+                with open(self._entry_path(key), 'rb') as f:
+                    value = pickle.load(f)
+                self.index.move_to_end(key)
+                self.hits += 1
+                return value
+            except (OSError, pickle.UnpicklingError, EOFError):
+                self.total_bytes -= self.index.pop(key)
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        """写入条目，超出容量时淘汰最久未使用的条目"""
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path = self._entry_path(key) + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, self._entry_path(key))
+
+        if key in self.index:
+            self.total_bytes -= self.index.pop(key)
+        self.index[key] = len(data)
+        self.total_bytes += len(data)
+        self._evict()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self.index) > 1:
+            old_key, size = self.index.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._entry_path(old_key))
+            except OSError:
+                pass
+
+    def save(self):
+        """原子地写回索引"""
+        index_path = os.path.join(self.cache_dir, INDEX_FILENAME)
+        tmp_path = index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(list(self.index.items()), f)
+        os.replace(tmp_path, index_path)
+
+    def stats_line(self):
+        return (f"Cache: {self.hits} hits, {self.misses} misses, {self.evictions} evictions, "
+                f"{len(self.index)} entries, {self.total_bytes / (1024 * 1024):.1f} MB")
@@ -1,163 +1,241 @@
 import xml.etree.ElementTree as ET
+import math
 import re
+from array import array
+from collections import namedtuple
+import numpy as np
 
-def parse_path(d):
-    """解析SVG路径数据"""
-    tokens = re.findall(r'([A-Za-z])|(-?\d+\.?\d*)', d)
-    tokens = [token[0] if token[0] else float(token[1]) for token in tokens]
+# 路径中的分隔符（空白与逗号）
+PATH_SEPARATOR_RE = re.compile(r'[\s,]*')
+# 一个数字（支持 .5、1e-3 等写法）与一个椭圆弧标志；标志只有一个字符，紧凑写法 "00" 是两个标志
+_NUMBER = r'[\s,]*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)'
+_FLAG = r'[\s,]*([01])'
+# 各命令一组参数的匹配式（连同其后的分隔符），每组参数只匹配一次
+PATH_ARGS_RE = {letter: re.compile(pattern + r'[\s,]*') for letter, pattern in {
+    'M': _NUMBER * 2, 'L': _NUMBER * 2, 'T': _NUMBER * 2,
+    'H': _NUMBER, 'V': _NUMBER,
+    'C': _NUMBER * 6, 'S': _NUMBER * 4, 'Q': _NUMBER * 4,
+    'A': _NUMBER * 3 + _FLAG * 2 + _NUMBER * 2,
+}.items()}
+
+# 编译后的路径操作码，H/V 化为直线，S/T 展开为完整的三次/二次曲线，椭圆弧近似为三次曲线
+OP_MOVE, OP_LINE, OP_CUBIC, OP_QUAD, OP_CLOSE = range(5)
+OP_LETTERS = 'MLCQZ'
+# 每个操作码占用的坐标数
+OP_ARGS = (2, 2, 6, 4, 0)
+
+IDENTITY = (1, 0, 0, 1, 0, 0)
+
+SVG_NS = '{http://www.w3.org/2000/svg}'
+
+# 编译后的路径：ops 为操作码数组，coords 为扁平坐标数组（每个点占两个数）
+CompiledPath = namedtuple('CompiledPath', ['ops', 'coords'])
+
+def arc_to_cubics(x0, y0, rx, ry, x_axis_rotation, large_arc_flag, sweep_flag, x, y):
+    """将 SVG 椭圆弧（端点参数化）近似为若干段三次贝塞尔曲线，每段不超过 90 度
+
+    返回 [(x1, y1, x2, y2, x, y), ...]，坐标与输入处于同一坐标系。
+    """
+    rx, ry = abs(rx), abs(ry)
+    if rx == 0 or ry == 0:
+        return [(x0, y0, x, y, x, y)]
+    phi = math.radians(x_axis_rotation)
+    cos_phi, sin_phi = math.cos(phi), math.sin(phi)
     
-    commands = []
-    i = 0
-    while i < len(tokens):
-        if isinstance(tokens[i], str):  # 如果是命令
-            cmd = tokens[i]
-            i += 1
-        # 根据命令收集参数
-        if cmd == 'M' or cmd == 'm':  # 移动命令
-            commands.append((cmd, [tokens[i], tokens[i+1]]))
-            i += 2
-        elif cmd == 'L' or cmd == 'l':  # 线段命令
-            commands.append((cmd, [tokens[i], tokens[i+1]]))
-            i += 2
-        elif cmd == 'H' or cmd == 'h':  # 水平线命令
-            commands.append((cmd, [tokens[i]]))
-            i += 1
-        elif cmd == 'V' or cmd == 'v':  # 垂直线命令
-            commands.append((cmd, [tokens[i]]))
-            i += 1
-        elif cmd == 'C' or cmd == 'c':  # 三次贝塞尔曲线
-            commands.append((cmd, [tokens[i], tokens[i+1], tokens[i+2], tokens[i+3], tokens[i+4], tokens[i+5]]))
-            i += 6
-        elif cmd == 'S' or cmd == 's':  # 平滑三次贝塞尔曲线
-            commands.append((cmd, [tokens[i], tokens[i+1], tokens[i+2], tokens[i+3]]))
-            i += 4
-        elif cmd == 'Q' or cmd == 'q':  # 二次贝塞尔曲线
-            commands.append((cmd, [tokens[i], tokens[i+1], tokens[i+2], tokens[i+3]]))
-            i += 4
-        elif cmd == 'T' or cmd == 't':  # 平滑二次贝塞尔曲线
-            commands.append((cmd, [tokens[i], tokens[i+1]]))
-            i += 2
-        elif cmd == 'A' or cmd == 'a':  # 椭圆弧
-            commands.append((cmd, [tokens[i], tokens[i+1], tokens[i+2], tokens[i+3], tokens[i+4], tokens[i+5], tokens[i+6]]))
-            i += 7
-        elif cmd == 'Z' or cmd == 'z':  # 闭合路径
-            commands.append((cmd, []))
+    # 换算到以椭圆中心为原点、轴对齐的坐标系
+    dx, dy = (x0 - x) / 2, (y0 - y) / 2
+    x1p = cos_phi * dx + sin_phi * dy
+    y1p = -sin_phi * dx + cos_phi * dy
+    # 半径不足时按比例放大
+    scale = (x1p * x1p) / (rx * rx) + (y1p * y1p) / (ry * ry)
+    if scale > 1:
+        rx, ry = rx * math.sqrt(scale), ry * math.sqrt(scale)
+    numerator = rx * rx * ry * ry - rx * rx * y1p * y1p - ry * ry * x1p * x1p
+    denominator = rx * rx * y1p * y1p + ry * ry * x1p * x1p
+    coef = math.sqrt(max(numerator, 0) / denominator) if denominator else 0
+    if bool(large_arc_flag) == bool(sweep_flag):
+        coef = -coef
+    cxp, cyp = coef * rx * y1p / ry, -coef * ry * x1p / rx
+    cx = cos_phi * cxp - sin_phi * cyp + (x0 + x) / 2
+    cy = sin_phi * cxp + cos_phi * cyp + (y0 + y) / 2
     
-    return commands
-
-def convert_to_absolute(commands):
-    """将相对坐标转换为绝对坐标"""
-    current_x, current_y = 0, 0
-    start_x, start_y = 0, 0
-    absolute_commands = []
+    theta = math.atan2((y1p - cyp) / ry, (x1p - cxp) / rx)
+    end_theta = math.atan2((-y1p - cyp) / ry, (-x1p - cxp) / rx)
+    delta = end_theta - theta
+    if sweep_flag and delta < 0:
+        delta += 2 * math.pi
+    elif not sweep_flag and delta > 0:
+        delta -= 2 * math.pi
     
-    for cmd, params in commands:
-        if cmd == 'M':  # 绝对移动
-            current_x, current_y = params
-            start_x, start_y = current_x, current_y
-            absolute_commands.append(('M', params))
-        elif cmd == 'm':  # 相对移动
-            current_x += params[0]
-            current_y += params[1]
-            start_x, start_y = current_x, current_y
-            absolute_commands.append(('M', [current_x, current_y]))
-        elif cmd == 'L':  # 绝对线段
-            current_x, current_y = params
-            absolute_commands.append(('L', params))
-        elif cmd == 'l':  # 相对线段
-            current_x += params[0]
-            current_y += params[1]
-            absolute_commands.append(('L', [current_x, current_y]))
-        elif cmd == 'H':  # 绝对水平线
-            current_x = params[0]
-            absolute_commands.append(('L', [current_x, current_y]))
-        elif cmd == 'h':  # 相对水平线
-            current_x += params[0]
-            absolute_commands.append(('L', [current_x, current_y]))
-        elif cmd == 'V':  # 绝对垂直线
-            current_y = params[0]
-            absolute_commands.append(('L', [current_x, current_y]))
-        elif cmd == 'v':  # 相对垂直线
-            current_y += params[0]
-            absolute_commands.append(('L', [current_x, current_y]))
-        elif cmd == 'C':  # 绝对三次贝塞尔曲线
-            current_x, current_y = params[4], params[5]
-            absolute_commands.append(('C', params))
-        elif cmd == 'c':  # 相对三次贝塞尔曲线
-            x1, y1 = current_x + params[0], current_y + params[1]
-            x2, y2 = current_x + params[2], current_y + params[3]
-            x, y = current_x + params[4], current_y + params[5]
-            current_x, current_y = x, y
-            absolute_commands.append(('C', [x1, y1, x2, y2, x, y]))
-        elif cmd == 'S':  # 绝对平滑三次贝塞尔曲线
-            current_x, current_y = params[2], params[3]
-            absolute_commands.append(('S', params))
-        elif cmd == 's':  # 相对平滑三次贝塞尔曲线
-            x2, y2 = current_x + params[0], current_y + params[1]
-            x, y = current_x + params[2], current_y + params[3]
-            current_x, current_y = x, y
-            absolute_commands.append(('S', [x2, y2, x, y]))
-        elif cmd == 'Q':  # 绝对二次贝塞尔曲线
-            current_x, current_y = params[2], params[3]
-            absolute_commands.append(('Q', params))
-        elif cmd == 'q':  # 相对二次贝塞尔曲线
-            x1, y1 = current_x + params[0], current_y + params[1]
-            x, y = current_x + params[2], current_y + params[3]
-            current_x, current_y = x, y
-            absolute_commands.append(('Q', [x1, y1, x, y]))
-        elif cmd == 'T':  # 绝对平滑二次贝塞尔曲线
-            current_x, current_y = params
-            absolute_commands.append(('T', params))
-        elif cmd == 't':  # 相对平滑二次贝塞尔曲线
-            x, y = current_x + params[0], current_y + params[1]
-            current_x, current_y = x, y
-            absolute_commands.append(('T', [x, y]))
-        elif cmd == 'A':  # 绝对椭圆弧
-            current_x, current_y = params[5], params[6]
-            absolute_commands.append(('A', params))
-        elif cmd == 'a':  # 相对椭圆弧
-            rx, ry, x_axis_rotation, large_arc_flag, sweep_flag = params[0], params[1], params[2], params[3], params[4]
-            x, y = current_x + params[5], current_y + params[6]
-            current_x, current_y = x, y
-            absolute_commands.append(('A', [rx, ry, x_axis_rotation, large_arc_flag, sweep_flag, x, y]))
-        elif cmd == 'Z' or cmd == 'z':  # 闭合路径
-            current_x, current_y = start_x, start_y
-            absolute_commands.append(('Z', []))
+    segments = max(1, math.ceil(abs(delta) / (math.pi / 2) - 1e-9))
+    step = delta / segments
+    k = 4 / 3 * math.tan(step / 4)
     
-    return absolute_commands
+    def point(t):
+        ct, st = math.cos(t), math.sin(t)
+        return (cx + rx * ct * cos_phi - ry * st * sin_phi, cy + rx * ct * sin_phi + ry * st * cos_phi,
+                -rx * st * cos_phi - ry * ct * sin_phi, -rx * st * sin_phi + ry * ct * cos_phi)
+    
+    curves = []
+    px, py, tx, ty = point(theta)
+    for n in range(segments):
+        t = theta + step * (n + 1)
+        qx, qy, ux, uy = point(t)
+        curves.append((px + k * tx, py + k * ty, qx - k * ux, qy - k * uy, qx, qy))
+        px, py, tx, ty = qx, qy, ux, uy
+    # 终点取精确值，避免累积误差
+    curves[-1] = curves[-1][:4] + (x, y)
+    return curves
+
+def compile_path(d, transform_matrix=IDENTITY):
+    """单次扫描完成分词、相对坐标转绝对坐标与变换矩阵应用
 
-def commands_to_path(commands):
-    """将命令列表转换回路径字符串"""
-    path = []
-    for cmd, params in commands:
-        path.append(cmd)
-        if cmd == 'Z' or cmd == 'z':
+    返回 CompiledPath：ops 为 uint8 操作码数组，coords 为按操作码顺序排列的扁平 float64 坐标数组。
+    按命令逐组匹配参数并直接写入按路径长度一次性预分配的两个数组，不构造分词列表。
+    """
+    length = len(d)
+    # 按路径长度取上界，不必预先分词：每个字符至多对应一个操作码；
+    # 坐标最密的是椭圆弧，至少 11 个字符的参数展开为 4 段三次曲线共 24 个坐标，每个字符不超过 3 个
+    ops = array('B', bytes(length))
+    coords = array('d', [0.0]) * (3 * length)
+    a, b, c, dd, e, f = transform_matrix
+    skip_separators = PATH_SEPARATOR_RE.match
+    n_ops = 0
+    n = 0
+    current_x = current_y = 0.0
+    start_x = start_y = 0.0
+    # 上一条曲线的第二控制点（未变换的绝对坐标），用于 S/T 的反射
+    ctrl_x = ctrl_y = 0.0
+    last = None
+    cmd = None
+    upper = None
+    pos = skip_separators(d).end()
+    while pos < length:
+        if d[pos].isalpha():
+            cmd = d[pos]
+            upper = cmd.upper()
+            pos = skip_separators(d, pos + 1).end()
+            if upper == 'Z':  # 闭合路径
+                ops[n_ops] = OP_CLOSE
+                n_ops += 1
+                current_x, current_y = start_x, start_y
+                last = 'Z'
+                continue
+            if upper not in PATH_ARGS_RE:
+                raise ValueError(f"Unsupported path command: {cmd!r}")
+        elif cmd is None:
+            raise ValueError(f"Path data must start with a command: {d[:20]!r}")
+        elif upper == 'Z':
+            raise ValueError(f"Unexpected number after closepath at {pos}: {d[pos:pos + 20]!r}")
+        
+        m = PATH_ARGS_RE[upper].match(d, pos)
+        if m is None:
+            raise ValueError(f"Invalid {cmd!r} arguments at {pos}: {d[pos:pos + 20]!r}")
+        pos = m.end()
+        args = m.groups()
+        relative = cmd != upper
+        base_x, base_y = (current_x, current_y) if relative else (0.0, 0.0)
+        if upper == 'M' or upper == 'L' or upper == 'T':
+            x = base_x + float(args[0])
+            y = base_y + float(args[1])
+            if upper == 'T':  # 平滑二次贝塞尔曲线，控制点为上一控制点的反射
+                if last == 'Q':
+                    ctrl_x, ctrl_y = 2 * current_x - ctrl_x, 2 * current_y - ctrl_y
+                else:
+                    ctrl_x, ctrl_y = current_x, current_y
+                ops[n_ops] = OP_QUAD
+                coords[n] = a * ctrl_x + c * ctrl_y + e
+                coords[n + 1] = b * ctrl_x + dd * ctrl_y + f
+                n += 2
+                last = 'Q'
+            elif upper == 'M':  # 移动命令，后续的隐式坐标按直线处理
+                ops[n_ops] = OP_MOVE
+                start_x, start_y = x, y
+                cmd = 'l' if relative else 'L'
+                upper = 'L'
+                last = 'M'
+            else:  # 线段命令
+                ops[n_ops] = OP_LINE
+                last = 'L'
+        elif upper == 'H' or upper == 'V':  # 水平/垂直线
+            value = float(args[0])
+            if upper == 'H':
+                x = base_x + value
+                y = current_y
+            else:
+                x = current_x
+                y = base_y + value
+            ops[n_ops] = OP_LINE
+            last = 'L'
+        elif upper == 'C' or upper == 'S' or upper == 'Q':
+            k = 0
+            if upper == 'C':  # 三次贝塞尔曲线
+                x1 = base_x + float(args[0])
+                y1 = base_y + float(args[1])
+                k = 2
+            elif upper == 'S':  # 平滑三次贝塞尔曲线，第一控制点为上一控制点的反射
+                if last == 'C':
+                    x1, y1 = 2 * current_x - ctrl_x, 2 * current_y - ctrl_y
+                else:
+                    x1, y1 = current_x, current_y
+            ctrl_x = base_x + float(args[k])
+            ctrl_y = base_y + float(args[k + 1])
+            x = base_x + float(args[k + 2])
+            y = base_y + float(args[k + 3])
+            if upper == 'Q':  # 二次贝塞尔曲线
+                ops[n_ops] = OP_QUAD
+                last = 'Q'
+            else:
+                ops[n_ops] = OP_CUBIC
+                coords[n] = a * x1 + c * y1 + e
+                coords[n + 1] = b * x1 + dd * y1 + f
+                n += 2
+                last = 'C'
+            coords[n] = a * ctrl_x + c * ctrl_y + e
+            coords[n + 1] = b * ctrl_x + dd * ctrl_y + f
+            n += 2
+        else:  # 椭圆弧，近似为三次贝塞尔曲线
+            rx, ry, rotation = float(args[0]), float(args[1]), float(args[2])
+            large_arc_flag, sweep_flag = args[3] == '1', args[4] == '1'
+            x = base_x + float(args[5])
+            y = base_y + float(args[6])
+            for x1, y1, x2, y2, px, py in arc_to_cubics(current_x, current_y, rx, ry, rotation,
+                                                        large_arc_flag, sweep_flag, x, y):
+                ops[n_ops] = OP_CUBIC
+                n_ops += 1
+                for px_, py_ in ((x1, y1), (x2, y2), (px, py)):
+                    coords[n] = a * px_ + c * py_ + e
+                    coords[n + 1] = b * px_ + dd * py_ + f
+                    n += 2
+            current_x, current_y = x, y
+            # 弧不是 C/S，其后的 S 以当前点为第一控制点
+            last = 'A'
             continue
-        for param in params:
-            path.append(str(param))
-    
-    # 格式化路径字符串
-    formatted_path = ""
-    i = 0
-    while i < len(path):
-        if path[i] in "MLHVCSQTAZmlhvcsqtaz":
-            formatted_path += path[i] + " "
-            i += 1
-        else:
-            formatted_path += path[i]
-            i += 1
-            if i < len(path) and path[i] not in "MLHVCSQTAZmlhvcsqtaz":
-                formatted_path += " "
+        
+        n_ops += 1
+        coords[n] = a * x + c * y + e
+        coords[n + 1] = b * x + dd * y + f
+        n += 2
+        current_x, current_y = x, y
     
-    return formatted_path
+    return CompiledPath(np.frombuffer(ops, dtype=np.uint8)[:n_ops], np.frombuffer(coords, dtype=np.float64)[:n])
+
+def iter_commands(ops, coords):
+    """逐条产出 (命令字母, 参数列表)，便于调试与栅格化等非热点场景"""
+    values = coords.tolist()
+    k = 0
+    for op in ops.tolist():
+        size = OP_ARGS[op]
+        yield OP_LETTERS[op], values[k:k + size]
+        k += size
 
-def apply_transform(x, y, transform_matrix):
-    """应用变换矩阵到坐标"""
-    # 变换矩阵: [a, b, c, d, e, f] 对应 [a c e; b d f; 0 0 1]
-    a, b, c, d, e, f = transform_matrix
-    new_x = a * x + c * y + e
-    new_y = b * x + d * y + f
-    return new_x, new_y
+def path_to_d(ops, coords):
+    """将编译后的路径格式化为绝对坐标的 d 字符串（线性拼接）"""
+    parts = []
+    for letter, params in iter_commands(ops, coords):
+        parts.append(letter)
+        parts.extend(map(str, params))
+    return ' '.join(parts)
 
 def parse_transform(transform_str):
     """解析变换字符串为变换矩阵"""
@@ -204,120 +282,6 @@ def parse_transform(transform_str):
     # 默认返回恒等变换
     return [1, 0, 0, 1, 0, 0]
 
-def transform_elliptical_arc(rx, ry, x_axis_rotation, large_arc_flag, sweep_flag, x, y, transform_matrix):
-    """完整处理椭圆弧变换"""
-    # 提取变换矩阵的组件
-    a, c, e = transform_matrix[0], transform_matrix[2], transform_matrix[4]
-    b, d, f = transform_matrix[1], transform_matrix[3], transform_matrix[5]
-    
-    # 转换角度为弧度
-    phi = math.radians(x_axis_rotation)
-    
-    # 计算变换后的椭圆参数
-    # 这是一个复杂的数学过程，涉及到二次型的变换
-    cos_phi = math.cos(phi)
-    sin_phi = math.sin(phi)
-    
-    # 构建椭圆的二次型矩阵
-    m11 = cos_phi / rx
-    m12 = sin_phi / rx
-    m21 = -sin_phi / ry
-    m22 = cos_phi / ry
-    
-    # 应用变换
-    m11_new = a * m11 + b * m21
-    m12_new = a * m12 + b * m22
-    m21_new = c * m11 + d * m21
-    m22_new = c * m12 + d * m22
-    
-    # 从变换后的二次型矩阵中提取新的椭圆参数
-    # 这里是简化版本，完整版本需要更复杂的计算
-    A = m11_new * m11_new + m21_new * m21_new
-    B = 2 * (m11_new * m12_new + m21_new * m22_new)
-    C = m12_new * m12_new + m22_new * m22_new
-    
-    # 计算新的半径和旋转角度
-    delta = B * B - 4 * A * C
-    if abs(delta) < 1e-10:
-        # 特殊情况处理
-        new_rx = new_ry = math.sqrt(1 / A)
-        new_x_axis_rotation = 0
-    else:
-        # 计算新的半径
-        k = math.sqrt(abs(delta))
-        new_rx = math.sqrt(2 / abs(A + C + k))
-        new_ry = math.sqrt(2 / abs(A + C - k))
-        
-        # 计算新的旋转角度
-        new_x_axis_rotation = math.degrees(0.5 * math.atan2(B, A - C))
-    
-    # 处理反射变换对 sweep_flag 的影响
-    det = a * d - b * c
-    new_sweep_flag = sweep_flag
-    if det < 0:
-        new_sweep_flag = 1 - sweep_flag
-    
-    # 变换终点坐标
-    new_x = a * x + c * y + e
-    new_y = b * x + d * y + f
-    
-    return new_rx, new_ry, new_x_axis_rotation, large_arc_flag, new_sweep_flag, new_x, new_y
-
-
-def transform_path_commands(commands, transform_matrix):
-    """应用变换矩阵到路径命令"""
-    transformed_commands = []
-    
-    for cmd, params in commands:
-        if cmd == 'M' or cmd == 'L':
-            x, y = params
-            new_x, new_y = apply_transform(x, y, transform_matrix)
-            transformed_commands.append((cmd, [new_x, new_y]))
-        elif cmd == 'C':
-            x1, y1 = params[0], params[1]
-            x2, y2 = params[2], params[3]
-            x, y = params[4], params[5]
-            
-            new_x1, new_y1 = apply_transform(x1, y1, transform_matrix)
-            new_x2, new_y2 = apply_transform(x2, y2, transform_matrix)
-            new_x, new_y = apply_transform(x, y, transform_matrix)
-            
-            transformed_commands.append((cmd, [new_x1, new_y1, new_x2, new_y2, new_x, new_y]))
-        elif cmd == 'S' or cmd == 'Q':
-            x2, y2 = params[0], params[1]
-            x, y = params[2], params[3]
-            
-            new_x2, new_y2 = apply_transform(x2, y2, transform_matrix)
-            new_x, new_y = apply_transform(x, y, transform_matrix)
-            
-            transformed_commands.append((cmd, [new_x2, new_y2, new_x, new_y]))
-        elif cmd == 'T':
-            x, y = params
-            new_x, new_y = apply_transform(x, y, transform_matrix)
-            transformed_commands.append((cmd, [new_x, new_y]))
-        elif cmd == 'A':
-            # 椭圆弧需要特殊处理，这里简化处理
-            # 可以使用函数 transform_elliptical_arc 优化
-            # rx, ry = params[0], params[1]
-            # x_axis_rotation = params[2]
-            # large_arc_flag, sweep_flag = params[3], params[4]
-            # x, y = params[5], params[6]
-            
-            # # 变换半径（简化，只考虑缩放）
-            # new_rx = rx * abs(transform_matrix[0])
-            # new_ry = ry * abs(transform_matrix[3])
-            
-            # # 变换终点
-            # new_x, new_y = apply_transform(x, y, transform_matrix)
-            
-            # transformed_commands.append((cmd, [new_rx, new_ry, x_axis_rotation, large_arc_flag, sweep_flag, new_x, new_y]))
-            transformed_commands.append((cmd, transform_elliptical_arc(*params, transform_matrix)))
-            
-        elif cmd == 'Z':
-            transformed_commands.append((cmd, []))
-    
-    return transformed_commands
-
 def convert_svg(svg_content):
     """转换SVG内容，消除transform并将相对坐标转为绝对坐标"""
     # 解析SVG
@@ -335,23 +299,47 @@ def convert_svg(svg_content):
         for path in g.findall('.//svg:path', ns):
             d = path.get('d')
             if d:
-                # 解析路径
-                commands = parse_path(d)
-                
-                # 转换为绝对坐标
-                absolute_commands = convert_to_absolute(commands)
-                
-                # 应用变换
-                transformed_commands = transform_path_commands(absolute_commands, transform_matrix)
-                
-                # 转换回路径字符串
-                new_d = commands_to_path(transformed_commands)
+                # 单次扫描完成解析、绝对坐标转换与变换
+                ops, coords = compile_path(d, transform_matrix)
                 
                 # 更新路径
-                path.set('d', new_d)
+                path.set('d', path_to_d(ops, coords))
         
         # 移除transform属性
         g.attrib.pop('transform')
     
     # 将SVG转换回字符串
-    return ET.tostring(root, encoding='unicode')
\ No newline at end of file
+    return ET.tostring(root, encoding='unicode')
+
+def multiply_transform(parent, child):
+    """组合变换矩阵：先应用 child，再应用 parent"""
+    a1, b1, c1, d1, e1, f1 = parent
+    a2, b2, c2, d2, e2, f2 = child
+    return (a1 * a2 + c1 * b2, b1 * a2 + d1 * b2,
+            a1 * c2 + c1 * d2, b1 * c2 + d1 * d2,
+            a1 * e2 + c1 * f2 + e1, b1 * e2 + d1 * f2 + f1)
+
+def _collect_paths(element, transform_matrix, paths):
+    transform_str = element.get('transform')
+    if transform_str:
+        child = parse_transform(transform_str)
+        transform_matrix = child if transform_matrix is IDENTITY else multiply_transform(transform_matrix, child)
+    if element.tag in (SVG_NS + 'path', 'path'):
+        d = element.get('d')
+        if d:
+            paths.append(compile_path(d, transform_matrix))
+    for child_element in element:
+        _collect_paths(child_element, transform_matrix, paths)
+
+def svg_to_path_data(svg_content):
+    """解析 SVG 文档中的全部 path，应用各自的祖先 transform，合并为一个 CompiledPath
+
+    结果可直接交给 generate_font.svg_to_glyph，无需再序列化为字符串。
+    """
+    paths = []
+    _collect_paths(ET.fromstring(svg_content), IDENTITY, paths)
+    if len(paths) == 1:
+        return paths[0]
+    if not paths:
+        return CompiledPath(np.empty(0, dtype=np.uint8), np.empty(0, dtype=np.float64))
+    return CompiledPath(np.concatenate([p.ops for p in paths]), np.concatenate([p.coords for p in paths]))
@@ -0,0 +1,92 @@
+import hashlib
+import numpy as np
+
+# 差分哈希的边长：水平与垂直方向各 HASH_SIZE * HASH_SIZE 位
+HASH_SIZE = 16
+# 签名算法的版本，写入签名的缓存键，算法变化时递增
+SIGNATURE_VERSION = 1
+# 每个字节值中置位的个数，用于按字节查表计算汉明距离
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+def ink_crop(img_np):
+    """二值化图像（墨迹为 0）在墨迹外接框内的布尔掩码"""
+    ink = img_np < 128
+    rows = np.flatnonzero(ink.any(axis=1))
+    cols = np.flatnonzero(ink.any(axis=0))
+    if len(rows) == 0:
+        return ink[:0, :0]
+    return ink[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+
+def bitmap_signature(img_np):
+    """二值化位图的签名 (精确键, 感知哈希)
+
+    精确键是墨迹外接框内位图的哈希：svg_to_glyph 按轮廓的外接框缩放与居中，
+    只是在画面中位置不同的相同图形描摹后得到相同的字形。
+    感知哈希是墨迹补成正方形后缩小到 HASH_SIZE 的水平与垂直差分哈希（dHash），打包为字节。
+    """
+    import cv2
+    crop = ink_crop(img_np)
+    height, width = crop.shape
+    key = hashlib.sha1(f'{height}x{width}:'.encode('ascii') + np.packbits(crop).tobytes()).hexdigest()
+    side = max(height, width, 1)
+    square = np.zeros((side, side), dtype=np.float32)
+    top, left = (side - height) // 2, (side - width) // 2
+    square[top:top + height, left:left + width] = crop
+    small = cv2.resize(square, (HASH_SIZE + 1, HASH_SIZE + 1), interpolation=cv2.INTER_AREA)
+    bits = np.concatenate([(small[:-1, 1:] > small[:-1, :-1]).ravel(), (small[1:, :-1] > small[:-1, :-1]).ravel()])
+    return key, np.packbits(bits)
+
+def pack_bitmap(img_np):
+    """把 0/255 的二值化图像打包为 (形状, 位数组)，传给工作进程时只有原大小的 1/8"""
+    return img_np.shape, np.packbits(img_np > 127)
+
+def unpack_bitmap(bitmap):
+    shape, bits = bitmap
+    return np.unpackbits(bits, count=shape[0] * shape[1]).reshape(shape) * np.uint8(255)
+
+class DedupIndex:
+    """已出现的形状：精确键 → 代表形状序号，以及各代表形状的感知哈希
+
+    distance > 0 时，精确键未命中的形状再按感知哈希的汉明距离（位数）查找最接近的代表形状，
+    不超过 distance 即视为相同。代表形状按出现顺序编号，匹配结果与进程数、缓存无关。
+    """
+
+    def __init__(self, distance=0):
+        self.distance = distance
+        self.keys = {}
+        # 图像文件的内容键（描摹缓存键）→ 代表形状序号，字节相同的图像不必再预处理
+        self.sources = {}
+        self.hashes = None
+        self.count = 0
+        # 代表形状序号 → 字形名，描摹失败时为 None
+        self.glyph_names = []
+        # 重复形状的字符编码 → 共用的字形名，组装字体时加入 cmap
+        self.aliases = {}
+        self.duplicates = 0
+
+    def match(self, signature):
+        """返回匹配的代表形状序号，没有时返回 None；近似匹配的精确键随之登记"""
+        key, phash = signature
+        shape = self.keys.get(key)
+        if shape is None and self.distance and self.count:
+            distances = _POPCOUNT[np.bitwise_xor(self.hashes[:self.count], phash)].sum(axis=1, dtype=np.int32)
+            best = int(np.argmin(distances))
+            if distances[best] <= self.distance:
+                shape = self.keys[key] = best
+        return shape
+
+    def add(self, signature):
+        """登记新的代表形状，返回其序号"""
+        key, phash = signature
+        if self.hashes is None:
+            self.hashes = np.empty((64, len(phash)), dtype=np.uint8)
+        elif self.count == len(self.hashes):
+            self.hashes = np.concatenate([self.hashes, np.empty_like(self.hashes)])
+        self.hashes[self.count] = phash
+        self.keys[key] = self.count
+        self.glyph_names.append(None)
+        self.count += 1
+        return self.count - 1
+
+    def stats_line(self):
+        return f"Dedup: {self.count} unique shapes, {self.duplicates} duplicates share their glyphs"
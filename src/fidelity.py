@@ -0,0 +1,250 @@
+import argparse
+import os
+import numpy as np
+from fontTools.pens.basePen import BasePen
+from fontTools.ttLib import TTFont
+from generate_font import char_code_from_name
+from preprocess import preprocess_images_otsu, set_normalize_size
+from tracer import TURDSIZE
+
+# 每段三次曲线栅格化前展平的线段数
+CURVE_STEPS = 8
+# cv2.fillPoly 的定点小数位数，亚像素精度为 1/16 像素
+FIXED_SHIFT = 4
+# 栅格化的超采样倍数：fillPoly 会填满轮廓经过的像素，在放大的网格上填充后按覆盖率过半取墨迹
+SUPERSAMPLE = 4
+# 按外接框对齐后，相位相关估计的残余平移不超过该值（像素）时才采用
+MAX_REFINE_SHIFT = 3.0
+# 比较时在墨迹外接框外保留的边距（像素），容纳对齐平移与描摹对笔画的加粗
+CROP_MARGIN = 8
+# 低于该 IoU 的字形视为描摹失真
+MIN_IOU = 0.8
+# Hausdorff 距离超过源图墨迹外接框长边的该比例时视为描摹失真
+MAX_HAUSDORFF = 0.05
+# IoU 低于中位数超过该倍数的 MAD（换算为标准差）时视为离群
+OUTLIER_SIGMAS = 6.0
+# 每个进程池任务检查的字形数
+CHUNK_GLYPHS = 64
+
+_T = np.linspace(0.0, 1.0, CURVE_STEPS + 1)[1:, None]
+# 三次曲线展平用的 Bernstein 矩阵（不含起点）
+_BERNSTEIN = np.hstack([(1 - _T) ** 3, 3 * (1 - _T) ** 2 * _T, 3 * (1 - _T) * _T ** 2, _T ** 3])
+
+class PolygonPen(BasePen):
+    """把字形轮廓展平为多边形，contours 为 (k, 2) 数组列表（字体单位，y 轴向上）"""
+
+    def __init__(self, glyph_set=None):
+        super().__init__(glyph_set)
+        self.contours = []
+        self._points = []
+
+    def _moveTo(self, pt):
+        self._points = [pt]
+
+    def _lineTo(self, pt):
+        self._points.append(pt)
+
+    def _curveToOne(self, pt1, pt2, pt3):
+        controls = np.array([self._getCurrentPoint(), pt1, pt2, pt3], dtype=np.float64)
+        self._points.extend(map(tuple, (_BERNSTEIN @ controls).tolist()))
+
+    def _closePath(self):
+        if len(self._points) > 2:
+            self.contours.append(np.array(self._points, dtype=np.float64))
+        self._points = []
+
+    _endPath = _closePath
+
+def ink_mask(img_np):
+    """二值化数组（0 为墨迹）的墨迹掩码，去掉描摹时按噪点丢弃（面积不超过 TURDSIZE）的连通域
+
+    这些噪点不会出现在字形中，保留它们会撑大外接框而错位对齐。
+    """
+    import cv2
+    mask = img_np < 128
+    count, labels, component_stats, _ = cv2.connectedComponentsWithStats(mask.view(np.uint8), connectivity=8)
+    specks = component_stats[:, cv2.CC_STAT_AREA] <= TURDSIZE
+    specks[0] = False
+    if count > 1 and specks.any():
+        mask &= ~specks[labels]
+    return mask
+
+def crop_ink(mask, margin=CROP_MARGIN):
+    """裁剪到墨迹外接框向外 margin 像素的范围；没有墨迹时原样返回"""
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if len(rows) == 0:
+        return mask
+    return mask[max(rows[0] - margin, 0):rows[-1] + margin + 1, max(cols[0] - margin, 0):cols[-1] + margin + 1]
+
+def _fill(contours, offset, scale, shape):
+    """以 SUPERSAMPLE 倍超采样填充变换后的轮廓（像素 = 字体坐标 * (scale, -scale) + offset），按覆盖率过半取墨迹"""
+    import cv2
+    height, width = shape
+    # fillPoly 的整数坐标为像素中心，超采样网格上的像素中心相对原网格偏移半个子像素
+    factor = [scale * SUPERSAMPLE, -scale * SUPERSAMPLE]
+    origin = np.asarray(offset) * SUPERSAMPLE - 0.5
+    polygons = [np.round((contour * factor + origin) * (1 << FIXED_SHIFT)).astype(np.int32) for contour in contours]
+    raster = np.zeros((height * SUPERSAMPLE, width * SUPERSAMPLE), dtype=np.uint8)
+    # 填充值为子像素数，按面积缩小后的像素值恰为被覆盖的子像素个数
+    cv2.fillPoly(raster, polygons, SUPERSAMPLE * SUPERSAMPLE, lineType=cv2.LINE_8, shift=FIXED_SHIFT)
+    coverage = cv2.resize(raster, (width, height), interpolation=cv2.INTER_AREA)
+    return coverage * 2 >= SUPERSAMPLE * SUPERSAMPLE
+
+def rasterize(contours, source):
+    """在源图的像素网格上栅格化轮廓，返回与 source 同形状的墨迹掩码
+
+    字形与源图的对应关系是生成时的等比缩放加平移：先按墨迹外接框对齐（长边一致、中心重合），
+    再用相位相关估计残余的亚像素平移并重新栅格化；描摹把笔画端点修圆造成的外接框偏差因此不会整体错位细笔画。
+    """
+    import cv2
+    rows, cols = np.nonzero(source)
+    if not contours or len(rows) == 0:
+        return np.zeros(source.shape, dtype=bool)
+    points = np.concatenate(contours)
+    glyph_min, glyph_max = points.min(axis=0), points.max(axis=0)
+    ink_min = np.array([cols.min(), rows.min()], dtype=np.float64)
+    ink_max = np.array([cols.max(), rows.max()], dtype=np.float64) + 1
+    scale = (ink_max - ink_min).max() / max((glyph_max - glyph_min).max(), 1e-9)
+    # 字体单位 y 轴向上，像素 y 轴向下
+    glyph_center = (glyph_min + glyph_max) / 2
+    offset = (ink_min + ink_max) / 2 - glyph_center * [scale, -scale]
+    raster = _fill(contours, offset, scale, source.shape)
+    (dx, dy), _ = cv2.phaseCorrelate(raster.astype(np.float32), source.astype(np.float32))
+    if 0 < np.hypot(dx, dy) <= MAX_REFINE_SHIFT:
+        raster = _fill(contours, offset + [dx, dy], scale, source.shape)
+    return raster
+
+def compare_masks(sources, rasters):
+    """逐图像比较 (n, h, w) 的源图与栅格化墨迹掩码，返回 (IoU, 相对 Hausdorff 距离) 两个长度为 n 的数组
+
+    Hausdorff 距离为两组墨迹像素互相到对方最近墨迹的最大距离，除以源图墨迹外接框的长边；
+    距离场逐图像由 OpenCV 计算，其余归约在整个堆栈上向量化完成。
+    """
+    import cv2
+    intersection = np.count_nonzero(sources & rasters, axis=(1, 2))
+    union = np.count_nonzero(sources | rasters, axis=(1, 2))
+    iou = np.where(union > 0, intersection / np.maximum(union, 1), 1.0)
+
+    # 到最近墨迹像素的距离：distanceTransform 计算到最近零值像素的距离
+    to_source = np.stack([cv2.distanceTransform((~mask).view(np.uint8), cv2.DIST_L2, cv2.DIST_MASK_5)
+                          for mask in sources])
+    to_raster = np.stack([cv2.distanceTransform((~mask).view(np.uint8), cv2.DIST_L2, cv2.DIST_MASK_5)
+                          for mask in rasters])
+    distance = np.maximum(np.where(rasters, to_source, 0).max(axis=(1, 2)),
+                          np.where(sources, to_raster, 0).max(axis=(1, 2)))
+    rows = sources.any(axis=2)
+    cols = sources.any(axis=1)
+    extent = np.maximum(rows.shape[1] - rows[:, ::-1].argmax(axis=1) - rows.argmax(axis=1),
+                        cols.shape[1] - cols[:, ::-1].argmax(axis=1) - cols.argmax(axis=1))
+    has_source, has_raster = rows.any(axis=1), np.count_nonzero(rasters, axis=(1, 2)) > 0
+    hausdorff = np.where(has_source & has_raster, distance / np.maximum(extent, 1),
+                         np.where(has_source == has_raster, 0.0, np.inf))
+    return iou, hausdorff
+
+_glyph_set = None
+
+def open_font(font_path, normalize=0):
+    """在工作进程中打开字体并设置与构建相同的归一化尺寸；也用作进程池的 initializer"""
+    global _glyph_set
+    set_normalize_size(normalize)
+    _glyph_set = TTFont(font_path, lazy=True).getGlyphSet()
+
+def check_chunk(items):
+    """检查一组 (图像路径, 字形名)，返回 (IoU, 相对 Hausdorff 距离) 两个数组，顺序与输入相同
+
+    源图经批量预处理（见 preprocess.preprocess_images_otsu）后按尺寸分组，每组堆叠后一起比较。
+    """
+    images = preprocess_images_otsu([image_path for image_path, _ in items])
+    iou = np.zeros(len(items))
+    hausdorff = np.zeros(len(items))
+    groups = {}
+    for index, img_np in enumerate(images):
+        groups.setdefault(img_np.shape, []).append(index)
+    for indices in groups.values():
+        # 只在墨迹外接框附近比较，裁剪结果补零到同一尺寸后堆叠；补零不影响 IoU 与距离
+        crops = [crop_ink(ink_mask(images[i])) for i in indices]
+        shape = (len(crops), max(crop.shape[0] for crop in crops), max(crop.shape[1] for crop in crops))
+        sources = np.zeros(shape, dtype=bool)
+        rasters = np.zeros(shape, dtype=bool)
+        for position, (index, crop) in enumerate(zip(indices, crops)):
+            pen = PolygonPen(_glyph_set)
+            _glyph_set[items[index][1]].draw(pen)
+            height, width = crop.shape
+            sources[position, :height, :width] = crop
+            rasters[position, :height, :width] = rasterize(pen.contours, crop)
+        iou[indices], hausdorff[indices] = compare_masks(sources, rasters)
+    return iou, hausdorff
+
+def flag_glyphs(iou, hausdorff, min_iou=MIN_IOU, max_hausdorff=MAX_HAUSDORFF):
+    """返回失真或离群字形的布尔数组：IoU 或 Hausdorff 超出阈值，或 IoU 明显低于其余字形"""
+    flagged = (iou < min_iou) | (hausdorff > max_hausdorff)
+    if len(iou) > 2:
+        median = np.median(iou)
+        # MAD 乘以 1.4826 约等于正态分布的标准差
+        spread = 1.4826 * np.median(np.abs(iou - median))
+        flagged |= (median - iou) > OUTLIER_SIGMAS * max(spread, 1e-3)
+    return flagged
+
+def check_font(font_path, input_dir, jobs=1, min_iou=MIN_IOU, max_hausdorff=MAX_HAUSDORFF, top=10, normalize=0):
+    """把字体中每个字形栅格化回源图分辨率，与预处理后的源图比较，打印汇总并返回被标记的字形名列表
+
+    源图为 input_dir 中的 PNG，按文件名推断字符并经 cmap 找到字形；jobs > 1 时按 CHUNK_GLYPHS 分组并行检查。
+    文件名推断不出字符的图像（构建时同样跳过）只列为跳过，不算作缺失。
+    normalize 为构建时的归一化尺寸，源图按同样方式裁剪缩放后再比较。
+    """
+    cmap = TTFont(font_path, lazy=True).getBestCmap()
+    items = []
+    missing = []
+    skipped = []
+    for image_filename in sorted(f for f in os.listdir(input_dir) if f.endswith('.png')):
+        char_code = char_code_from_name(os.path.splitext(image_filename)[0])
+        if char_code is None:
+            skipped.append(image_filename)
+        elif char_code in cmap:
+            items.append((os.path.join(input_dir, image_filename), cmap[char_code]))
+        else:
+            missing.append(image_filename)
+    if skipped:
+        print(f"Fidelity: skipped {len(skipped)} images without a character code: {', '.join(skipped)}")
+    if not items:
+        print(f"Fidelity: no glyphs of {font_path} match images in {input_dir}")
+        return missing
+
+    chunks = [items[i:i + CHUNK_GLYPHS] for i in range(0, len(items), CHUNK_GLYPHS)]
+    if jobs > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=jobs, initializer=open_font, initargs=(font_path, normalize)) as executor:
+            results = list(executor.map(check_chunk, chunks))
+    else:
+        open_font(font_path, normalize)
+        results = [check_chunk(chunk) for chunk in chunks]
+    iou = np.concatenate([chunk_iou for chunk_iou, _ in results])
+    hausdorff = np.concatenate([chunk_hausdorff for _, chunk_hausdorff in results])
+    flagged = flag_glyphs(iou, hausdorff, min_iou, max_hausdorff)
+
+    glyph_names = [glyph_name for _, glyph_name in items]
+    print(f"Fidelity: {len(items)} glyphs, IoU median {np.median(iou):.3f} min {iou.min():.3f}, "
+          f"Hausdorff median {np.median(hausdorff):.1%} max {hausdorff.max():.1%}, {int(flagged.sum())} flagged")
+    for image_filename in missing:
+        print(f"  {image_filename}: no glyph in the font")
+    for index in np.argsort(iou)[:top]:
+        if flagged[index]:
+            print(f"  {glyph_names[index]:<12} IoU {iou[index]:.3f}  Hausdorff {hausdorff[index]:.1%}")
+    return missing + [glyph_names[index] for index in np.flatnonzero(flagged)]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare every glyph of a font with its source image.")
+    parser.add_argument('font_path', type=str, help='Font built by main.py')
+    parser.add_argument('input_dir', type=str, help='Directory containing the source images')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='Number of worker processes (0 = all CPU cores)')
+    parser.add_argument('--min-iou', type=float, default=MIN_IOU, help='Flag glyphs whose IoU is below this value')
+    parser.add_argument('--max-hausdorff', type=float, default=MAX_HAUSDORFF,
+                        help='Flag glyphs whose Hausdorff distance exceeds this fraction of the glyph size')
+    parser.add_argument('--top', type=int, default=10, help='Print at most N flagged glyphs')
+    parser.add_argument('--normalize', type=int, default=0,
+                        help='Ink box size the font was built with (--normalize of main.py, 0 = off)')
+    args = parser.parse_args()
+    if check_font(args.font_path, args.input_dir, args.jobs or os.cpu_count(), args.min_iou, args.max_hausdorff,
+                  args.top, args.normalize):
+        raise SystemExit(1)
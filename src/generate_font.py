@@ -1,133 +1,274 @@
 import os
-import re
 import argparse
+import functools
+import logging
+import math
 from fontTools.fontBuilder import FontBuilder
 from fontTools.pens.ttGlyphPen import TTGlyphPen
 from fontTools.ttLib import TTFont
-from svgpath2mpl import parse_path
+from fontTools.misc.arrayTools import intRect, unionRect
 import numpy as np
-import xml.etree.ElementTree as ET
-from convert_svg import convert_svg
+from convert_svg import svg_to_path_data, compile_path, OP_ARGS, OP_MOVE, OP_LINE, OP_CUBIC, OP_QUAD, OP_CLOSE
+from cache import GlyphCache, content_key
+from glyph_store import GlyphStore, save_streaming
+from instrument import timed
+from simplify import simplify_outline
+from webfont import font_flavor, compress_font
 
-def extract_svg_paths(svg_content):
-    """从 SVG 内容中提取路径数据"""
+# 单个字形的处理信息使用 INFO 级别，默认不输出，避免大字符集构建受标准输出拖累
+log = logging.getLogger(__name__)
+
+EM_SIZE = 1000
+# y 轴下沉系数，0 ~ 1.0, 0.15 为特别调制参数
+Y_SINK_FACTOR = 0.15
+
+# 字形阶段的实现版本，输出会变化的改动需递增以使旧缓存失效
+GLYPH_STAGE_VERSION = 2
+
+# 轮廓优化允许的最大偏差（字体单位），0 表示不优化；由 set_simplify_tolerance 设置
+SIMPLIFY_TOLERANCE = 0.0
+
+# 可选的轮廓格式：truetype 为带三次曲线的 glyf（glyphDataFormat=1），
+# cff 为 CFF 表中的 Type 2 字符串，同样原生保存三次曲线，且不依赖渲染器对三次 glyf 的支持
+OUTLINE_FORMATS = ('truetype', 'cff')
+
+# 每个操作码占用的点数，与 convert_svg.OP_ARGS 对应
+OP_POINTS = np.array(OP_ARGS) // 2
+
+def outline_affine(mins, maxs, em_size=EM_SIZE, y_sink_factor=Y_SINK_FACTOR):
+    """由 (n, 2) 的边界框批量计算缩放因子与偏移，返回 (scale, x_offset, y_offset) 三个长度为 n 的数组"""
+    svg_width = maxs[:, 0] - mins[:, 0]
+    svg_height = maxs[:, 1] - mins[:, 1]
+    valid = (svg_width > 0) & (svg_height > 0)
+    
+    # 计算缩放因子，保持宽高比
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scale_factor = np.where(valid, np.minimum(em_size * 0.8 / svg_width, em_size * 0.8 / svg_height), 1.0)
+    
+    # 计算居中偏移，并添加 y 轴下沉偏移量
+    x_offset = (em_size - svg_width * scale_factor) / 2 - mins[:, 0] * scale_factor
+    y_offset = (em_size - svg_height * scale_factor) / 2 + (em_size * y_sink_factor)
+    return scale_factor, x_offset, y_offset
+
+def transform_outlines(vertex_arrays, em_size=EM_SIZE, y_sink_factor=Y_SINK_FACTOR):
+    """对多个字形的顶点数组一次性完成缩放、居中、下沉与 Y 轴翻转，返回变换后的数组列表"""
+    lengths = np.array([len(v) for v in vertex_arrays])
+    if len(lengths) == 0 or lengths.min() == 0:
+        raise ValueError("No vertices found in SVG path")
+    vertices = np.concatenate(vertex_arrays).astype(np.float64, copy=False)
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    
+    # 计算SVG的边界框以便进行适当缩放
+    mins = np.minimum.reduceat(vertices, starts, axis=0)
+    maxs = np.maximum.reduceat(vertices, starts, axis=0)
+    scale_factor, x_offset, y_offset = outline_affine(mins, maxs, em_size, y_sink_factor)
+    
+    scale = np.repeat(scale_factor, lengths)[:, None]
+    offset = np.repeat(np.stack([x_offset, y_offset], axis=1), lengths, axis=0)
+    transformed = vertices * scale + offset
+    # 翻转Y坐标（TTF坐标系Y轴向上为正）
+    transformed[:, 1] = em_size - transformed[:, 1]
+    return np.split(transformed, starts[1:])
+
+def draw_outline(pen, points, ops):
+    """根据操作码把已变换的点送入字形笔"""
+    point_starts = np.concatenate([[0], np.cumsum(OP_POINTS[ops])]).tolist()
+    pts = [tuple(p) for p in points.tolist()]
+    is_open = False
+    for i, op in zip(point_starts, ops.tolist()):
+        if op == OP_MOVE:
+            if is_open:
+                pen.closePath()
+            pen.moveTo(pts[i])
+            is_open = True
+        elif op == OP_LINE:
+            pen.lineTo(pts[i])
+        elif op == OP_CUBIC:
+            pen.curveTo(pts[i], pts[i + 1], pts[i + 2])
+        elif op == OP_QUAD:
+            pen.qCurveTo(pts[i], pts[i + 1])
+        elif op == OP_CLOSE and is_open:
+            pen.closePath()
+            is_open = False
+    
+    # 确保路径关闭
+    if is_open:
+        pen.closePath()
+
+def set_simplify_tolerance(tolerance):
+    """设置轮廓优化的容差；多进程时也用作进程池的 initializer"""
+    global SIMPLIFY_TOLERANCE
+    SIMPLIFY_TOLERANCE = tolerance
+
+def emit_glyph(points, ops, simplify_tolerance=None):
+    """把已变换的轮廓送入字形笔得到字形；容差大于 0 时先做轮廓优化，并省略可隐含的落点"""
+    tolerance = SIMPLIFY_TOLERANCE if simplify_tolerance is None else simplify_tolerance
+    if tolerance > 0:
+        points, ops = simplify_outline(points, ops, tolerance)
+    pen = TTGlyphPen(None)
+    draw_outline(pen, points, ops)
+    return pen.glyph(dropImpliedOnCurves=tolerance > 0)
+
+def svg_to_glyph(path_data, char_code, em_size=EM_SIZE, y_sink_factor=Y_SINK_FACTOR, simplify_tolerance=None):
+    """将路径（convert_svg.CompiledPath 或 d 字符串）转换为字形"""
     try:
-        # 使用正则表达式提取路径数据
-        path_pattern = r'd="([^"]*)"'
-        paths = re.findall(path_pattern, svg_content)
-        
-        if paths:
-            return paths[0]  # 返回第一个找到的路径
-        
-        # 如果没有找到路径，尝试解析 XML
-        root = ET.fromstring(svg_content)
-        ns = {'svg': 'http://www.w3.org/2000/svg'}
-        path_elements = root.findall('.//svg:path', ns)
+        if isinstance(path_data, str):
+            path_data = compile_path(path_data)
         
-        if path_elements:
-            return path_elements[0].get('d', '')
+        # 获取路径顶点并整体做仿射变换
+        points = transform_outlines([path_data.coords.reshape(-1, 2)], em_size, y_sink_factor)[0]
+        return emit_glyph(points, path_data.ops, simplify_tolerance)
     
     except Exception as e:
-        print(f"Error extracting SVG path: {e}")
+        log.warning(f"Error converting SVG to glyph for character code {char_code}: {e}")
+        return None
+
+def svg_to_glyphs(paths, char_codes, em_size=EM_SIZE, y_sink_factor=Y_SINK_FACTOR):
+    """批量将路径转换为字形，所有字形的顶点在一次向量化运算中完成变换"""
+    paths = [compile_path(path) if isinstance(path, str) else path for path in paths]
+    try:
+        transformed = transform_outlines([path.coords.reshape(-1, 2) for path in paths], em_size, y_sink_factor)
+    except ValueError:
+        # 存在空路径时逐个处理，以便定位出错的字形
+        return [svg_to_glyph(path, char_code, em_size, y_sink_factor)
+                for path, char_code in zip(paths, char_codes)]
     
-    return ""
+    glyphs = []
+    for points, path, char_code in zip(transformed, paths, char_codes):
+        try:
+            glyphs.append(emit_glyph(points, path.ops))
+        except Exception as e:
+            log.warning(f"Error converting SVG to glyph for character code {char_code}: {e}")
+            glyphs.append(None)
+    return glyphs
+
+def char_code_from_name(char):
+    """由文件名（不含扩展名）推断字符编码，无法识别时返回 None"""
+    return ord(char) if len(char) == 1 else int(char) if char.isdigit() else None
 
-def svg_to_glyph(svg_path, char_code, em_size=1000):
-    """将 SVG 路径转换为字形"""
+def glyph_name_for(char, char_code):
+    """使用字符或数字作为字形名称"""
+    return f"uni{char_code:04X}" if char_code > 127 else char
+
+def glyph_params():
+    """影响 SVG → 字形阶段输出的全部参数"""
+    params = {'stage': 'glyph', 'version': GLYPH_STAGE_VERSION, 'em_size': EM_SIZE, 'y_sink_factor': Y_SINK_FACTOR}
+    if SIMPLIFY_TOLERANCE:
+        params['simplify'] = SIMPLIFY_TOLERANCE
+    return params
+
+def glyph_cache_key(svg_content, char):
+    """SVG → 字形阶段的缓存键，包含影响字形的全部参数"""
+    return content_key(svg_content.encode('utf-8'), {**glyph_params(), 'char': char})
+
+def load_glyph(svg_path, cache=None):
+    """读取单个 SVG 文件并转换为字形，返回 (字形名, 字符编码, 字形) 或 None"""
+    svg_filename = os.path.basename(svg_path)
     try:
-        # 解析 SVG 路径
-        path = parse_path(svg_path)
-        
-        # 创建字形笔
-        pen = TTGlyphPen(None)
-        
-        # 获取路径顶点
-        vertices = path.vertices
-        codes = path.codes
-        
-        if len(vertices) == 0:
-            raise ValueError("No vertices found in SVG path")
-        
-        # 计算SVG的边界框以便进行适当缩放
-        x_coords = [v[0] for v in vertices]
-        y_coords = [v[1] for v in vertices]
-        if x_coords and y_coords:
-            min_x, max_x = min(x_coords), max(x_coords)
-            min_y, max_y = min(y_coords), max(y_coords)
-            svg_width = max_x - min_x
-            svg_height = max_y - min_y
-            
-            # 计算缩放因子，保持宽高比
-            scale_factor = min(em_size * 0.8 / svg_width, em_size * 0.8 / svg_height) if svg_width > 0 and svg_height > 0 else 1.0
-            
-            # 添加 y 轴下沉偏移量
-            y_sink_factor = 0.15 # 0 ~ 1.0, 0.15 为特别调制参数
-            
-            # 计算居中偏移
-            x_offset = (em_size - svg_width * scale_factor) / 2 - min_x * scale_factor
-            y_offset = (em_size - svg_height * scale_factor) / 2  + (em_size * y_sink_factor)
-        else:
-            scale_factor = 1.0
-            x_offset = 0
-            y_offset = 0
+        with open(svg_path, 'r', encoding='utf-8') as f:
+            svg_content = f.read()
+    except Exception as e:
+        log.warning(f"Failed to process {svg_filename}: {e}")
+        return None
+    
+    char = os.path.splitext(svg_filename)[0]
+    if cache is None:
+        return glyph_from_svg(svg_content, char, svg_filename)
+    
+    key = glyph_cache_key(svg_content, char)
+    entry = cache.get(key)
+    if entry is None:
+        entry = glyph_from_svg(svg_content, char, svg_filename)
+        if entry:
+            cache.put(key, entry)
+    return entry
+
+def glyph_from_svg(svg_content, char, source_name=None, records=None):
+    """将内存中的 SVG 文本转换为字形，返回 (字形名, 字符编码, 字形) 或 None
+
+    records 为列表时追加 convert_svg 与 svg_to_glyph 两个阶段的记录（见 instrument.timed）。
+    """
+    source_name = source_name or f"{char}.svg"
+    char_code = char_code_from_name(char)
+    
+    if char_code is None:
+        log.warning(f"Skipping {source_name}: Could not determine character code")
+        return None
+    
+    try:
+        # 一次解析得到文档中全部路径的结构化数据（已消除 transform、转为绝对坐标）
+        with timed(records, char, 'convert_svg') as record:
+            path_data = svg_to_path_data(svg_content)
+            record['segments'] = len(path_data.ops)
+            record['vertices'] = len(path_data.coords) // 2
+            record['bytes'] = path_data.ops.nbytes + path_data.coords.nbytes
         
-        # 根据 matplotlib 路径代码转换为 TTGlyphPen 命令
-        i = 0
-        while i < len(codes):
-            code = int(codes[i]) if hasattr(codes[i], 'item') else codes[i]
-            
-            # MOVETO
-            if code == 1:
-                x = float(vertices[i][0]) * scale_factor + x_offset
-                # 翻转Y坐标（TTF坐标系Y轴向上为正）
-                y = em_size - (float(vertices[i][1]) * scale_factor + y_offset)
-                pen.moveTo((x, y))
-            # LINETO
-            elif code == 2:
-                x = float(vertices[i][0]) * scale_factor + x_offset
-                y = em_size - (float(vertices[i][1]) * scale_factor + y_offset)
-                pen.lineTo((x, y))
-            # CURVE3 (quadratic Bézier)
-            elif code == 3 and i+1 < len(vertices):
-                x1 = float(vertices[i][0]) * scale_factor + x_offset
-                y1 = em_size - (float(vertices[i][1]) * scale_factor + y_offset)
-                x2 = float(vertices[i+1][0]) * scale_factor + x_offset
-                y2 = em_size - (float(vertices[i+1][1]) * scale_factor + y_offset)
-                pen.qCurveTo((x1, y1), (x2, y2))
-                i += 1
-            # CURVE4 (cubic Bézier)
-            elif code == 4 and i+2 < len(vertices):
-                x1 = float(vertices[i][0]) * scale_factor + x_offset
-                y1 = em_size - (float(vertices[i][1]) * scale_factor + y_offset)
-                x2 = float(vertices[i+1][0]) * scale_factor + x_offset
-                y2 = em_size - (float(vertices[i+1][1]) * scale_factor + y_offset)
-                x3 = float(vertices[i+2][0]) * scale_factor + x_offset
-                y3 = em_size - (float(vertices[i+2][1]) * scale_factor + y_offset)
-                pen.curveTo((x1, y1), (x2, y2), (x3, y3))
-                i += 2
-            # CLOSEPOLY
-            elif code == 79:
-                pen.closePath()
-            
-            i += 1
+        if len(path_data.ops) == 0:
+            log.warning(f"Warning: No path data found in {source_name}")
+            return None
         
-        # 确保路径关闭
-        if len(codes) > 0:
-            last_code = int(codes[-1]) if hasattr(codes[-1], 'item') else codes[-1]
-            if last_code != 79:
-                pen.closePath()
+        # 转换为字形
+        with timed(records, char, 'svg_to_glyph') as record:
+            glyph = svg_to_glyph(path_data, char_code)
+            if glyph and records is not None:
+                record['vertices'] = len(glyph.coordinates) if glyph.numberOfContours else 0
+                record['contours'] = max(glyph.numberOfContours, 0)
+                record['bytes'] = len(glyph.compile(None))
+        if glyph and records is not None and SIMPLIFY_TOLERANCE:
+            # 记录优化前的点数与字节数以便对比（不计入耗时）
+            original = svg_to_glyph(path_data, char_code, simplify_tolerance=0)
+            record['vertices_before'] = len(original.coordinates) if original.numberOfContours else 0
+            record['bytes_before'] = len(original.compile(None))
         
-        return pen.glyph()
+        if glyph:
+            glyph_name = glyph_name_for(char, char_code)
+            log.info(f"Processed {source_name} as {glyph_name}")
+            return glyph_name, char_code, glyph
     
     except Exception as e:
-        print(f"Error converting SVG to glyph for character code {char_code}: {e}")
-        return None
+        log.warning(f"Failed to process {source_name}: {e}")
+    
+    return None
 
-def generate_font(svg_directory, output_font_path):
+def notdef_glyph():
+    """.notdef 字形（矩形）"""
+    pen = TTGlyphPen(None)
+    pen.moveTo((0, 0))
+    pen.lineTo((0, 800))
+    pen.lineTo((500, 800))
+    pen.lineTo((500, 0))
+    pen.closePath()
+    return pen.glyph()
+
+def outline_format_for(output_font_path, outline_format=None):
+    """未指定轮廓格式时，.otf 使用 cff，其余使用 truetype"""
+    if outline_format:
+        return outline_format
+    return 'cff' if output_font_path.lower().endswith('.otf') else 'truetype'
+
+def glyph_to_charstring(glyph, width):
+    """把 glyf 字形转换为 Type 2 字符串，返回 (字符串, 边界框或 None)；坐标已是整数，三次曲线原样保留"""
+    # CFF 相关模块只在输出 CFF 时导入
+    from fontTools.pens.t2CharStringPen import T2CharStringPen
+    from fontTools.cffLib import PrivateDict
+    pen = T2CharStringPen(width, None)
+    glyph.draw(pen, None)
+    charstring = pen.getCharString(private=PrivateDict())
+    bounds = charstring.calcBounds(None)
+    # 只保留编译后的字节码，大字符集时内存占用与 glyf 字节相当
+    charstring.compile()
+    charstring.program = None
+    return charstring, bounds
+
+def new_font_builder(output_font_path, outline_format='truetype'):
+    """创建字体构建器并设置名称表"""
     base_name = os.path.splitext(os.path.basename(output_font_path))[0]
     
     # 创建字体构建器
-    fb = FontBuilder(1000, isTTF=True, glyphDataFormat=1)
+    if outline_format == 'cff':
+        fb = FontBuilder(1000, isTTF=False)
+    else:
+        fb = FontBuilder(1000, isTTF=True, glyphDataFormat=1)
     
     # 设置字体信息
     fb.setupNameTable({
@@ -140,6 +281,72 @@ def generate_font(svg_directory, output_font_path):
         "manufacturer": "SVG Font Generator",
         "copyright": f"Copyright (c) {base_name} Font"
     })
+    return fb
+
+def glyph_metrics(glyph_name):
+    """字形的 (前进宽度, 左侧轴承)"""
+    if glyph_name == '.notdef':
+        return (500, 0)
+    # 可以根据字形的实际宽度调整
+    return (800, 50)
+
+def setup_metrics(fb, glyph_order):
+    """设置水平度量及 hhea、OS/2、post 表"""
+    # 为每个字形设置宽度和左侧轴承
+    hmtx = {glyph_name: glyph_metrics(glyph_name) for glyph_name in glyph_order}
+    
+    fb.setupHorizontalMetrics(hmtx)
+    
+    # 设置必要的表
+    # fb.setupHorizontalHeader(ascent=800, descent=-200)
+    # fb.setupOS2(sTypoAscender=800, sTypoDescender=-200, usWinAscent=800, usWinDescent=200)
+    
+    # 设置必要的表
+    fb.setupHorizontalHeader(ascent=900, descent=-100)
+    fb.setupOS2(sTypoAscender=900, sTypoDescender=-100, usWinAscent=900, usWinDescent=100)
+    fb.setupPost()
+
+def setup_cff(fb, charstrings, glyph_bounds):
+    """由 Type 2 字符串设置 CFF 表，字体名取自名称表
+
+    保存时 fontTools 会为 FontBBox 与 hhea 各执行一遍全部字符串来求边界框；
+    这里改用转换时已求得的 glyph_bounds 直接填写 FontBBox、head 与 hhea，结果相同。
+    须在 setup_metrics 之后调用。
+    """
+    name = fb.font['name']
+    fb.setupCFF(name.getDebugName(6), {'FullName': name.getDebugName(4), 'FamilyName': name.getDebugName(1)},
+                charstrings, {})
+    head, hhea, hmtx = fb.font['head'], fb.font['hhea'], fb.font['hmtx']
+    outlined = {glyph_name: bounds for glyph_name, bounds in glyph_bounds.items() if bounds is not None}
+    if outlined:
+        font_bbox = list(intRect(functools.reduce(unionRect, outlined.values())))
+        min_lsb = min_rsb = float('inf')
+        max_extent = -float('inf')
+        for glyph_name, (x_min, _, x_max, _) in outlined.items():
+            advance, lsb = hmtx[glyph_name]
+            width = int(math.ceil(x_max) - math.floor(x_min))
+            min_lsb = min(min_lsb, lsb)
+            min_rsb = min(min_rsb, advance - lsb - width)
+            max_extent = max(max_extent, lsb + width)
+    else:
+        font_bbox = [0, 0, 0, 0]
+        min_lsb = min_rsb = max_extent = 0
+    fb.font['CFF '].cff.topDictIndex[0].FontBBox = font_bbox
+    head.xMin, head.yMin, head.xMax, head.yMax = font_bbox
+    hhea.advanceWidthMax = max(advance for advance, _ in hmtx.metrics.values())
+    hhea.minLeftSideBearing, hhea.minRightSideBearing, hhea.xMaxExtent = min_lsb, min_rsb, max_extent
+    fb.font.recalcBBoxes = False
+
+def assemble_font(entries, output_font_path, outline_format=None, aliases=None):
+    """由 (字形名, 字符编码, 字形) 列表组装字体，字形顺序与 entries 顺序一致，返回未保存的 FontBuilder
+
+    名称表取自 output_font_path 的文件名部分。没有有效字形时返回 None。
+    outline_format 为 cff 时，每个字形取出后立即转换为 Type 2 字符串，entries 也可以是迭代器。
+    aliases 为 {字符编码: 字形名}，这些字符在 cmap 中映射到已有的字形（见 dedup）；在 entries 取尽后读取。
+    重复的字形名只保留第一个，其余记录警告后跳过。
+    """
+    outline_format = outline_format_for(output_font_path, outline_format)
+    fb = new_font_builder(output_font_path, outline_format)
     
     # 创建字形表
     glyphs = {}
@@ -147,100 +354,122 @@ def generate_font(svg_directory, output_font_path):
     char_map = {}
     
     # 添加 .notdef 字形（空白字形）
-    pen = TTGlyphPen(None)
-    pen.moveTo((0, 0))
-    pen.lineTo((0, 800))
-    pen.lineTo((500, 800))
-    pen.lineTo((500, 0))
-    pen.closePath()
-    glyphs['.notdef'] = pen.glyph()
+    glyphs['.notdef'] = notdef_glyph()
+    glyph_bounds = {}
     
-    # 处理SVG文件
-    processed_count = 0
-    for svg_filename in sorted(os.listdir(svg_directory)):
-        if svg_filename.endswith('.svg'):
-            char = svg_filename.replace('.svg', '')
-            char_code = ord(char) if len(char) == 1 else int(char) if char.isdigit() else None
-            
-            if char_code is None:
-                print(f"Skipping {svg_filename}: Could not determine character code")
-                continue
-            
-            # 读取SVG文件
-            svg_path = os.path.join(svg_directory, svg_filename)
-            
-            try:
-                with open(svg_path, 'r', encoding='utf-8') as f:
-                    svg_content = f.read()
-                
-                # 修复 SVG 内容
-                # fixed_svg = fix_svg_path(svg_content)
-                fixed_svg = convert_svg(svg_content)
-                
-                # 提取 SVG 路径数据
-                path_data = extract_svg_paths(fixed_svg)
-                
-                if not path_data:
-                    print(f"Warning: No path data found in {svg_filename}")
-                    continue
-                
-                # 转换为字形
-                glyph = svg_to_glyph(path_data, char_code)
-                
-                if glyph:
-                    # 使用字符或数字作为字形名称
-                    glyph_name = f"uni{char_code:04X}" if char_code > 127 else char
-                    
-                    # 添加到字形表
-                    glyphs[glyph_name] = glyph
-                    glyph_order.append(glyph_name)
-                    char_map[char_code] = glyph_name
-                    processed_count += 1
-                    print(f"Processed {svg_filename} as {glyph_name}")
-            
-            except Exception as e:
-                print(f"Failed to process {svg_filename}: {e}")
+    for glyph_name, char_code, glyph in entries:
+        if glyph_name in glyphs:
+            log.warning(f"Skipping duplicate glyph {glyph_name} (character code {char_code}): keeping the first one")
+            continue
+        if outline_format == 'cff':
+            glyph, glyph_bounds[glyph_name] = glyph_to_charstring(glyph, glyph_metrics(glyph_name)[0])
+        # 添加到字形表
+        glyphs[glyph_name] = glyph
+        glyph_order.append(glyph_name)
+        char_map[char_code] = glyph_name
     
-    if processed_count == 0:
-        print("Error: No valid glyphs were processed. Cannot generate font.")
-        return False
+    if len(glyph_order) == 1:
+        return None
     
     # 设置字形表和映射
     fb.setupGlyphOrder(glyph_order)
+    if aliases:
+        char_map.update(aliases)
     fb.setupCharacterMap(char_map)
-    fb.setupGlyf(glyphs)
-    
-    # 设置水平度量
-    hmtx = {}
-    for glyph_name in glyph_order:
-        # 为每个字形设置宽度和左侧轴承
-        if glyph_name == '.notdef':
-            hmtx[glyph_name] = (500, 0)
-        else:
-            # 可以根据字形的实际宽度调整
-            hmtx[glyph_name] = (800, 50)
-    
-    fb.setupHorizontalMetrics(hmtx)
+    if outline_format == 'cff':
+        glyphs['.notdef'], glyph_bounds['.notdef'] = glyph_to_charstring(glyphs['.notdef'], glyph_metrics('.notdef')[0])
+        setup_metrics(fb, glyph_order)
+        setup_cff(fb, glyphs, glyph_bounds)
+    else:
+        fb.setupGlyf(glyphs)
+        setup_metrics(fb, glyph_order)
+    return fb
+
+def build_font(entries, output_font_path, outline_format=None, aliases=None):
+    """由 (字形名, 字符编码, 字形) 列表组装并保存字体（见 assemble_font）"""
+    fb = assemble_font(entries, output_font_path, outline_format, aliases)
+    if fb is None:
+        print("Error: No valid glyphs were processed. Cannot generate font.")
+        return False
     
-    # 设置必要的表
-    # fb.setupHorizontalHeader(ascent=800, descent=-200)
-    # fb.setupOS2(sTypoAscender=800, sTypoDescender=-200, usWinAscent=800, usWinDescent=200)
+    # 保存字体，扩展名为 .woff/.woff2 时输出压缩的网页字体
+    try:
+        fb.font.flavor = font_flavor(output_font_path)
+        fb.save(output_font_path)
+        print(f"Font successfully generated: {output_font_path}")
+        return True
+    except Exception as e:
+        print(f"Error saving font: {e}")
+        return False
+
+def build_font_streaming(entries, output_font_path, spool_dir=None, outline_format=None, aliases=None):
+    """大字符集模式：与 build_font 输出相同，但 entries 可以是迭代器
+
+    每个字形取出后立即编译为 glyf 字节写入临时文件，内存中只保留偏移与度量，
+    保存时流式写出 glyf/loca。CFF 轮廓本身只在内存中保留字节码，直接交给 build_font。
+    """
+    if outline_format_for(output_font_path, outline_format) == 'cff':
+        return build_font(entries, output_font_path, 'cff', aliases)
+    store = GlyphStore(spool_dir)
+    try:
+        store.add('.notdef', None, notdef_glyph())
+        for glyph_name, char_code, glyph in entries:
+            store.add(glyph_name, char_code, glyph)
+        return save_store(store, output_font_path, aliases)
+    finally:
+        store.close()
+
+def save_store(store, output_font_path, aliases=None):
+    """由 GlyphStore（首个字形为 .notdef）组装并流式保存 TrueType 字体，与 build_font 输出相同"""
+    if len(store) == 1:
+        print("Error: No valid glyphs were processed. Cannot generate font.")
+        return False
     
-    # 设置必要的表
-    fb.setupHorizontalHeader(ascent=900, descent=-100)
-    fb.setupOS2(sTypoAscender=900, sTypoDescender=-100, usWinAscent=900, usWinDescent=100)
-    fb.setupPost()
+    fb = new_font_builder(output_font_path)
+    fb.setupGlyphOrder(store.glyph_order)
+    fb.setupCharacterMap({**store.char_map, **(aliases or {})})
+    setup_metrics(fb, store.glyph_order)
     
-    # 保存字体
     try:
-        fb.save(output_font_path)
+        flavor = font_flavor(output_font_path)
+        if flavor:
+            # 先流式写出 TTF，再整体封装为 WOFF/WOFF2
+            sfnt_path = output_font_path + '.sfnt.tmp'
+            try:
+                save_streaming(fb.font, store, sfnt_path)
+                compress_font(sfnt_path, output_font_path, flavor)
+            finally:
+                if os.path.exists(sfnt_path):
+                    os.remove(sfnt_path)
+        else:
+            save_streaming(fb.font, store, output_font_path)
         print(f"Font successfully generated: {output_font_path}")
         return True
     except Exception as e:
         print(f"Error saving font: {e}")
         return False
 
-def check_font(file_path):
+def generate_font(svg_directory, output_font_path, cache=None, outline_format=None):
+    # 处理SVG文件
+    entries = []
+    for svg_filename in sorted(os.listdir(svg_directory)):
+        if svg_filename.endswith('.svg'):
+            entry = load_glyph(os.path.join(svg_directory, svg_filename), cache)
+            if entry:
+                entries.append(entry)
+    
+    if cache is not None:
+        cache.save()
+        print(cache.stats_line())
+    
+    return build_font(entries, output_font_path, outline_format)
+
+def check_font(file_path, input_dir=None, jobs=1):
+    """检查生成的字体；给出源图目录 input_dir 时把每个字形与源图比较（见 fidelity.check_font），全部通过时返回 True"""
+    if input_dir is not None:
+        # fidelity 依赖 OpenCV，只在需要时导入
+        import fidelity
+        return not fidelity.check_font(file_path, input_dir, jobs)
     try:
         font = TTFont(file_path)
         
@@ -274,9 +503,28 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate font from SVG images.")
     parser.add_argument('svg_directory', type=str, help='Directory containing the SVG images')
     parser.add_argument('output_font_path', type=str, help='Output path for the generated font file')
+    parser.add_argument('--cache', type=str, default=None, help='Directory of the incremental glyph cache')
+    parser.add_argument('--cache-size', type=int, default=512, help='Glyph cache size limit in MB')
+    parser.add_argument('--simplify', type=float, default=0.0,
+                        help='Outline simplification tolerance in font units (0 = off)')
+    parser.add_argument('--outlines', choices=OUTLINE_FORMATS, default=None,
+                        help='Outline format (default: cff for .otf, truetype otherwise)')
+    parser.add_argument('--images', type=str, default=None,
+                        help='Directory of the source images; compare every glyph with its image after the build')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Worker processes for the --images check (0 = all CPU cores)')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Log every processed glyph')
     args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format='%(message)s')
+    set_simplify_tolerance(args.simplify)
+    try:
+        font_flavor(args.output_font_path)
+    except ImportError as e:
+        parser.error(str(e))
     
     print(f'Generating font from {args.svg_directory} to {args.output_font_path}')
     
-    if generate_font(args.svg_directory, args.output_font_path):
-        check_font(args.output_font_path)
+    cache = GlyphCache(args.cache, args.cache_size * 1024 * 1024) if args.cache else None
+    if not generate_font(args.svg_directory, args.output_font_path, cache, args.outlines) or \
+            not check_font(args.output_font_path, args.images, args.jobs or os.cpu_count()):
+        raise SystemExit(1)
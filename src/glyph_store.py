@@ -0,0 +1,212 @@
+import logging
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from fontTools.misc import sstruct
+from fontTools.ttLib import getSearchRange, getTableClass
+from fontTools.ttLib.sfnt import SFNTDirectoryEntry, calcChecksum, sfntDirectoryFormat, sfntDirectorySize, sfntDirectoryEntrySize
+from fontTools.ttLib.ttFont import sortedTagList
+
+log = logging.getLogger(__name__)
+
+# 写出 glyf 时的缓冲区大小，需为 4 的倍数以便分块计算校验和
+COPY_BLOCK_SIZE = 1 << 20
+
+class GlyphStore:
+    """大字符集构建用的字形存储
+
+    字形一产生即编译为 glyf 字节并追加到临时文件，内存中只保留
+    数组形式的长度、边界框与 maxp 统计量，峰值内存基本与字形数量无关。
+    """
+
+    def __init__(self, spool_dir=None):
+        self.spool = tempfile.TemporaryFile(dir=spool_dir)
+        self.glyph_order = []
+        self.glyph_names = set()
+        self.char_map = {}
+        self.lengths = array('I')
+        # 每个字形的 xMin, yMin, xMax, yMax
+        self.bounds = array('i')
+        self.num_points = array('I')
+        self.num_contours = array('i')
+        self.size = 0
+
+    def add(self, glyph_name, char_code, glyph):
+        """编译并写入一个字形，之后即可丢弃 glyph 对象；字形名已存在时记录警告并跳过"""
+        if self.skip_duplicate(glyph_name, char_code):
+            return
+        # 编译时重新计算边界框
+        data = glyph.compile(None)
+        if glyph.numberOfContours:
+            bounds = (glyph.xMin, glyph.yMin, glyph.xMax, glyph.yMax)
+            num_points, num_contours = len(glyph.coordinates), len(glyph.endPtsOfContours)
+        else:
+            bounds, num_points, num_contours = (0, 0, 0, 0), 0, 0
+        self.add_compiled(glyph_name, char_code, data, bounds, num_points, num_contours)
+
+    def add_compiled(self, glyph_name, char_code, data, bounds, num_points, num_contours):
+        """写入已编译的 glyf 字节及其度量（例如取自分片存储，见 shard）；字形名已存在时记录警告并跳过"""
+        if self.skip_duplicate(glyph_name, char_code):
+            return
+        self.spool.write(data)
+        self.lengths.append(len(data))
+        self.size += len(data)
+        self.glyph_order.append(glyph_name)
+        self.glyph_names.add(glyph_name)
+        if char_code is not None:
+            self.char_map[char_code] = glyph_name
+        self.bounds.extend(bounds)
+        self.num_points.append(num_points)
+        self.num_contours.append(num_contours)
+
+    def skip_duplicate(self, glyph_name, char_code):
+        """字形名已写入时返回 True；重复的名称会使 fontTools 另起 "名称.1" 之类的字形，因此不写入"""
+        if glyph_name not in self.glyph_names:
+            return False
+        log.warning(f"Skipping duplicate glyph {glyph_name} (character code {char_code}): keeping the first one")
+        return True
+
+    def __len__(self):
+        return len(self.glyph_order)
+
+    def close(self):
+        self.spool.close()
+
+def update_derived_tables(font, glyph_order, bounds, num_points, num_contours):
+    """按各字形的度量更新 head/maxp/hhea，与 fontTools 在 recalcBBoxes 时的计算一致
+
+    bounds 为每个字形依次排列的 xMin, yMin, xMax, yMax，num_contours 为 0 的字形没有轮廓。
+    """
+    head, maxp, hhea, hmtx = font['head'], font['maxp'], font['hhea'], font['hmtx']
+    outlined = [i for i in range(len(glyph_order)) if num_contours[i] != 0]
+    if outlined:
+        head.xMin = min(bounds[4 * i] for i in outlined)
+        head.yMin = min(bounds[4 * i + 1] for i in outlined)
+        head.xMax = max(bounds[4 * i + 2] for i in outlined)
+        head.yMax = max(bounds[4 * i + 3] for i in outlined)
+    else:
+        head.xMin = head.yMin = head.xMax = head.yMax = 0
+    all_xmin_is_lsb = all(hmtx[glyph_order[i]][1] == bounds[4 * i] for i in outlined)
+    head.flags = head.flags | 0x2 if all_xmin_is_lsb else head.flags & ~0x2
+
+    maxp.numGlyphs = len(glyph_order)
+    maxp.maxPoints = max(num_points, default=0)
+    maxp.maxContours = max(num_contours, default=0)
+
+    hhea.advanceWidthMax = max(advance for advance, _ in hmtx.metrics.values())
+    if outlined:
+        min_lsb = min_rsb = float('inf')
+        max_extent = -float('inf')
+        for i in outlined:
+            advance, lsb = hmtx[glyph_order[i]]
+            width = bounds[4 * i + 2] - bounds[4 * i]
+            min_lsb = min(min_lsb, lsb)
+            min_rsb = min(min_rsb, advance - lsb - width)
+            max_extent = max(max_extent, lsb + width)
+        hhea.minLeftSideBearing, hhea.minRightSideBearing, hhea.xMaxExtent = min_lsb, min_rsb, max_extent
+    else:
+        hhea.minLeftSideBearing = hhea.minRightSideBearing = hhea.xMaxExtent = 0
+
+def _glyf_layout(store):
+    """计算 loca 偏移；与 fontTools 相同，能用短格式时为奇数长度的字形补一个字节"""
+    odd = sum(1 for length in store.lengths if length % 2)
+    pad_odd = store.size < 0x20000 and store.size + odd < 0x20000
+    locations = array('I', [0])
+    for length in store.lengths:
+        locations.append(locations[-1] + length + (length % 2 if pad_odd else 0))
+    if locations[-1] < 0x20000 and all(location % 2 == 0 for location in locations):
+        loca = array('H', (location // 2 for location in locations))
+        index_to_loc_format = 0
+    else:
+        loca = locations
+        index_to_loc_format = 1
+    if sys.byteorder != 'big':
+        loca.byteswap()
+    return pad_odd, loca.tobytes(), index_to_loc_format
+
+def _write_glyf(store, out, pad_odd):
+    """从临时文件流式写出 glyf，返回 (长度, 校验和)"""
+    store.spool.seek(0)
+    buffer = bytearray()
+    checksum = 0
+    length = 0
+    for size in store.lengths:
+        buffer += store.spool.read(size)
+        if pad_odd and size % 2:
+            buffer += b'\0'
+        if len(buffer) >= COPY_BLOCK_SIZE:
+            block = bytes(buffer[:COPY_BLOCK_SIZE])
+            del buffer[:COPY_BLOCK_SIZE]
+            checksum = (checksum + calcChecksum(block)) & 0xFFFFFFFF
+            out.write(block)
+            length += len(block)
+    if length == 0 and not buffer:
+        # 与 fontTools 一致：全部字形为空时写入一个零字节
+        buffer = bytearray(b'\0')
+    checksum = (checksum + calcChecksum(bytes(buffer))) & 0xFFFFFFFF
+    out.write(buffer)
+    length += len(buffer)
+    return length, checksum
+
+def save_streaming(font, store, output_path):
+    """写出 TrueType 字体：除 glyf 外的表由 fontTools 编译，glyf/loca 由存储流式生成
+
+    表的排列顺序、填充与校验和计算与 TTFont.save 相同。
+    """
+    update_derived_tables(font, store.glyph_order, store.bounds, store.num_points, store.num_contours)
+    pad_odd, loca_data, font['head'].indexToLocFormat = _glyf_layout(store)
+    font.recalcBBoxes = False
+    font['head'].checkSumAdjustment = 0
+
+    # 按 TTFont.save 的依赖顺序编译（例如 hmtx 须先于 hhea，以确定 numberOfHMetrics）
+    tables = {'loca': loca_data}
+    done = ['glyf', 'loca']
+    def compile_table(tag):
+        if tag in done:
+            return
+        for dependency in getTableClass(tag).dependencies:
+            if dependency in font:
+                compile_table(dependency)
+        done.append(tag)
+        tables[tag] = font[tag].compile(font)
+    for tag in font.keys():
+        if tag != 'GlyphOrder':
+            compile_table(tag)
+    tags = sortedTagList(list(tables) + ['glyf'])
+
+    entries = {}
+    tmp_path = output_path + '.tmp'
+    with open(tmp_path, 'wb') as out:
+        directory_size = sfntDirectorySize + len(tags) * sfntDirectoryEntrySize
+        out.write(b'\0' * directory_size)
+        for tag in tags:
+            entry = SFNTDirectoryEntry()
+            entry.tag = tag
+            entry.offset = out.tell()
+            if tag == 'glyf':
+                entry.length, entry.checkSum = _write_glyf(store, out, pad_odd)
+            else:
+                data = tables[tag]
+                entry.length = len(data)
+                entry.checkSum = calcChecksum(data)
+                out.write(data)
+            out.write(b'\0' * (-entry.length % 4))
+            entries[tag] = entry
+
+        header = type('SFNTHeader', (), {})()
+        header.sfntVersion = b'\0\1\0\0'
+        header.numTables = len(tags)
+        header.searchRange, header.entrySelector, header.rangeShift = getSearchRange(len(tags), 16)
+        directory = sstruct.pack(sfntDirectoryFormat, header)
+        for tag in sorted(entries):
+            directory += entries[tag].toString()
+
+        # head 的 checkSumAdjustment 按整个文件计算
+        checksum = (sum(entry.checkSum for entry in entries.values()) + calcChecksum(directory)) & 0xFFFFFFFF
+        out.seek(entries['head'].offset + 8)
+        out.write(struct.pack('>L', (0xB1B0AFBA - checksum) & 0xFFFFFFFF))
+        out.seek(0)
+        out.write(directory)
+    os.replace(tmp_path, output_path)
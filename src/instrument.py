@@ -0,0 +1,102 @@
+import cProfile
+import heapq
+import json
+import pstats
+import time
+from contextlib import contextmanager
+
+# 单字形剖析时打印的函数条数
+PROFILE_LINES = 30
+
+@contextmanager
+def timed(records, glyph, stage):
+    """记录一个阶段的耗时；调用方可在产出的字典中补充 vertices、segments、bytes 等计数
+
+    records 为 None 时不做记录，只有一次 perf_counter 的开销。
+    """
+    record = {'glyph': glyph, 'stage': stage}
+    start = time.perf_counter()
+    yield record
+    record['seconds'] = time.perf_counter() - start
+    if records is not None:
+        records.append(record)
+
+@contextmanager
+def profiled(glyph, enabled=True, output_path=None):
+    """在 cProfile 下运行代码块；给定 output_path 时写出 .prof 文件，否则打印累计耗时最多的函数"""
+    if not enabled:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        if output_path:
+            profiler.dump_stats(output_path)
+            print(f"Profile of {glyph} written to {output_path}")
+        else:
+            print(f"--- Profile of {glyph} ---")
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(PROFILE_LINES)
+
+class BuildStats:
+    """汇总各字形各阶段的记录，可选地逐条写出 JSON lines
+
+    内存中只保留每个字形的合计值，记录本身直接写入文件，不随字形数累积。
+    """
+
+    def __init__(self, jsonl_path=None):
+        self.file = open(jsonl_path, 'w', encoding='utf-8') if jsonl_path else None
+        self.stage_totals = {}
+        self.glyph_seconds = {}
+        self.glyph_vertices = {}
+        self.glyph_bytes = {}
+        # 轮廓优化前后的点数与字节数合计
+        self.simplify_totals = [0, 0, 0, 0]
+
+    def add(self, records):
+        """加入一个字形的阶段记录"""
+        for record in records:
+            if self.file:
+                self.file.write(json.dumps(record) + '\n')
+            glyph, stage, seconds = record['glyph'], record['stage'], record['seconds']
+            totals = self.stage_totals.setdefault(stage, [0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+            self.glyph_seconds[glyph] = self.glyph_seconds.get(glyph, 0.0) + seconds
+            if stage == 'convert_svg':
+                self.glyph_vertices[glyph] = record.get('vertices', 0)
+            elif stage == 'trace':
+                self.glyph_bytes[glyph] = record.get('bytes', 0)
+            elif stage == 'svg_to_glyph' and 'vertices_before' in record:
+                for i, key in enumerate(('vertices_before', 'vertices', 'bytes_before', 'bytes')):
+                    self.simplify_totals[i] += record[key]
+
+    def add_stage(self, stage, seconds):
+        """加入与单个字形无关的整体阶段（如字体保存）"""
+        self.add([{'glyph': None, 'stage': stage, 'seconds': seconds}])
+        self.glyph_seconds.pop(None, None)
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def summary_lines(self, top=10):
+        """各阶段合计，以及耗时最多与轮廓最大的 top 个字形"""
+        lines = [f"{'stage':<16}{'count':>8}{'total s':>10}{'mean ms':>10}"]
+        for stage, (count, seconds) in self.stage_totals.items():
+            lines.append(f"{stage:<16}{count:>8}{seconds:>10.3f}{seconds / count * 1000:>10.3f}")
+        points_before, points_after, bytes_before, bytes_after = self.simplify_totals
+        if bytes_before:
+            lines.append(f"Simplify: {points_before} -> {points_after} points, "
+                         f"{bytes_before} -> {bytes_after} glyf bytes ({bytes_after / bytes_before:.1%})")
+        if top:
+            lines.append(f"\nSlowest {top} glyphs:")
+            for glyph, seconds in heapq.nlargest(top, self.glyph_seconds.items(), key=lambda item: item[1]):
+                lines.append(f"  {glyph:<12}{seconds * 1000:>10.2f} ms")
+            lines.append(f"\nLargest {top} glyphs:")
+            for glyph, vertices in heapq.nlargest(top, self.glyph_vertices.items(), key=lambda item: item[1]):
+                lines.append(f"  {glyph:<12}{vertices:>8} vertices{self.glyph_bytes.get(glyph, 0):>10} SVG bytes")
+        return lines
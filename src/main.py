@@ -1,38 +1,562 @@
 import argparse
+import logging
 import os
-from preprocess import preprocess_image, preprocess_image_otsu
-from bitmap import bitmap_to_svg
-from generate_font import generate_font
+import sys
+import time
+from contextlib import nullcontext
+from itertools import chain, islice, repeat
+try:
+    import resource
+except ImportError:
+    # Windows 没有 resource 模块
+    resource = None
+from preprocess import (preprocess_image_otsu, preprocess_images_otsu, preprocess_gray_otsu, set_normalize_size,
+                        normalize_params, CONTRAST_FACTOR, OTSU_MEDIAN_KERNEL)
+from bitmap import OPTTOLERANCE, ALPHAMAX, TRACE_TIMEOUT
+from tracer import TRACERS, BATCH_TRACERS, TRACER_VERSIONS
+from generate_font import (glyph_from_svg, glyph_cache_key, build_font, build_font_streaming, set_simplify_tolerance,
+                           char_code_from_name, OUTLINE_FORMATS)
+from cache import GlyphCache, content_key
+from instrument import BuildStats, timed, profiled
+from webfont import font_flavor
+from dedup import DedupIndex, bitmap_signature, pack_bitmap, unpack_bitmap, SIGNATURE_VERSION
+
+# 每批处理的字形数，限制结果在父进程中的驻留量
+BATCH_SIZE = 256
+
+log = logging.getLogger(__name__)
+
+def list_images(input_dir):
+    """按文件名排序列出输入目录中的 PNG，保证字形顺序与工作进程数无关"""
+    return sorted(f for f in os.listdir(input_dir) if f.endswith('.png'))
+
+def trace_params(tracer='potrace'):
+    """影响预处理 + 描摹阶段 SVG 输出的全部参数"""
+    params = {
+        'stage': 'trace',
+        'tracer': tracer,
+        'version': TRACER_VERSIONS[tracer],
+        'contrast': CONTRAST_FACTOR,
+        'median_kernel': OTSU_MEDIAN_KERNEL,
+        'opttolerance': OPTTOLERANCE,
+        'alphamax': ALPHAMAX,
+    }
+    params.update(normalize_params())
+    return params
+
+def trace_cache_key(image_bytes, tracer='potrace'):
+    """预处理 + 描摹阶段的缓存键，包含影响 SVG 输出的全部参数"""
+    return content_key(image_bytes, trace_params(tracer))
+
+def image_trace_key(input_dir, image_filename, tracer='potrace'):
+    """读取图像文件并计算描摹缓存键"""
+    with open(os.path.join(input_dir, image_filename), 'rb') as f:
+        return trace_cache_key(f.read(), tracer)
+
+def lookup_cache(cache, input_dir, image_filename, tracer='potrace', use_cached=True):
+    """查询一个图像的缓存，返回 (描摹缓存键, 缓存的 SVG 或 None, 缓存的字形或 None)
+
+    描摹结果与字形都命中时可直接复用字形，只命中描摹结果时可跳过预处理与描摹。
+    use_cached 为假时只计算缓存键（例如被剖析的字形，结果仍写回）。
+    """
+    trace_key = image_trace_key(input_dir, image_filename, tracer)
+    if not use_cached:
+        return trace_key, None, None
+    cached_svg = cache.get(trace_key)
+    if cached_svg is None:
+        return trace_key, None, None
+    return trace_key, cached_svg, cache.get(glyph_cache_key(cached_svg, os.path.splitext(image_filename)[0]))
+
+def store_cache(cache, trace_key, image_filename, svg_content, entry):
+    """写回一个图像的描摹结果与字形"""
+    cache.put(trace_key, svg_content)
+    if entry:
+        cache.put(glyph_cache_key(svg_content, os.path.splitext(image_filename)[0]), entry)
+
+def init_worker(simplify=0.0, normalize=0):
+    """设置轮廓优化容差与归一化尺寸；也用作进程池的 initializer，使工作进程取得与父进程相同的参数"""
+    set_simplify_tolerance(simplify)
+    set_normalize_size(normalize)
+
+def debug_paths(input_dir, base_name, debug):
+    """debug 时中间结果（二值化图像与 SVG）的输出路径，否则为 (None, None)"""
+    if not debug:
+        return None, None
+    return (os.path.join(input_dir, 'processed', f'{base_name}_processed.png'),
+            os.path.join(input_dir, 'char_svg', f'{base_name}.svg'))
+
+def process_glyph(input_dir, image_filename, debug=False, svg_content=None, tracer='potrace', instrument=False,
+                  profile=None):
+    """单个字形的完整流水线：预处理 → 描摹 → SVG 转字形，返回 (SVG 文本, (字形名, 字符编码, 字形) 或 None, 阶段记录)
+
+    二值化数组直接交给描摹后端（potrace 经由管道，SVG 从标准输出读回）；
+    仅在 debug 时把中间结果写入 processed/ 与 char_svg/。
+    传入 svg_content（缓存命中）时跳过预处理与描摹。
+    tracer 为 TRACERS 中的描摹后端名称。
+    instrument 为真时返回各阶段的记录列表（见 instrument.timed），否则为 None。
+    profile 为 (字形名, 输出路径或 None)，处理该字形时启用 cProfile。
+    """
+    base_name = os.path.splitext(image_filename)[0]
+    records = [] if instrument else None
+    with profiled(base_name, profile is not None and profile[0] == base_name, profile and profile[1]):
+        if svg_content is None:
+            processed_image_path, svg_path = debug_paths(input_dir, base_name, debug)
 
-def main(input_dir, output_font_path):
-    processed_dir = os.path.join(input_dir, 'processed')
-    svg_dir = os.path.join(input_dir, 'char_svg')
-    os.makedirs(processed_dir, exist_ok=True)
-    os.makedirs(svg_dir, exist_ok=True)
-
-    # 处理输入目录中的所有图像
-    for image_filename in os.listdir(input_dir):
-        if image_filename.endswith('.png'):
-            base_name = os.path.splitext(image_filename)[0]
-            processed_image_path = os.path.join(processed_dir, f'{base_name}_processed.png')
-            svg_path = os.path.join(svg_dir, f'{base_name}.svg')
-            
             # 图像预处理和转换
             # 采用 otsu 方法二值化
             # preprocess_image(os.path.join(input_dir, image_filename), processed_image_path)
-            preprocess_image_otsu(os.path.join(input_dir, image_filename), processed_image_path)
-            bitmap_to_svg(processed_image_path, svg_path)
+            with timed(records, base_name, 'preprocess') as record:
+                img_np = preprocess_image_otsu(os.path.join(input_dir, image_filename), processed_image_path)
+                record['bytes'] = img_np.nbytes
+            with timed(records, base_name, 'trace') as record:
+                svg_content = TRACERS[tracer](img_np, svg_path)
+                record['bytes'] = len(svg_content)
+        entry = glyph_from_svg(svg_content, base_name, records=records)
+    return svg_content, entry, records
+
+def process_glyph_chunk(input_dir, image_filenames, debug=False, svg_contents=None, tracer='potrace', instrument=False,
+                        profile=None):
+    """批量描摹模式下处理一组字形：整组预处理（见 preprocess_images_otsu）后由 BATCH_TRACERS 的后端一次描摹，
+    返回与 process_glyph 相同的三元组列表
+
+    描摹失败的字形记录警告并返回 (None, None, 阶段记录)，不影响同组其他字形。
+    被剖析的字形单独走 process_glyph。
+    """
+    svg_contents = list(svg_contents or [None] * len(image_filenames))
+    base_names = [os.path.splitext(image_filename)[0] for image_filename in image_filenames]
+    records = [[] if instrument else None for _ in image_filenames]
+    outputs = [None] * len(image_filenames)
+
+    to_trace = []
+    for index, (image_filename, base_name) in enumerate(zip(image_filenames, base_names)):
+        if profile is not None and profile[0] == base_name:
+            outputs[index] = process_glyph(input_dir, image_filename, debug, svg_contents[index], tracer, instrument,
+                                           profile)
+        elif svg_contents[index] is None:
+            to_trace.append(index)
+
+    if to_trace:
+        # 同尺寸的图像堆叠后一起预处理，耗时同样平均分摊
+        start = time.perf_counter()
+        images = preprocess_images_otsu([os.path.join(input_dir, image_filenames[i]) for i in to_trace],
+                                        [debug_paths(input_dir, base_names[i], debug)[0] for i in to_trace])
+        seconds = (time.perf_counter() - start) / len(to_trace)
+        for position, index in enumerate(to_trace):
+            if records[index] is not None:
+                records[index].append({'glyph': base_names[index], 'stage': 'preprocess', 'batch': len(to_trace),
+                                       'bytes': images[position].nbytes, 'seconds': seconds})
+
+        start = time.perf_counter()
+        svgs, errors = BATCH_TRACERS[tracer](images, [debug_paths(input_dir, base_names[i], debug)[1] for i in to_trace])
+        # 整批的描摹耗时平均分摊到各字形
+        seconds = (time.perf_counter() - start) / len(to_trace)
+        for position, index in enumerate(to_trace):
+            if records[index] is not None:
+                records[index].append({'glyph': base_names[index], 'stage': 'trace', 'batch': len(to_trace),
+                                       'bytes': len(svgs[position] or ''), 'seconds': seconds})
+            if position in errors:
+                log.warning(f"Failed to trace {image_filenames[index]}: {errors[position]}")
+                outputs[index] = (None, None, records[index])
+            svg_contents[index] = svgs[position]
+
+    for index, base_name in enumerate(base_names):
+        if outputs[index] is None:
+            entry = glyph_from_svg(svg_contents[index], base_name, records=records[index])
+            outputs[index] = (svg_contents[index], entry, records[index])
+    return outputs
+
+def process_cell(cell, char, debug_dir=None, tracer='potrace', instrument=False):
+    """模板页中的一个格子：与 process_glyph 相同的流水线，输入为灰度数组（格子视图）而非图像文件"""
+    records = [] if instrument else None
+    processed_image_path, svg_path = debug_paths(debug_dir, char, debug_dir is not None)
+    with timed(records, char, 'preprocess') as record:
+        img_np = preprocess_gray_otsu(cell, processed_image_path)
+        record['bytes'] = img_np.nbytes
+    with timed(records, char, 'trace') as record:
+        svg_content = TRACERS[tracer](img_np, svg_path)
+        record['bytes'] = len(svg_content)
+    return svg_content, glyph_from_svg(svg_content, char, f"cell {char}", records=records), records
+
+def iter_sheet_entries(input_dir, executor=None, jobs=1, debug=False, tracer='potrace', stats=None):
+    """逐页处理目录中的模板页（见 sheet.list_sheets），按页序与格子的行优先顺序产出字形
+
+    每页只解码一次，格子以切片视图送入预处理；有进程池时格子按批分发到工作进程。
+    同一字符（按码位）出现在多个格子中时只保留最先出现的一个，其余格子不做处理。
+    """
+    from sheet import list_sheets, iter_sheet_cells
+    debug_dir = input_dir if debug else None
+    # 码位 → 首次出现的 (页, (行, 列))
+    seen = {}
+
+    def first_occurrences(sheet_name, cells):
+        for position, char, cell in cells:
+            char_code = char_code_from_name(char)
+            if char_code in seen:
+                first_sheet, first_position = seen[char_code]
+                log.warning(f"Dropping {char} in {sheet_name} cell {position}: "
+                            f"already taken from {first_sheet} cell {first_position}")
+                continue
+            if char_code is not None:
+                seen[char_code] = (sheet_name, position)
+            yield char, cell
+
+    for sheet_name in list_sheets(input_dir):
+        try:
+            cells = first_occurrences(sheet_name, iter_sheet_cells(os.path.join(input_dir, sheet_name)))
+        except ValueError as e:
+            log.warning(f"Skipping sheet {sheet_name}: {e}")
+            continue
+        while True:
+            batch = list(islice(cells, BATCH_SIZE))
+            if not batch:
+                break
+            chars = [char for char, _ in batch]
+            views = [cell for _, cell in batch]
+            if executor is not None:
+                outputs = executor.map(process_cell, views, chars, repeat(debug_dir), repeat(tracer),
+                                       repeat(stats is not None), chunksize=max(1, len(batch) // (jobs * 4)))
+            else:
+                outputs = (process_cell(cell, char, debug_dir, tracer, stats is not None) for cell, char in zip(views, chars))
+            for _, entry, records in outputs:
+                if records:
+                    stats.add(records)
+                if entry:
+                    yield entry
+
+def signature_cache_key(trace_key):
+    """位图签名的缓存键，由描摹缓存键派生（签名只取决于图像与预处理参数，它们都已包含在描摹键中）"""
+    return content_key(trace_key.encode('ascii'), {'stage': 'signature', 'version': SIGNATURE_VERSION})
+
+def preprocess_signature(input_dir, image_filename, debug=False, instrument=False):
+    """去重的第一阶段：预处理一个图像，返回 (位图签名, 打包的二值化位图, 阶段记录)"""
+    base_name = os.path.splitext(image_filename)[0]
+    records = [] if instrument else None
+    processed_image_path, _ = debug_paths(input_dir, base_name, debug)
+    with timed(records, base_name, 'preprocess') as record:
+        img_np = preprocess_image_otsu(os.path.join(input_dir, image_filename), processed_image_path)
+        record['bytes'] = img_np.nbytes
+    with timed(records, base_name, 'dedup'):
+        signature = bitmap_signature(img_np)
+    return signature, pack_bitmap(img_np), records
+
+def trace_unique(input_dir, image_filename, bitmap=None, debug=False, svg_content=None, tracer='potrace',
+                 instrument=False):
+    """去重的第二阶段：描摹一个新形状，返回与 process_glyph 相同的三元组
+
+    bitmap 为第一阶段打包的二值化位图；签名来自缓存而没有位图时，按 process_glyph 从头处理。
+    """
+    if bitmap is None and svg_content is None:
+        return process_glyph(input_dir, image_filename, debug, None, tracer, instrument)
+    base_name = os.path.splitext(image_filename)[0]
+    records = [] if instrument else None
+    if svg_content is None:
+        _, svg_path = debug_paths(input_dir, base_name, debug)
+        with timed(records, base_name, 'trace') as record:
+            svg_content = TRACERS[tracer](unpack_bitmap(bitmap), svg_path)
+            record['bytes'] = len(svg_content)
+    return svg_content, glyph_from_svg(svg_content, base_name, records=records), records
+
+def iter_unique_entries(input_dir, image_filenames, index, executor=None, jobs=1, debug=False, cache=None,
+                        tracer='potrace', stats=None):
+    """去重模式：按文件名顺序逐批处理图像，每个不同的形状只描摹一次，依次产出代表形状的字形
+
+    每批先预处理并计算位图签名（见 dedup.bitmap_signature），按出现顺序与 index 中已有的形状匹配；
+    重复的图像不再描摹，其字符编码记入 index.aliases，在 cmap 中映射到代表形状的字形。
+    文件内容与已处理的图像完全相同时（按描摹缓存键判断）连预处理也跳过。
+    缓存命中时签名、SVG 与字形都从缓存读取，结果与进程数、缓存无关。
+    """
+    instrument = stats is not None
+
+    def run(function, *columns):
+        if executor is not None and columns[0]:
+            chunksize = max(1, len(columns[0]) // (jobs * 4))
+            return executor.map(function, repeat(input_dir), *columns, chunksize=chunksize)
+        return (function(input_dir, *args) for args in zip(*columns))
+
+    for batch_start in range(0, len(image_filenames), BATCH_SIZE):
+        batch = image_filenames[batch_start:batch_start + BATCH_SIZE]
+        lookups = [lookup_cache(cache, input_dir, image_filename, tracer) if cache is not None
+                   else (image_trace_key(input_dir, image_filename, tracer), None, None) for image_filename in batch]
+
+        # 第一阶段：签名未缓存的图像在工作进程中预处理，二值化位图打包后带回，供第二阶段描摹；
+        # 与已有形状或本批中较早的图像字节相同的图像不必处理
+        signatures = [None] * len(batch)
+        bitmaps = [None] * len(batch)
+        missing = []
+        firsts = set()
+        for i, (trace_key, _, _) in enumerate(lookups):
+            if trace_key in index.sources or trace_key in firsts:
+                continue
+            firsts.add(trace_key)
+            if cache is not None:
+                signatures[i] = cache.get(signature_cache_key(trace_key))
+            if signatures[i] is None:
+                missing.append(i)
+        outputs = run(preprocess_signature, [batch[i] for i in missing], repeat(debug, len(missing)),
+                      repeat(instrument, len(missing)))
+        for i, (signature, bitmap, records) in zip(missing, outputs):
+            signatures[i], bitmaps[i] = signature, bitmap
+            if records:
+                stats.add(records)
+            if cache is not None:
+                cache.put(signature_cache_key(lookups[i][0]), signature)
+
+        # 按文件名顺序匹配，新形状成为代表形状
+        shapes = []
+        duplicates = []
+        for i, image_filename in enumerate(batch):
+            shape = index.sources.get(lookups[i][0])
+            if shape is None:
+                shape = index.match(signatures[i])
+                if shape is None:
+                    shape = index.add(signatures[i])
+                    shapes.append((i, shape))
+                else:
+                    duplicates.append((image_filename, shape))
+                index.sources[lookups[i][0]] = shape
+            else:
+                duplicates.append((image_filename, shape))
+
+        # 第二阶段：描摹字形未缓存的代表形状
+        results = {i: lookups[i][2] for i, _ in shapes}
+        pending = [i for i, _ in shapes if results[i] is None]
+        outputs = run(trace_unique, [batch[i] for i in pending], [bitmaps[i] for i in pending],
+                      repeat(debug, len(pending)), [lookups[i][1] for i in pending], repeat(tracer, len(pending)),
+                      repeat(instrument, len(pending)))
+        for i, (svg_content, entry, records) in zip(pending, outputs):
+            results[i] = entry
+            if records:
+                stats.add(records)
+            if cache is not None and svg_content is not None:
+                store_cache(cache, lookups[i][0], batch[i], svg_content, entry)
+
+        for i, shape in shapes:
+            if results[i]:
+                index.glyph_names[shape] = results[i][0]
+        for image_filename, shape in duplicates:
+            char_code = char_code_from_name(os.path.splitext(image_filename)[0])
+            glyph_name = index.glyph_names[shape]
+            if char_code is None or glyph_name is None:
+                continue
+            index.aliases[char_code] = glyph_name
+            index.duplicates += 1
+            log.info(f"{image_filename} shares glyph {glyph_name}")
+        for i, _ in shapes:
+            if results[i]:
+                yield results[i]
+
+def iter_glyph_entries(input_dir, image_filenames, executor=None, jobs=1, debug=False, cache=None, tracer='potrace',
+                       stats=None, profile=None, trace_batch=1, scheduler=None):
+    """按文件名顺序逐批处理图像，依次产出有效的 (字形名, 字符编码, 字形)
+
+    每批 BATCH_SIZE 个字形，处理完一批才读取下一批，内存占用与字形总数无关。
+    给定 stats（instrument.BuildStats）时收集各字形各阶段的记录；
+    profile 指定的字形不读缓存，以便完整剖析。
+    trace_batch > 1 且后端支持批量描摹时，每 trace_batch 个字形合为一个任务，共用一次描摹进程。
+    给定 scheduler（trace_scheduler.TraceScheduler）时由其异步调度 potrace，预处理仍在进程池（如有）中并行。
+    """
+    for batch_start in range(0, len(image_filenames), BATCH_SIZE):
+        batch = image_filenames[batch_start:batch_start + BATCH_SIZE]
+
+        # 先查缓存：描摹结果与字形都命中则直接复用，只命中描摹结果时跳过预处理与描摹
+        results = [None] * len(batch)
+        pending = []
+        trace_keys = {}
+        for index, image_filename in enumerate(batch):
+            cached_svg = None
+            if cache is not None:
+                # 被剖析的字形不读缓存（结果仍写回）
+                use_cached = not (profile and profile[0] == os.path.splitext(image_filename)[0])
+                trace_keys[index], cached_svg, entry = lookup_cache(cache, input_dir, image_filename, tracer, use_cached)
+                if entry is not None:
+                    results[index] = entry
+                    continue
+            pending.append((index, image_filename, cached_svg))
+
+        # 处理输入目录中的所有图像
+        # 有进程池时将每个字形分发到工作进程，父进程只负责组装字体；
+        # map 按提交顺序返回结果，因此输出与进程数无关
+        indices = [index for index, _, _ in pending]
+        filenames = [image_filename for _, image_filename, _ in pending]
+        cached_svgs = [cached_svg for _, _, cached_svg in pending]
+        instrument = stats is not None
+        if scheduler is not None and pending:
+            outputs = scheduler.process(input_dir, filenames, cached_svgs, debug, instrument, executor, jobs)
+        elif trace_batch > 1 and tracer in BATCH_TRACERS and pending:
+            # 批量描摹：每个任务处理一组字形
+            filename_chunks = [filenames[i:i + trace_batch] for i in range(0, len(filenames), trace_batch)]
+            svg_chunks = [cached_svgs[i:i + trace_batch] for i in range(0, len(cached_svgs), trace_batch)]
+            if executor is not None:
+                chunk_outputs = executor.map(process_glyph_chunk, repeat(input_dir), filename_chunks, repeat(debug),
+                                             svg_chunks, repeat(tracer), repeat(instrument), repeat(profile))
+            else:
+                chunk_outputs = (process_glyph_chunk(input_dir, f, debug, svgs, tracer, instrument, profile)
+                                 for f, svgs in zip(filename_chunks, svg_chunks))
+            outputs = chain.from_iterable(chunk_outputs)
+        elif executor is not None and pending:
+            chunksize = max(1, len(pending) // (jobs * 4))
+            outputs = executor.map(process_glyph, repeat(input_dir), filenames, repeat(debug), cached_svgs,
+                                   repeat(tracer), repeat(instrument), repeat(profile), chunksize=chunksize)
+        else:
+            outputs = (process_glyph(input_dir, f, debug, svg, tracer, instrument, profile)
+                       for f, svg in zip(filenames, cached_svgs))
+
+        for index, image_filename, (svg_content, entry, records) in zip(indices, filenames, outputs):
+            results[index] = entry
+            if records:
+                stats.add(records)
+            if cache is not None and svg_content is not None:
+                store_cache(cache, trace_keys[index], image_filename, svg_content, entry)
+
+        for entry in results:
+            if entry:
+                yield entry
+
+def peak_rss_line():
+    """本进程与已结束的工作进程的峰值常驻内存"""
+    if resource is None:
+        return "Peak RSS: unavailable on this platform"
+    # Linux 上 ru_maxrss 以 KB 为单位，macOS 上以字节为单位
+    unit = 1 if sys.platform == 'darwin' else 1024
+    parent = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+    workers = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit
+    return f"Peak RSS: {parent / (1024 * 1024):.1f} MB (workers: {workers / (1024 * 1024):.1f} MB)"
+
+def main(input_dir, output_font_path, jobs=1, debug=False, cache=None, tracer='potrace', large_charset=False,
+         stats=None, top=0, profile=None, trace_batch=1, scheduler=None, sheets=False, simplify=0.0,
+         outline_format=None, check=False, normalize=0, dedup=None):
+    """从 input_dir 中的图像生成字体；check 为 True 时构建后逐字形与源图比较，全部通过时返回 True
+
+    dedup 为感知哈希的汉明距离阈值（0 只合并完全相同的形状），为 None 时不去重。
+    """
+    svg_dir = os.path.join(input_dir, 'char_svg')
+    if debug:
+        os.makedirs(os.path.join(input_dir, 'processed'), exist_ok=True)
+        os.makedirs(svg_dir, exist_ok=True)
+
+    # 工作进程经 initializer 取得相同的轮廓优化容差与归一化尺寸
+    init_worker(simplify, normalize)
+    image_filenames = list_images(input_dir)
+    if jobs > 1:
+        from concurrent.futures import ProcessPoolExecutor
+    with (ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(simplify, normalize))
+          if jobs > 1 else nullcontext()) as executor:
+        index = DedupIndex(dedup) if dedup is not None else None
+        if sheets:
+            # 模板页：每页带一个同名 .json 指明各格子的字符
+            entries = iter_sheet_entries(input_dir, executor, jobs, debug, tracer, stats)
+        elif index is not None:
+            entries = iter_unique_entries(input_dir, image_filenames, index, executor, jobs, debug, cache, tracer, stats)
+        else:
+            entries = iter_glyph_entries(input_dir, image_filenames, executor, jobs, debug, cache, tracer, stats,
+                                         profile, trace_batch, scheduler)
+        if large_charset:
+            # 大字符集模式：字形边产生边写入 glyf 临时文件，不在内存中累积
+            print(output_font_path)
+            built = build_font_streaming(entries, output_font_path, outline_format=outline_format,
+                                         aliases=index and index.aliases)
+        else:
+            entries = list(entries)
+
+    if cache is not None:
+        cache.save()
+        print(cache.stats_line())
+    if scheduler is not None:
+        print(scheduler.stats_line())
+    if index is not None:
+        print(index.stats_line())
+
+    if not large_charset:
+        if debug:
+            print(svg_dir)
+        print(output_font_path)
+
+        # 生成字体文件
+        # os.system(f'ffpython ./src/generate_font.py {svg_dir} {output_font_path}')
+        start = time.perf_counter()
+        built = build_font(entries, output_font_path, outline_format, index and index.aliases)
+        if stats is not None:
+            stats.add_stage('font', time.perf_counter() - start)
+    print(peak_rss_line())
+
+    if stats is not None:
+        stats.close()
+        print('\n'.join(stats.summary_lines(top)))
 
-    print(svg_dir)
-    print(output_font_path)
-    
-    # 生成字体文件
-    # os.system(f'ffpython ./src/generate_font.py {svg_dir} {output_font_path}')
-    generate_font(svg_dir, output_font_path)
+    if check and built:
+        # 检查覆盖全部字形，包括缓存命中的字形与 CFF、WOFF 输出
+        start = time.perf_counter()
+        import fidelity
+        built = not fidelity.check_font(output_font_path, input_dir, jobs, normalize=normalize)
+        print(f"Checked {output_font_path} in {time.perf_counter() - start:.2f}s")
+    return built
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate font from images.")
     parser.add_argument('input_dir', type=str, help='Directory containing the images')
     parser.add_argument('output_font_path', type=str, help='Output path for the generated font file')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='Number of worker processes (0 = all CPU cores)')
+    parser.add_argument('--debug', action='store_true', help='Write intermediate processed/ and char_svg/ files')
+    parser.add_argument('--cache', type=str, default=None, help='Directory of the incremental glyph cache')
+    parser.add_argument('--cache-size', type=int, default=512, help='Glyph cache size limit in MB')
+    parser.add_argument('--tracer', choices=sorted(TRACERS), default='potrace', help='Bitmap tracing backend')
+    parser.add_argument('--large-charset', action='store_true',
+                        help='Stream compiled glyphs to a temporary file to keep memory bounded (for 10k+ glyphs)')
+    parser.add_argument('--sheets', action='store_true',
+                        help='Treat input images as grid template sheets, each with a .json sidecar of characters')
+    parser.add_argument('--simplify', type=float, default=0.0,
+                        help='Outline simplification tolerance in font units (0 = off)')
+    parser.add_argument('--normalize', type=int, default=0,
+                        help='Crop each image to its ink box and scale that box to N pixels before tracing (0 = off)')
+    parser.add_argument('--dedup', action='store_true',
+                        help='Trace each distinct binarized shape once and map duplicate characters to one glyph')
+    parser.add_argument('--dedup-distance', type=int, default=0,
+                        help='Also merge shapes whose perceptual hashes differ by at most N of 512 bits (with --dedup)')
+    parser.add_argument('--outlines', choices=OUTLINE_FORMATS, default=None,
+                        help='Outline format (default: cff for .otf, truetype otherwise)')
+    parser.add_argument('--trace-batch', type=int, default=1,
+                        help='Trace N bitmaps per potrace process (per worker task when used with --jobs)')
+    parser.add_argument('--async-trace', action='store_true',
+                        help='Schedule potrace with asyncio (bounded concurrency, timeouts and retries)')
+    parser.add_argument('--trace-concurrency', type=int, default=0, help='Concurrent potrace processes (0 = all CPU cores)')
+    parser.add_argument('--trace-queue', type=int, default=0,
+                        help='Preprocessed images buffered ahead of tracing (0 = twice the concurrency)')
+    parser.add_argument('--trace-timeout', type=float, default=TRACE_TIMEOUT,
+                        help='Per-glyph potrace timeout in seconds')
+    parser.add_argument('--stats', type=str, default=None, help='Write per-glyph, per-stage records as JSON lines')
+    parser.add_argument('--top', type=int, default=0, help='Print the N slowest and largest glyphs')
+    parser.add_argument('--profile-glyph', type=str, default=None, help='Run cProfile while processing this glyph')
+    parser.add_argument('--profile-output', type=str, default=None, help='Write the profile to a .prof file instead of printing it')
+    parser.add_argument('--check', action='store_true',
+                        help='Compare every glyph with its source image after the build, exit 1 if any is flagged')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Log every processed glyph')
     args = parser.parse_args()
-    main(args.input_dir, args.output_font_path)
+    if args.check and args.sheets:
+        parser.error('--check compares glyphs with single-glyph images and cannot be used with --sheets')
+    if args.sheets and (args.cache or args.async_trace or args.trace_batch > 1):
+        parser.error('--sheets cannot be combined with --cache, --async-trace or --trace-batch')
+    if args.dedup and (args.sheets or args.async_trace or args.trace_batch > 1 or args.profile_glyph):
+        parser.error('--dedup cannot be combined with --sheets, --async-trace, --trace-batch or --profile-glyph')
+    if args.normalize < 0:
+        parser.error('--normalize must be 0 or a positive number of pixels')
+    if args.async_trace and args.tracer != 'potrace':
+        parser.error('--async-trace requires --tracer potrace')
+    try:
+        font_flavor(args.output_font_path)
+    except ImportError as e:
+        parser.error(str(e))
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format='%(message)s')
+    cache = GlyphCache(args.cache, args.cache_size * 1024 * 1024) if args.cache else None
+    stats = BuildStats(args.stats) if args.stats or args.top else None
+    profile = (args.profile_glyph, args.profile_output) if args.profile_glyph else None
+    scheduler = None
+    if args.async_trace:
+        # trace_scheduler 依赖 asyncio，只在需要时导入
+        from trace_scheduler import TraceScheduler
+        scheduler = TraceScheduler(args.trace_concurrency, args.trace_queue, args.trace_timeout)
+    if not main(args.input_dir, args.output_font_path, jobs=args.jobs or os.cpu_count(), debug=args.debug,
+                cache=cache, tracer=args.tracer, large_charset=args.large_charset, stats=stats, top=args.top,
+                profile=profile, trace_batch=args.trace_batch, scheduler=scheduler, sheets=args.sheets,
+                simplify=args.simplify, outline_format=args.outlines, check=args.check, normalize=args.normalize,
+                dedup=args.dedup_distance if args.dedup else None):
+        raise SystemExit(1)
@@ -0,0 +1,270 @@
+"""本地字体构建服务：有界任务队列、常驻进程池与逐任务进度
+
+    POST /jobs            {"name": "ZhangSan", "format": "ttf", "glyphs": {"永": "<base64 PNG>", "U+4E00": ...}}
+                          → 202 {"id": ..., "state": "queued", ...}；队列已满时 503
+    GET  /jobs/<id>       → 任务状态与进度 {"state", "done", "total", "failed", "error", ...}
+    GET  /jobs/<id>/font  → 字体文件；任务未完成时 409
+    GET  /                → 服务状态
+
+字形由 api.trace_glyphs 在共用的进程池上处理，各任务不再启动解释器或导入 OpenCV。
+"""
+import argparse
+import base64
+import binascii
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, wait
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from api import FORMATS, parse_char, trace_glyphs, process_sources, font_bytes, warm_worker
+from tracer import TRACERS
+from webfont import check_flavor
+
+log = logging.getLogger(__name__)
+
+# 排队等待的任务数上限，队列满时新任务返回 503
+QUEUE_SIZE = 16
+# 同时构建的任务数；各任务的字形组交替进入共用的进程池，小任务不必等大任务完成
+CONCURRENT_JOBS = 2
+# 保留的已结束任务数，超出时丢弃最早结束的任务及其字体
+KEEP_JOBS = 64
+# 请求体大小上限（字节）
+MAX_BODY_BYTES = 64 * 1024 * 1024
+# 队列已满时建议客户端重试的间隔（秒）
+RETRY_AFTER = 5
+# 输出格式对应的 Content-Type
+CONTENT_TYPES = {'ttf': 'font/ttf', 'otf': 'font/otf', 'woff': 'font/woff', 'woff2': 'font/woff2'}
+
+class Job:
+    """一个字体构建任务：输入字形、状态与进度，完成后持有字体字节"""
+
+    def __init__(self, glyphs, font_name, font_format):
+        self.id = uuid.uuid4().hex
+        self.glyphs = glyphs
+        self.font_name = font_name
+        self.font_format = font_format
+        self.state = 'queued'
+        self.done = 0
+        self.total = len(glyphs)
+        self.failed = []
+        self.error = None
+        self.font = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    def progress(self, done, total):
+        self.done = done
+
+    def status(self):
+        status = {'id': self.id, 'state': self.state, 'done': self.done, 'total': self.total,
+                  'failed': [f"U+{ord(char):04X}" for char in self.failed], 'format': self.font_format}
+        if self.error:
+            status['error'] = self.error
+        if self.started:
+            status['queued_seconds'] = round(self.started - self.submitted, 3)
+        if self.finished:
+            status['build_seconds'] = round(self.finished - self.started, 3)
+        if self.font is not None:
+            status['bytes'] = len(self.font)
+        return status
+
+class BuildService:
+    """常驻进程池与有界任务队列；CONCURRENT_JOBS 个线程从队列取任务，在共用的进程池上构建"""
+
+    def __init__(self, workers=1, tracer='potrace', queue_size=QUEUE_SIZE, concurrent_jobs=CONCURRENT_JOBS,
+                 keep=KEEP_JOBS, simplify=0.0, normalize=0):
+        self.workers = workers
+        self.tracer = tracer
+        self.keep = keep
+        self.queue = queue.Queue(maxsize=queue_size)
+        # 任务 id → Job，按提交顺序；已结束的任务超过 keep 个时从最早的开始丢弃
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=warm_worker,
+                                            initargs=(simplify, normalize))
+        # 工作进程按需启动；同时提交 workers 个空任务，使全部进程在第一个请求之前启动并完成导入
+        wait([self.executor.submit(process_sources, [], tracer) for _ in range(workers)])
+        self.threads = [threading.Thread(target=self.run, daemon=True) for _ in range(concurrent_jobs)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, job):
+        """把任务放入队列；队列已满时抛出 queue.Full"""
+        with self.lock:
+            self.queue.put_nowait(job)
+            self.jobs[job.id] = job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def run(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            self.build(job)
+
+    def build(self, job):
+        job.state = 'running'
+        job.started = time.time()
+        try:
+            entries, job.failed = trace_glyphs(job.glyphs, self.executor, self.workers, self.tracer, job.progress)
+            job.font = font_bytes(entries, job.font_name, job.font_format)
+            job.state = 'done'
+        except Exception as e:
+            log.warning(f"Job {job.id} failed: {e}")
+            job.error = str(e)
+            job.state = 'failed'
+        job.finished = time.time()
+        # 输入图像不再需要
+        job.glyphs = None
+        log.info(f"Job {job.id}: {job.state}, {job.total} glyphs in {job.finished - job.started:.2f}s")
+        self.evict()
+
+    def evict(self):
+        with self.lock:
+            finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+            for job_id in finished[:max(0, len(finished) - self.keep)]:
+                del self.jobs[job_id]
+
+    def status(self):
+        with self.lock:
+            states = [job.state for job in self.jobs.values()]
+        return {'workers': self.workers, 'tracer': self.tracer, 'queued': states.count('queued'),
+                'running': states.count('running'), 'queue_size': self.queue.maxsize}
+
+    def close(self):
+        for _ in self.threads:
+            self.queue.put(None)
+        self.executor.shutdown(cancel_futures=True)
+
+def parse_job(body):
+    """解析 POST /jobs 的请求体，返回 Job；格式错误时抛出 ValueError"""
+    try:
+        request = json.loads(body)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid JSON: {e}") from None
+    if not isinstance(request, dict) or not isinstance(request.get('glyphs'), dict) or not request['glyphs']:
+        raise ValueError('"glyphs" must be a non-empty object of character to base64 image')
+    font_format = request.get('format', 'ttf')
+    if font_format not in FORMATS:
+        raise ValueError(f"Unknown format {font_format!r}, expected one of {', '.join(FORMATS)}")
+    try:
+        check_flavor(FORMATS[font_format][1])
+    except ImportError as e:
+        raise ValueError(str(e)) from None
+    font_name = request.get('name', 'FontGenerator')
+    if not isinstance(font_name, str) or not font_name or os.path.basename(font_name) != font_name:
+        raise ValueError('"name" must be a non-empty file name without directories')
+    glyphs = {}
+    for key, data in request['glyphs'].items():
+        try:
+            char = parse_char(key)
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Glyph {key!r}: {e}") from None
+        if char in glyphs:
+            # 与 api.trace_glyphs 相同：指向同一字符的多个键不静默合并
+            raise ValueError(f"Glyph {key!r}: character U+{ord(char):04X} ({char!r}) is given more than once")
+        try:
+            glyphs[char] = base64.b64decode(data, validate=True)
+        except (ValueError, TypeError, binascii.Error) as e:
+            raise ValueError(f"Glyph {key!r}: {e}") from None
+    return Job(glyphs, font_name, font_format)
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """POST /jobs、GET /jobs/<id>、GET /jobs/<id>/font 与 GET /"""
+
+    def send_json(self, code, payload, headers=()):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/jobs':
+            self.send_json(404, {'error': 'Not found'})
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY_BYTES:
+            self.send_json(413, {'error': f"Request body exceeds {MAX_BODY_BYTES} bytes"})
+            return
+        try:
+            job = parse_job(self.rfile.read(length))
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+            return
+        try:
+            self.server.service.submit(job)
+        except queue.Full:
+            self.send_json(503, {'error': 'Job queue is full'}, [('Retry-After', str(RETRY_AFTER))])
+            return
+        self.send_json(202, job.status(), [('Location', f"/jobs/{job.id}")])
+
+    def do_GET(self):
+        parts = [part for part in self.path.split('?')[0].split('/') if part]
+        if not parts:
+            self.send_json(200, self.server.service.status())
+            return
+        job = self.server.service.get(parts[1]) if parts[0] == 'jobs' and len(parts) in (2, 3) else None
+        if job is None or (len(parts) == 3 and parts[2] != 'font'):
+            self.send_json(404, {'error': 'Not found'})
+            return
+        if len(parts) == 2:
+            self.send_json(200, job.status())
+            return
+        if job.state != 'done':
+            self.send_json(409, job.status())
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPES[job.font_format])
+        self.send_header('Content-Length', str(len(job.font)))
+        self.send_header('Content-Disposition', f'attachment; filename="{job.id}.{job.font_format}"')
+        self.end_headers()
+        self.wfile.write(job.font)
+
+    def log_message(self, format, *args):
+        # 访问日志只在 -v 时输出
+        log.info(f"{self.address_string()} {format % args}")
+
+def serve(host, port, service):
+    server = ThreadingHTTPServer((host, port), RequestHandler)
+    server.service = service
+    print(f"Serving on http://{host}:{server.server_address[1]} with {service.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve font builds over HTTP with a warm worker pool.")
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on')
+    parser.add_argument('-j', '--jobs', type=int, default=0, help='Number of worker processes (0 = all CPU cores)')
+    parser.add_argument('--queue', type=int, default=QUEUE_SIZE, help='Maximum number of queued jobs')
+    parser.add_argument('--concurrent-jobs', type=int, default=CONCURRENT_JOBS, help='Jobs built at the same time')
+    parser.add_argument('--keep', type=int, default=KEEP_JOBS, help='Finished jobs kept for download')
+    parser.add_argument('--tracer', choices=sorted(TRACERS), default='potrace', help='Bitmap tracing backend')
+    parser.add_argument('--simplify', type=float, default=0.0,
+                        help='Outline simplification tolerance in font units (0 = off)')
+    parser.add_argument('--normalize', type=int, default=0,
+                        help='Crop each image to its ink box and scale that box to N pixels before tracing (0 = off)')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Log every request and finished job')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format='%(message)s')
+    service = BuildService(args.jobs or os.cpu_count(), args.tracer, args.queue, args.concurrent_jobs, args.keep,
+                           args.simplify, args.normalize)
+    serve(args.host, args.port, service)
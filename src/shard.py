@@ -0,0 +1,332 @@
+"""分片构建：把一次构建按字形数或 Unicode 范围拆成可在不同进程、不同机器上独立运行的分片，再合并为字体
+
+    python ./src/shard.py build ./images/ZhangSan /shared/ZhangSan --shard 1/8 -j 0
+    python ./src/shard.py build ./images/ZhangSan /shared/ZhangSan --range 4E00-7FFF --range 3000-303F
+    python ./src/shard.py merge /shared/ZhangSan ./fonts/ZhangSan.ttf
+
+每个分片把编译后的 glyf 字节、度量与 cmap 条目写入共享目录中的一个分片存储文件（见 write_shard）。
+合并时按输入图像的文件名顺序拼接各分片的 glyf 字节，不再描摹、解析或编译轮廓，输出与 main.py 单机构建的字体相同。
+"""
+import argparse
+import hashlib
+import heapq
+import json
+import logging
+import os
+import shutil
+import struct
+import time
+from contextlib import nullcontext
+from itertools import count, repeat
+from fontTools.ttLib.tables._g_l_y_f import Glyph
+from main import list_images, iter_glyph_entries, init_worker, trace_params, peak_rss_line
+from tracer import TRACERS
+from generate_font import (build_font, save_store, notdef_glyph, outline_format_for, glyph_params, char_code_from_name,
+                           glyph_name_for, OUTLINE_FORMATS)
+from glyph_store import GlyphStore
+from cache import GlyphCache
+from webfont import font_flavor
+
+log = logging.getLogger(__name__)
+
+# 分片存储文件的开头标记与扩展名
+SHARD_MAGIC = b'FGSHARD\0'
+SHARD_SUFFIX = '.shard'
+# 分片存储格式的版本，格式变化时递增；合并时拒绝其他版本
+SHARD_FORMAT_VERSION = 1
+# 头部长度字段：4 字节大端无符号整数
+HEADER_LENGTH_FORMAT = '>I'
+
+def input_digest(image_filenames):
+    """输入图像文件名列表的摘要；各分片须基于同一份列表，字形在列表中的序号才能用于合并排序"""
+    return hashlib.sha256('\n'.join(image_filenames).encode('utf-8')).hexdigest()
+
+def build_params(tracer='potrace'):
+    """影响字形输出的全部参数；各分片须一致才能合并"""
+    return {'trace': trace_params(tracer), 'glyph': glyph_params()}
+
+def parse_shard(spec):
+    """'I/N'（第 I 个，共 N 个，I 从 1 开始）→ (I - 1, N)"""
+    try:
+        index, shards = (int(part) for part in spec.split('/'))
+    except ValueError:
+        raise ValueError(f"Shard {spec!r} should look like 3/8") from None
+    if not 1 <= index <= shards:
+        raise ValueError(f"Shard {spec!r} is out of range")
+    return index - 1, shards
+
+def parse_range(spec):
+    """'4E00-9FFF'、'U+4E00-U+9FFF' 或单个码位 → (起始码位, 结束码位)，两端都包含"""
+    try:
+        bounds = [int(part.strip().upper().removeprefix('U+'), 16) for part in spec.split('-')]
+    except ValueError:
+        bounds = []
+    if len(bounds) not in (1, 2) or bounds[0] > bounds[-1]:
+        raise ValueError(f"Unicode range {spec!r} should look like 4E00-9FFF")
+    return bounds[0], bounds[-1]
+
+def count_positions(total, index, shards):
+    """按字形数划分：第 index 个分片在文件名顺序中的连续一段"""
+    return list(range(total * index // shards, total * (index + 1) // shards))
+
+def range_positions(image_filenames, ranges):
+    """按 Unicode 范围划分：字符编码落在任一范围内的图像序号"""
+    positions = []
+    for position, image_filename in enumerate(image_filenames):
+        char_code = char_code_from_name(os.path.splitext(image_filename)[0])
+        if char_code is not None and any(start <= char_code <= stop for start, stop in ranges):
+            positions.append(position)
+    return positions
+
+def uncoded_positions(image_filenames):
+    """无法推断字符编码的图像序号；它们在单机构建中同样被跳过，按范围划分时不属于任何分片"""
+    return [position for position, image_filename in enumerate(image_filenames)
+            if char_code_from_name(os.path.splitext(image_filename)[0]) is None]
+
+def shard_label(shard=None, ranges=None):
+    """分片存储的文件名（不含扩展名）"""
+    if shard is not None:
+        return f"shard-{shard[0] + 1:04d}-of-{shard[1]:04d}"
+    return 'range-' + '+'.join(f"{start:04X}-{stop:04X}" for start, stop in ranges)
+
+def write_shard(path, header, store):
+    """写出分片存储：SHARD_MAGIC、头部长度、JSON 头部，之后是按头部顺序排列的 glyf 字节
+
+    glyf 字节与 OpenType 中的格式相同，与平台、Python 版本无关。先写临时文件再改名，
+    共享目录中不会出现写了一半的分片。
+    """
+    data = json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as out:
+        out.write(SHARD_MAGIC)
+        out.write(struct.pack(HEADER_LENGTH_FORMAT, len(data)))
+        out.write(data)
+        store.spool.seek(0)
+        shutil.copyfileobj(store.spool, out)
+    os.replace(tmp_path, path)
+
+def expected_glyph_name(image_filename):
+    """图像文件对应的字形名（见 generate_font.glyph_from_svg），无法推断字符编码时为 None"""
+    char = os.path.splitext(image_filename)[0]
+    char_code = char_code_from_name(char)
+    return None if char_code is None else glyph_name_for(char, char_code)
+
+def build_shard(input_dir, store_dir, shard=None, ranges=None, jobs=1, cache=None, tracer='potrace', trace_batch=1,
+                simplify=0.0, normalize=0):
+    """处理分片中的图像并写出分片存储，返回其路径
+
+    shard 为 (序号, 分片数) 时按字形数划分，否则按 ranges 中的 Unicode 范围划分。
+    """
+    start = time.perf_counter()
+    init_worker(simplify, normalize)
+    image_filenames = list_images(input_dir)
+    if shard is not None:
+        positions = count_positions(len(image_filenames), *shard)
+    else:
+        positions = range_positions(image_filenames, ranges)
+    label = shard_label(shard, ranges)
+    os.makedirs(store_dir, exist_ok=True)
+
+    # 字形按文件名顺序产出，失败的字形被跳过；按预期的字形名对应回图像序号
+    filenames = [image_filenames[position] for position in positions]
+    store = GlyphStore(store_dir)
+    glyph_positions, char_codes = [], []
+    try:
+        if jobs > 1:
+            from concurrent.futures import ProcessPoolExecutor
+        with (ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(simplify, normalize))
+              if jobs > 1 else nullcontext()) as executor:
+            pending = iter(positions)
+            for glyph_name, char_code, glyph in iter_glyph_entries(input_dir, filenames, executor, jobs, cache=cache,
+                                                                   tracer=tracer, trace_batch=trace_batch):
+                for position in pending:
+                    if expected_glyph_name(image_filenames[position]) == glyph_name:
+                        break
+                glyph_positions.append(position)
+                char_codes.append(char_code)
+                store.add(glyph_name, char_code, glyph)
+        if cache is not None:
+            cache.save()
+            print(cache.stats_line())
+
+        header = {
+            'version': SHARD_FORMAT_VERSION,
+            'label': label,
+            'params': build_params(tracer),
+            'input': {'images': len(image_filenames), 'digest': input_digest(image_filenames)},
+            'assigned': positions,
+            'uncoded': uncoded_positions(image_filenames) if shard is None else [],
+            'positions': glyph_positions,
+            'glyph_names': store.glyph_order,
+            'char_codes': char_codes,
+            'lengths': store.lengths.tolist(),
+            'bounds': store.bounds.tolist(),
+            'num_points': store.num_points.tolist(),
+            'num_contours': store.num_contours.tolist(),
+        }
+        path = os.path.join(store_dir, label + SHARD_SUFFIX)
+        write_shard(path, header, store)
+    finally:
+        store.close()
+    print(f"Shard {label}: {len(glyph_positions)} of {len(positions)} glyphs in {time.perf_counter() - start:.2f}s "
+          f"-> {path}")
+    print(peak_rss_line())
+    return path
+
+class ShardReader:
+    """只读打开的分片存储：头部与 glyf 字节在文件中的偏移"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            if self.file.read(len(SHARD_MAGIC)) != SHARD_MAGIC:
+                raise ValueError(f"{path} is not a shard store")
+            (length,) = struct.unpack(HEADER_LENGTH_FORMAT, self.file.read(struct.calcsize(HEADER_LENGTH_FORMAT)))
+            self.header = json.loads(self.file.read(length))
+            if self.header.get('version') != SHARD_FORMAT_VERSION:
+                raise ValueError(f"{path} has shard format version {self.header.get('version')}, "
+                                 f"expected {SHARD_FORMAT_VERSION}")
+        except Exception:
+            self.file.close()
+            raise
+        self.data_offset = self.file.tell()
+        self.offsets = [0]
+        for length in self.header['lengths']:
+            self.offsets.append(self.offsets[-1] + length)
+
+    def read(self, index):
+        """第 index 个字形的 glyf 字节"""
+        offset = self.data_offset + self.offsets[index]
+        if self.file.tell() != offset:
+            self.file.seek(offset)
+        return self.file.read(self.header['lengths'][index])
+
+    def close(self):
+        self.file.close()
+
+def open_shards(store_dir):
+    """打开 store_dir 中的全部分片存储，检查参数一致且恰好覆盖全部输入图像；不满足时抛出 ValueError"""
+    paths = sorted(os.path.join(store_dir, f) for f in os.listdir(store_dir)
+                   if f.endswith(SHARD_SUFFIX)) if os.path.isdir(store_dir) else []
+    if not paths:
+        raise ValueError(f"No {SHARD_SUFFIX} files in {store_dir}")
+    shards = []
+    try:
+        for path in paths:
+            shards.append(ShardReader(path))
+        first = shards[0].header
+        covered = set()
+        for shard in shards:
+            header = shard.header
+            if header['params'] != first['params']:
+                raise ValueError(f"{shard.path} was built with different parameters than {shards[0].path}")
+            if header['input'] != first['input']:
+                raise ValueError(f"{shard.path} was built from different images than {shards[0].path}")
+            overlap = covered.intersection(header['assigned'])
+            if overlap:
+                raise ValueError(f"{shard.path} overlaps another shard at {len(overlap)} images; "
+                                 f"remove shards left over from an earlier split")
+            covered.update(header['assigned'])
+        # 按范围划分时，无法推断字符编码的图像不属于任何分片
+        covered.update(*(shard.header['uncoded'] for shard in shards))
+        missing = first['input']['images'] - len(covered)
+        if missing:
+            raise ValueError(f"Shards in {store_dir} do not cover {missing} of {first['input']['images']} images")
+    except Exception:
+        for shard in shards:
+            shard.close()
+        raise
+    return shards
+
+def iter_merged(shards):
+    """按图像序号（即文件名顺序）归并各分片的字形，依次产出 (分片, 分片内的字形序号)"""
+    streams = [zip(shard.header['positions'], repeat(order), count()) for order, shard in enumerate(shards)]
+    for _, order, index in heapq.merge(*streams):
+        yield shards[order], index
+
+def merge_shards(store_dir, output_font_path, outline_format=None, spool_dir=None):
+    """把 store_dir 中的分片合并为字体，成功时返回 True
+
+    TrueType（含 WOFF/WOFF2）直接拼接 glyf 字节并流式写出（见 generate_font.save_store）；
+    CFF 需把每个字形转换为 Type 2 字符串，由 glyf 字节重建字形后交给 build_font。
+    """
+    start = time.perf_counter()
+    shards = open_shards(store_dir)
+    try:
+        merged = iter_merged(shards)
+        if outline_format_for(output_font_path, outline_format) == 'cff':
+            entries = ((shard.header['glyph_names'][index], shard.header['char_codes'][index], Glyph(shard.read(index)))
+                       for shard, index in merged)
+            built = build_font(entries, output_font_path, 'cff')
+        else:
+            store = GlyphStore(spool_dir)
+            try:
+                store.add('.notdef', None, notdef_glyph())
+                for shard, index in merged:
+                    header = shard.header
+                    store.add_compiled(header['glyph_names'][index], header['char_codes'][index], shard.read(index),
+                                       header['bounds'][4 * index:4 * index + 4], header['num_points'][index],
+                                       header['num_contours'][index])
+                built = save_store(store, output_font_path)
+            finally:
+                store.close()
+    finally:
+        for shard in shards:
+            shard.close()
+    glyphs = sum(len(shard.header['positions']) for shard in shards)
+    print(f"Merged {len(shards)} shards, {glyphs} glyphs in {time.perf_counter() - start:.2f}s")
+    return built
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a font in shards on separate processes or nodes, then merge.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='Trace one shard of the images into a shard store')
+    build.add_argument('input_dir', type=str, help='Directory containing the images')
+    build.add_argument('store_dir', type=str, help='Shared directory of shard stores')
+    split = build.add_mutually_exclusive_group(required=True)
+    split.add_argument('--shard', type=str, help='Shard I of N by glyph count, e.g. 3/8')
+    split.add_argument('--range', type=str, action='append', dest='ranges',
+                       help='Unicode range of this shard, e.g. 4E00-7FFF (repeatable)')
+    build.add_argument('-j', '--jobs', type=int, default=1, help='Number of worker processes (0 = all CPU cores)')
+    build.add_argument('--cache', type=str, default=None, help='Directory of the incremental glyph cache')
+    build.add_argument('--cache-size', type=int, default=512, help='Glyph cache size limit in MB')
+    build.add_argument('--tracer', choices=sorted(TRACERS), default='potrace', help='Bitmap tracing backend')
+    build.add_argument('--trace-batch', type=int, default=1,
+                       help='Trace N bitmaps per potrace process (per worker task when used with --jobs)')
+    build.add_argument('--simplify', type=float, default=0.0,
+                       help='Outline simplification tolerance in font units (0 = off)')
+    build.add_argument('--normalize', type=int, default=0,
+                       help='Crop each image to its ink box and scale that box to N pixels before tracing (0 = off)')
+    merge = commands.add_parser('merge', help='Assemble the font from all shard stores')
+    merge.add_argument('store_dir', type=str, help='Shared directory of shard stores')
+    merge.add_argument('output_font_path', type=str, help='Output path for the generated font file')
+    merge.add_argument('--outlines', choices=OUTLINE_FORMATS, default=None,
+                       help='Outline format (default: cff for .otf, truetype otherwise)')
+    for command in (build, merge):
+        command.add_argument('-v', '--verbose', action='store_true', help='Log every processed glyph')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format='%(message)s')
+    if args.command == 'build':
+        if args.normalize < 0:
+            parser.error('--normalize must be 0 or a positive number of pixels')
+        try:
+            shard = parse_shard(args.shard) if args.shard else None
+            ranges = [parse_range(spec) for spec in args.ranges] if args.ranges else None
+        except ValueError as e:
+            parser.error(str(e))
+        cache = GlyphCache(args.cache, args.cache_size * 1024 * 1024) if args.cache else None
+        build_shard(args.input_dir, args.store_dir, shard, ranges, args.jobs or os.cpu_count(), cache, args.tracer,
+                    args.trace_batch, args.simplify, args.normalize)
+    else:
+        try:
+            font_flavor(args.output_font_path)
+        except ImportError as e:
+            parser.error(str(e))
+        try:
+            built = merge_shards(args.store_dir, args.output_font_path, args.outlines)
+        except ValueError as e:
+            print(f"Error: {e}")
+            raise SystemExit(1)
+        if not built:
+            raise SystemExit(1)
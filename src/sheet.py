@@ -0,0 +1,214 @@
+import json
+import logging
+import math
+import os
+from bisect import bisect_left, bisect_right
+import cv2
+import numpy as np
+from PIL import Image
+
+log = logging.getLogger(__name__)
+
+SHEET_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp')
+# 投影中墨迹占比不低于该比例（相对最大值）的行/列为候选网格线
+LINE_FRACTION = 0.5
+# 网格线须连续：最长的一段墨迹不短于各候选线中最长者的该比例，排除各格子中对齐的笔画
+LINE_CONTINUITY = 0.8
+# 网格线须等距：各线与等距位置的偏差不超过行（列）距的该比例，且至少 LINE_SLACK 像素
+SPACING_TOLERANCE = 0.1
+LINE_SLACK = 2
+# 行（列）距的下限（像素），更近的两条线视为同一条双线
+MIN_PITCH = 8
+# 切格子时四周内缩的比例，避免残留网格线
+CELL_INSET = 0.06
+
+def load_sheet(sheet_path):
+    """整页只解码一次，返回灰度数组；无法读取或解码时抛出 ValueError"""
+    try:
+        with Image.open(sheet_path) as image:
+            return np.asarray(image.convert('L'))
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f"cannot decode the page: {e}") from None
+
+def _line_runs(mask):
+    """把布尔数组中连续为真的区间合并为 (起点, 终点) 数组，终点不含"""
+    padded = np.concatenate([[False], mask, [False]])
+    edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    return edges.reshape(-1, 2)
+
+def _longest_run(mask):
+    runs = _line_runs(mask)
+    return int((runs[:, 1] - runs[:, 0]).max()) if len(runs) else 0
+
+def _candidate_lines(ink, axis):
+    """投影足够强且墨迹连续的候选线 (起点, 终点)；axis 为 0 时是水平线，为 1 时是竖直线"""
+    profile = ink.mean(axis=1 - axis)
+    runs = _line_runs(profile >= LINE_FRACTION * profile.max())
+    if len(runs) == 0:
+        return runs
+    # 沿线方向的最长连续墨迹：网格线贯穿整个网格，格子中的笔画在格子之间断开
+    lengths = np.array([_longest_run((ink[start:end] if axis == 0 else ink[:, start:end]).any(axis=axis))
+                        for start, end in runs.tolist()])
+    return runs[lengths >= LINE_CONTINUITY * lengths.max()]
+
+def _even_lines(runs, exact=None, minimum=0):
+    """从候选线中选出等距的一组网格线，返回 (起点, 终点) 数组；没有符合要求的一组时为空
+
+    以每对候选线的间距为行（列）距向后逐条匹配，选格子最多、偏差最小的一组；
+    给定 exact 时只接受恰好 exact 个格子的一组，否则至少 minimum 个。落在同一位置的多条候选线（双线）合并为一条。
+    """
+    centers = runs.mean(axis=1).tolist()
+    best, best_key = None, None
+    for i, first in enumerate(centers):
+        for second in centers[i + 1:]:
+            pitch = second - first
+            if pitch < MIN_PITCH:
+                continue
+            tolerance = max(LINE_SLACK, SPACING_TOLERANCE * pitch)
+            members = []
+            error = 0.0
+            while True:
+                target = first + len(members) * pitch
+                lo, hi = bisect_left(centers, target - tolerance), bisect_right(centers, target + tolerance)
+                if lo == hi:
+                    break
+                members.append((lo, hi))
+                error += min(abs(center - target) for center in centers[lo:hi])
+            cells = len(members) - 1
+            if cells < max(minimum, 1) or (exact is not None and cells != exact):
+                continue
+            key = (cells, -error)
+            if best_key is None or key > best_key:
+                best, best_key = members, key
+    if best is None:
+        return np.empty((0, 2), dtype=np.int64)
+    return np.array([[runs[lo:hi, 0].min(), runs[lo:hi, 1].max()] for lo, hi in best])
+
+def _cell_spans(lines):
+    """相邻两条网格线之间即为格子，四周内缩后返回各格子的像素区间"""
+    spans = np.stack([lines[:-1, 1], lines[1:, 0]], axis=1) if len(lines) >= 2 else np.empty((0, 2), dtype=np.int64)
+    inset = ((spans[:, 1] - spans[:, 0]) * CELL_INSET).astype(np.int64)
+    return np.stack([spans[:, 0] + inset, spans[:, 1] - inset], axis=1)
+
+def find_cells(gray, columns=None, min_rows=0, min_cols=0):
+    """用投影法定位网格，返回 (行区间, 列区间)，均为 (n, 2) 数组
+
+    网格线须贯穿网格且等距；columns 给定时列数须恰好相等，min_rows、min_cols 为行列数的下限。
+    找不到符合要求的网格时对应方向为空数组。
+    """
+    _, ink = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    row_lines = _even_lines(_candidate_lines(ink, 0), minimum=min_rows)
+    col_lines = _even_lines(_candidate_lines(ink, 1), columns, min_cols)
+    return _cell_spans(row_lines), _cell_spans(col_lines)
+
+def slice_cells(gray, row_spans, col_spans):
+    """按行优先顺序产出 ((行, 列), 格子视图)，格子为 gray 的切片，不复制数据"""
+    for row, (y0, y1) in enumerate(row_spans.tolist()):
+        for col, (x0, x1) in enumerate(col_spans.tolist()):
+            yield (row, col), gray[y0:y1, x0:x1]
+
+def _parse_char(value):
+    """sidecar 中的字符项：单个字符、'U+XXXX' 或整数码位；None 或空白表示空格子，其他类型抛出 ValueError"""
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"character entry {value!r} must be a string, a code point or null")
+    if isinstance(value, int):
+        return _chr(value)
+    value = value.strip()
+    if not value:
+        return None
+    if value.upper().startswith('U+'):
+        return _chr(int(value[2:], 16))
+    return value
+
+def _chr(code_point):
+    if not 0 <= code_point <= 0x10FFFF:
+        raise ValueError(f"code point {code_point} is out of range")
+    return chr(code_point)
+
+def _check_sidecar(sidecar):
+    """检查 sidecar 的结构（字符项的类型由 _parse_char 检查），不符合时抛出 ValueError"""
+    if not isinstance(sidecar, dict):
+        raise ValueError("sidecar must be a JSON object with \"rows\" or \"chars\"")
+    if 'rows' in sidecar:
+        rows = sidecar['rows']
+        if not isinstance(rows, list) or not all(isinstance(chars, (str, list)) for chars in rows):
+            raise ValueError("sidecar \"rows\" must be a list of strings or lists")
+    elif 'chars' in sidecar:
+        if not isinstance(sidecar['chars'], (str, list)):
+            raise ValueError("sidecar \"chars\" must be a string or a list")
+        columns = sidecar.get('columns')
+        if columns is not None and (isinstance(columns, bool) or not isinstance(columns, int) or columns <= 0):
+            raise ValueError(f"sidecar \"columns\" must be a positive integer, got {columns!r}")
+    else:
+        raise ValueError("sidecar has neither \"rows\" nor \"chars\"")
+
+def load_sidecar(sheet_path):
+    """读取与扫描页同名的 .json，返回 ({(行, 列) 或序号: 字符}, 列数或 None, 最少行数, 最少列数)
+
+    支持两种写法：
+    {"rows": ["永和九年", "岁在癸丑"]}         每行一个字符串（或列表）
+    {"chars": "永和九年岁在癸丑", "columns": 4}  按行优先顺序排列，columns 缺省时取检测到的列数
+    两种写法中空格或 null 表示该格留空；sidecar 列出的格子（含留空的格子）决定网格至少的行列数。
+    sidecar 无法读取或不符合以上格式时抛出 ValueError。
+    """
+    try:
+        with open(os.path.splitext(sheet_path)[0] + '.json', 'r', encoding='utf-8') as f:
+            sidecar = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"cannot read the sidecar: {e}") from None
+    _check_sidecar(sidecar)
+    mapping = {}
+    columns = None
+    if 'rows' in sidecar:
+        for row, chars in enumerate(sidecar['rows']):
+            for col, value in enumerate(chars):
+                char = _parse_char(value)
+                if char:
+                    mapping[(row, col)] = char
+        min_rows = len(sidecar['rows'])
+        min_cols = max((len(chars) for chars in sidecar['rows']), default=0)
+    else:
+        columns = sidecar.get('columns')
+        for index, value in enumerate(sidecar['chars']):
+            char = _parse_char(value)
+            if char:
+                mapping[index] = char
+        min_rows = math.ceil(len(sidecar['chars']) / columns) if columns else 0
+        min_cols = columns or 0
+    return mapping, columns, min_rows, min_cols
+
+def resolve_positions(mapping, columns, n_rows, n_cols):
+    """把按序号给出的映射换算为 (行, 列)，并丢弃超出网格的项"""
+    columns = columns or n_cols
+    resolved = {}
+    for key, char in mapping.items():
+        position = key if isinstance(key, tuple) else divmod(key, columns)
+        if position[0] < n_rows and position[1] < n_cols:
+            resolved[position] = char
+        else:
+            log.warning(f"Sidecar entry {char} at {position} is outside the {n_rows}x{n_cols} grid")
+    return resolved
+
+def list_sheets(input_dir):
+    """列出目录中带有 sidecar 的扫描页，按文件名排序"""
+    return sorted(f for f in os.listdir(input_dir)
+                  if f.lower().endswith(SHEET_EXTENSIONS)
+                  and os.path.exists(os.path.join(input_dir, os.path.splitext(f)[0] + '.json')))
+
+def iter_sheet_cells(sheet_path):
+    """解码一页扫描件并定位网格，返回按 sidecar 产出 ((行, 列), 字符, 格子视图) 的迭代器，顺序为行优先
+
+    找不到与 sidecar 相符的等距网格时抛出 ValueError，不把格子对应到错误的字符。
+    """
+    gray = load_sheet(sheet_path)
+    mapping, columns, min_rows, min_cols = load_sidecar(sheet_path)
+    row_spans, col_spans = find_cells(gray, columns, min_rows, min_cols)
+    if len(row_spans) == 0 or len(col_spans) == 0:
+        needed = f"exactly {columns}" if columns else f"at least {max(min_cols, 1)}"
+        raise ValueError(f"no evenly spaced grid with at least {max(min_rows, 1)} rows and {needed} columns")
+    mapping = resolve_positions(mapping, columns, len(row_spans), len(col_spans))
+    log.info(f"{os.path.basename(sheet_path)}: {len(row_spans)}x{len(col_spans)} grid, {len(mapping)} characters")
+    return ((position, mapping[position], cell) for position, cell in slice_cells(gray, row_spans, col_spans)
+            if position in mapping)
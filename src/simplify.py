@@ -0,0 +1,288 @@
+import numpy as np
+from convert_svg import OP_MOVE, OP_LINE, OP_CUBIC, OP_QUAD, OP_CLOSE
+
+# 每段三次曲线用于误差估计的采样数
+CURVE_SAMPLES = 8
+# 尝试合并两段曲线时，连接点两侧切线夹角的余弦下限（约 25°），更尖的连接点视为角点
+SMOOTH_COS = 0.9
+# 外接框两边都不超过 tolerance 的该倍数的轮廓视为噪点
+TINY_CONTOUR_FACTOR = 4.0
+
+def _bernstein(samples):
+    t = np.linspace(0.0, 1.0, samples + 1)[:, None]
+    return np.hstack([(1 - t) ** 3, 3 * (1 - t) ** 2 * t, 3 * (1 - t) * t ** 2, t ** 3])
+
+# 原曲线的采样矩阵，以及检验合并结果时更密的采样矩阵
+_BERNSTEIN = _bernstein(CURVE_SAMPLES)
+_DENSE_BERNSTEIN = _bernstein(4 * CURVE_SAMPLES)
+_DENSE_T = np.linspace(0.0, 1.0, 4 * CURVE_SAMPLES + 1)[:, None]
+
+def _cubic_points(p0, c1, c2, p3, bernstein=_BERNSTEIN):
+    return bernstein @ np.array([p0, c1, c2, p3])
+
+def _line_points(a, b):
+    """线段 ab 上与检验曲线同样密的采样点"""
+    return a + _DENSE_T * np.subtract(b, a)
+
+def _point_line_distance(points, a, b):
+    """点到线段 ab 所在直线的距离；a、b 重合时为到 a 的距离"""
+    direction = np.subtract(b, a)
+    length = np.hypot(*direction)
+    offsets = np.asarray(points) - a
+    if length == 0:
+        return np.hypot(offsets[..., 0], offsets[..., 1])
+    return np.abs(offsets[..., 0] * direction[1] - offsets[..., 1] * direction[0]) / length
+
+def _unit(v):
+    norm = np.hypot(*v)
+    return v / norm if norm > 0 else None
+
+def _polyline_distance(points, polyline):
+    """各点到折线的最近距离"""
+    a = polyline[:-1]
+    ab = polyline[1:] - a
+    lengths = np.maximum((ab ** 2).sum(axis=1), 1e-12)
+    t = np.clip((((points[:, None, :] - a[None]) * ab[None]).sum(axis=2)) / lengths, 0.0, 1.0)
+    nearest = a[None] + t[..., None] * ab[None]
+    return np.sqrt(((points[:, None, :] - nearest) ** 2).sum(axis=2)).min(axis=1)
+
+def _deviation(origin, shape):
+    """原轮廓采样点 origin 与新形状的采样点 shape 之间的双向最大距离（二者均按折线计）"""
+    return max(_polyline_distance(origin, shape).max(), _polyline_distance(shape, origin).max())
+
+def _within(origin, shape, tolerance):
+    """同 _deviation(origin, shape) <= tolerance，单向已超出时不再计算另一向"""
+    return (_polyline_distance(origin, shape).max() <= tolerance
+            and _polyline_distance(shape, origin).max() <= tolerance)
+
+def _origins(start, segments):
+    """各段原轮廓的采样点（含两端点），后续各阶段都以此检验偏差，误差不随阶段累积"""
+    origins = []
+    for segment in segments:
+        if segment[0] == OP_CUBIC:
+            origins.append(_cubic_points(start, *segment[1:]))
+        else:
+            origins.append(np.array([start, segment[-1]], dtype=np.float64))
+        start = segment[-1]
+    return origins
+
+def _fit_cubic(p0, p3, t1, t2, samples):
+    """切线方向固定，最小二乘求两侧控制柄长度，使曲线逼近按弦长参数化的采样点；无解时返回 None"""
+    chord = np.concatenate([[0.0], np.cumsum(np.hypot(*np.diff(samples, axis=0).T))])
+    if chord[-1] == 0:
+        return None
+    u = (chord / chord[-1])[:, None]
+    b0, b1, b2, b3 = (1 - u) ** 3, 3 * (1 - u) ** 2 * u, 3 * (1 - u) * u ** 2, u ** 3
+    a1 = b1 * t1
+    a2 = b2 * t2
+    rest = samples - (b0 + b1) * p0 - (b2 + b3) * p3
+    matrix = np.array([[(a1 * a1).sum(), (a1 * a2).sum()], [(a1 * a2).sum(), (a2 * a2).sum()]])
+    rhs = np.array([(a1 * rest).sum(), (a2 * rest).sum()])
+    if abs(np.linalg.det(matrix)) < 1e-12:
+        return None
+    alpha, beta = np.linalg.solve(matrix, rhs)
+    if alpha <= 0 or beta <= 0:
+        return None
+    return p0 + alpha * t1, p3 + beta * t2
+
+def _merge_cubics(start, segments, origins, tolerance):
+    """贪心地把相邻、连接处光滑的三次曲线合并为一段，合并后与原曲线的偏差不超过 tolerance
+
+    返回 (各段, 各段的原轮廓采样点)。
+    """
+    merged = []
+    merged_origins = []
+    run = None
+    for segment, samples in zip(segments, origins):
+        if segment[0] != OP_CUBIC:
+            if run:
+                merged.append(run[0])
+                merged_origins.append(run[2])
+                run = None
+            merged.append(segment)
+            merged_origins.append(samples)
+            start = segment[-1]
+            continue
+        _, c1, c2, end = segment
+        if run is not None:
+            (_, r1, r2, r_end), run_start, run_samples = run
+            t_in = _unit(np.subtract(r_end, r2))
+            t_out = _unit(np.subtract(c1, r_end))
+            if t_in is not None and t_out is not None and t_in @ t_out >= SMOOTH_COS:
+                t1 = _unit(np.subtract(r1, run_start))
+                t2 = _unit(np.subtract(c2, end))
+                all_samples = np.vstack([run_samples, samples[1:]])
+                fit = t1 is not None and t2 is not None and _fit_cubic(
+                    np.asarray(run_start), np.asarray(end), t1, t2, all_samples)
+                if fit:
+                    candidate = _cubic_points(run_start, fit[0], fit[1], end, _DENSE_BERNSTEIN)
+                    if _within(all_samples, candidate, tolerance):
+                        run = ((OP_CUBIC, tuple(fit[0]), tuple(fit[1]), end), run_start, all_samples)
+                        start = end
+                        continue
+            merged.append(run[0])
+            merged_origins.append(run[2])
+        run = (segment, start, samples)
+        start = end
+    if run:
+        merged.append(run[0])
+        merged_origins.append(run[2])
+    return merged, merged_origins
+
+def _flatten_curves(start, segments, origins, tolerance):
+    """控制点投影落在弦内、且弦与原曲线的偏差不超过 tolerance 的三次曲线改为直线"""
+    result = []
+    for segment, origin in zip(segments, origins):
+        if segment[0] == OP_CUBIC:
+            _, c1, c2, end = segment
+            chord = np.subtract(end, start)
+            length_sq = chord @ chord
+            controls = np.array([c1, c2]) - start
+            inside = length_sq > 0 and np.all((controls @ chord >= 0) & (controls @ chord <= length_sq))
+            # 到弦所在直线的距离是到弦的下界，先以此快速排除
+            if (inside and _point_line_distance(origin, start, end).max() <= tolerance
+                    and _within(origin, _line_points(start, end), tolerance)):
+                segment = (OP_LINE, end)
+        result.append(segment)
+        start = segment[-1]
+    return result
+
+def _merge_lines(start, segments, origins, tolerance):
+    """合并相接的直线，合并后的直线与所替代各段原轮廓的偏差不超过 tolerance
+
+    返回 (各段, 各段的原轮廓采样点)。
+    """
+    result = []
+    result_origins = []
+    anchor = start
+    pending = []  # [(终点, 原轮廓采样点)]
+
+    def flush():
+        result.append((OP_LINE, pending[-1][0]))
+        result_origins.append(np.vstack([origin for _, origin in pending]))
+
+    for segment, origin in zip(segments, origins):
+        if segment[0] != OP_LINE:
+            if pending:
+                flush()
+            pending = []
+            result.append(segment)
+            result_origins.append(origin)
+            anchor = segment[-1]
+            continue
+        candidate = pending + [(segment[-1], origin)]
+        if len(candidate) > 1 and not _within(np.vstack([o for _, o in candidate]),
+                                              _line_points(anchor, segment[-1]), tolerance):
+            flush()
+            anchor = pending[-1][0]
+            candidate = [(segment[-1], origin)]
+        pending = candidate
+    if pending:
+        flush()
+    return result, result_origins
+
+def _drop_degenerate(start, segments, origins):
+    """去掉长度为零的线段和所有点重合的曲线，其原轮廓采样点并入后一段（轮廓末尾时并入前一段）"""
+    result = []
+    result_origins = []
+    carried = []
+    for segment, origin in zip(segments, origins):
+        if all(point == start for point in segment[1:]):
+            carried.append(origin)
+            continue
+        result.append(segment)
+        result_origins.append(np.vstack(carried + [origin]) if carried else origin)
+        carried = []
+        start = segment[-1]
+    if carried and result:
+        result_origins[-1] = np.vstack([result_origins[-1]] + carried)
+    return result, result_origins
+
+def _imply_on_curves(start, segments, origins, tolerance):
+    """光滑连接两段曲线的落点若离两侧控制点的中点不超过 tolerance，则把后一段的首个控制点改为
+    前一个控制点关于落点的镜像，使落点恰为中点，可在 glyf 中省略（见 TTGlyphPen.glyph 的 dropImpliedOnCurves）
+
+    改动后该段与原轮廓的偏差须不超过 tolerance（对齐网格后已超出时不得变大）。
+    坐标须已对齐整数网格。轮廓首尾相接处同样处理。
+    """
+    segments = list(segments)
+    joints = [(i, i + 1) for i in range(len(segments) - 1)]
+    if len(segments) > 1 and segments[-1][-1] == start:
+        joints.append((len(segments) - 1, 0))
+    for before, after in joints:
+        previous, current = segments[before], segments[after]
+        if previous[0] != OP_CUBIC or current[0] != OP_CUBIC:
+            continue
+        c2, point, c1 = previous[2], previous[3], current[1]
+        mirrored = (2 * point[0] - c2[0], 2 * point[1] - c2[1])
+        middle = ((c2[0] + c1[0]) / 2, (c2[1] + c1[1]) / 2)
+        if mirrored == c1 or np.hypot(point[0] - middle[0], point[1] - middle[1]) > tolerance:
+            continue
+        before_error = _deviation(origins[after], _cubic_points(point, *current[1:], _DENSE_BERNSTEIN))
+        after_error = _deviation(origins[after], _cubic_points(point, mirrored, *current[2:], _DENSE_BERNSTEIN))
+        if after_error <= max(tolerance, before_error):
+            segments[after] = (OP_CUBIC, mirrored, current[2], current[3])
+    return segments
+
+def _split_contours(points, ops):
+    """把 (点, 操作码) 拆成 [(起点, [(操作码, 点...), ...]), ...]，二次曲线升阶为三次"""
+    contours = []
+    pts = [tuple(p) for p in points.tolist()]
+    i = 0
+    current = None
+    for op in ops.tolist():
+        if op == OP_MOVE:
+            current = (pts[i], [])
+            contours.append(current)
+            i += 1
+        elif current is None or op == OP_CLOSE:
+            continue
+        elif op == OP_LINE:
+            current[1].append((OP_LINE, pts[i]))
+            i += 1
+        elif op == OP_CUBIC:
+            current[1].append((OP_CUBIC, pts[i], pts[i + 1], pts[i + 2]))
+            i += 3
+        elif op == OP_QUAD:
+            previous = current[1][-1][-1] if current[1] else current[0]
+            q, end = np.array(pts[i]), np.array(pts[i + 1])
+            c1 = previous + 2.0 / 3.0 * (q - previous)
+            c2 = end + 2.0 / 3.0 * (q - end)
+            current[1].append((OP_CUBIC, tuple(c1), tuple(c2), pts[i + 1]))
+            i += 2
+    return contours
+
+def _snap(segment):
+    return (segment[0],) + tuple((float(round(x)), float(round(y))) for x, y in segment[1:])
+
+def simplify_outline(points, ops, tolerance):
+    """轮廓优化：合并光滑相接的曲线、平直曲线改直线、合并近共线直线、对齐整数网格、去除微小轮廓
+
+    points、ops 为 draw_outline 的输入（已变换到字体单位），tolerance 为允许的最大偏差（字体单位）。
+    各阶段都对照原轮廓检验偏差，误差不逐级累加；对齐整数网格另外最多引入约 0.71 的偏差。
+    返回同样格式的 (points, ops)。
+    """
+    out_points = []
+    out_ops = []
+    for start, segments in _split_contours(points, ops):
+        origins = _origins(start, segments)
+        segments, origins = _merge_cubics(start, segments, origins, tolerance)
+        segments = _flatten_curves(start, segments, origins, tolerance)
+        segments, origins = _merge_lines(start, segments, origins, tolerance)
+        # 对齐整数网格后去除退化的段
+        start = (float(round(start[0])), float(round(start[1])))
+        segments, origins = _drop_degenerate(start, [_snap(segment) for segment in segments], origins)
+        segments = _imply_on_curves(start, segments, origins, tolerance)
+        if not segments:
+            continue
+        contour = np.array([start] + [p for segment in segments for p in segment[1:]])
+        extent = contour.max(axis=0) - contour.min(axis=0)
+        if np.all(extent <= TINY_CONTOUR_FACTOR * tolerance):
+            continue
+        out_ops.append(OP_MOVE)
+        out_points.append(start)
+        for segment in segments:
+            out_ops.append(segment[0])
+            out_points.extend(segment[1:])
+        out_ops.append(OP_CLOSE)
+    return np.array(out_points, dtype=np.float64).reshape(-1, 2), np.array(out_ops, dtype=np.uint8)
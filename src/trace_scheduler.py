@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import os
+from bitmap import POTRACE_PATH, OPTTOLERANCE, ALPHAMAX, TRACE_TIMEOUT, array_to_pbm
+from preprocess import preprocess_image_otsu
+from generate_font import glyph_from_svg
+from instrument import timed
+
+log = logging.getLogger(__name__)
+
+# 失败或超时后依次尝试的参数：第一组与 bitmap_array_to_svg 相同（--turdsize 2 为 potrace 默认值），
+# 之后加大 turdsize 去除噪点、放宽 opttolerance 以减少曲线优化的计算量
+RETRY_PARAMS = [
+    {'turdsize': 2, 'opttolerance': OPTTOLERANCE, 'alphamax': ALPHAMAX},
+    {'turdsize': 10, 'opttolerance': 1.0, 'alphamax': ALPHAMAX},
+    {'turdsize': 50, 'opttolerance': 2.0, 'alphamax': 1.0},
+]
+
+class TraceError(Exception):
+    """potrace 返回非零状态"""
+
+async def potrace_async(img_np, params, timeout=TRACE_TIMEOUT):
+    """异步调用 potrace，超时则结束进程并抛出 asyncio.TimeoutError"""
+    process = await asyncio.create_subprocess_exec(
+        POTRACE_PATH, '-s', '-o', '-', '--turdsize', str(params['turdsize']),
+        '--opttolerance', str(params['opttolerance']), '--alphamax', str(params['alphamax']),
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(array_to_pbm(img_np)), timeout)
+    except asyncio.TimeoutError:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            # 进程恰好已退出
+            pass
+        await process.wait()
+        raise
+    if process.returncode != 0:
+        raise TraceError(f"potrace exited with status {process.returncode}: {stderr.decode('utf-8', 'replace').strip()}")
+    return stdout.decode('utf-8')
+
+class TraceScheduler:
+    """基于 asyncio 的描摹调度器
+
+    多个生产者并行预处理图像（有进程池时在进程池中，否则在事件循环的线程池中），
+    经容量为 queue_size 的队列交给 concurrency 个描摹协程；生产者不超过 queue_size 个，
+    内存中同时存在的二值化图像不超过 2 * queue_size + concurrency 张。
+    每次描摹有超时；失败或超时后按 RETRY_PARAMS 调整参数重试。
+    """
+
+    def __init__(self, concurrency=None, queue_size=None, timeout=TRACE_TIMEOUT):
+        self.concurrency = concurrency or os.cpu_count()
+        self.queue_size = queue_size or 2 * self.concurrency
+        self.timeout = timeout
+        self.retries = 0
+        self.failures = 0
+
+    async def _trace(self, image_filename, img_np):
+        """按 RETRY_PARAMS 依次尝试，返回 (SVG 文本, 尝试次数)；全部失败时抛出最后一次的异常"""
+        for attempt, params in enumerate(RETRY_PARAMS, 1):
+            try:
+                return await potrace_async(img_np, params, self.timeout), attempt
+            except (asyncio.TimeoutError, TraceError) as e:
+                reason = f"timed out after {self.timeout}s" if isinstance(e, asyncio.TimeoutError) else str(e)
+                if attempt < len(RETRY_PARAMS):
+                    self.retries += 1
+                    log.warning(f"Tracing {image_filename} {reason}, retrying with {RETRY_PARAMS[attempt]}")
+                else:
+                    raise
+
+    async def _run(self, input_dir, image_filenames, debug, records, executor=None, workers=None):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        results = [None] * len(image_filenames)
+        # 各生产者从同一个迭代器依次取图像；结果按序号存放，输出顺序与生产者数无关
+        pending = iter(enumerate(image_filenames))
+
+        async def produce():
+            for index, image_filename in pending:
+                base_name = os.path.splitext(image_filename)[0]
+                processed_image_path = None
+                if debug:
+                    processed_image_path = os.path.join(input_dir, 'processed', f'{base_name}_processed.png')
+                with timed(records[index], base_name, 'preprocess') as record:
+                    img_np = await loop.run_in_executor(
+                        executor, preprocess_image_otsu, os.path.join(input_dir, image_filename), processed_image_path)
+                    record['bytes'] = img_np.nbytes
+                # 队列满时在此等待，形成背压
+                await queue.put((index, img_np))
+
+        async def produce_all():
+            producers = workers if executor is not None and workers else self.concurrency
+            producers = min(producers, self.queue_size, max(len(image_filenames), 1))
+            await asyncio.gather(*(produce() for _ in range(producers)))
+            for _ in range(self.concurrency):
+                await queue.put(None)
+
+        async def consume():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                index, img_np = item
+                image_filename = image_filenames[index]
+                base_name = os.path.splitext(image_filename)[0]
+                with timed(records[index], base_name, 'trace') as record:
+                    try:
+                        svg_content, attempts = await self._trace(image_filename, img_np)
+                        record['attempts'] = attempts
+                        record['bytes'] = len(svg_content)
+                        results[index] = (svg_content, attempts)
+                    except (asyncio.TimeoutError, TraceError) as e:
+                        self.failures += 1
+                        log.warning(f"Failed to trace {image_filename}: {str(e) or 'timed out'}")
+                        results[index] = (None, len(RETRY_PARAMS))
+
+        await asyncio.gather(produce_all(), *(consume() for _ in range(self.concurrency)))
+        return results
+
+    def process(self, input_dir, image_filenames, svg_contents, debug=False, instrument=False, executor=None,
+                workers=None):
+        """处理一组字形，返回与 main.process_glyph 相同的 (SVG 文本, 条目, 阶段记录) 列表
+
+        给定 executor（进程池）时预处理在其中进行，workers 个图像同时预处理；
+        否则在事件循环的线程池中进行，同时预处理的图像数与描摹并发数相同。
+
+        svg_contents 中非 None 的项（缓存命中）不再描摹。经重试得到的 SVG 参数与缓存键不符，
+        返回的 SVG 文本为 None，使其不写入缓存，下次构建会重新尝试。
+        """
+        records = [[] if instrument else None for _ in image_filenames]
+        to_trace = [index for index, svg in enumerate(svg_contents) if svg is None]
+        traced = asyncio.run(self._run(input_dir, [image_filenames[i] for i in to_trace], debug,
+                                       [records[i] for i in to_trace], executor, workers))
+        svgs = list(svg_contents)
+        traced_indices = set(to_trace)
+        degraded = set()
+        for index, (svg_content, attempts) in zip(to_trace, traced):
+            svgs[index] = svg_content
+            if attempts > 1:
+                degraded.add(index)
+
+        outputs = []
+        for index, (image_filename, svg_content) in enumerate(zip(image_filenames, svgs)):
+            base_name = os.path.splitext(image_filename)[0]
+            if svg_content is None:
+                outputs.append((None, None, records[index]))
+                continue
+            if debug and index in traced_indices:
+                with open(os.path.join(input_dir, 'char_svg', f'{base_name}.svg'), 'w', encoding='utf-8') as f:
+                    f.write(svg_content)
+            entry = glyph_from_svg(svg_content, base_name, records=records[index])
+            outputs.append((None if index in degraded else svg_content, entry, records[index]))
+        return outputs
+
+    def stats_line(self):
+        return f"Trace scheduler: {self.retries} retries, {self.failures} failures"
@@ -0,0 +1,114 @@
+import numpy as np
+from bitmap import bitmap_array_to_svg, bitmap_arrays_to_svg, OPTTOLERANCE, ALPHAMAX
+
+# 面积不超过该值（像素）的轮廓视为噪点，与 potrace 默认的 --turdsize 2 一致
+TURDSIZE = 2
+# 轮廓点位于像素中心，多边形逼近时在 opttolerance 之外额外允许的量化误差（像素）
+PIXEL_QUANTIZATION = 0.5
+
+def _offset_polygon(poly, distance):
+    """沿各顶点的角平分线方向把多边形向墨迹外侧平移 distance 像素（斜接，尖角处限长）"""
+    edges = np.roll(poly, -1, axis=0) - poly
+    lengths = np.hypot(edges[:, 0], edges[:, 1])
+    normals = np.stack([-edges[:, 1], edges[:, 0]], axis=1) / np.where(lengths > 0, lengths, 1.0)[:, None]
+    prev_normals = np.roll(normals, 1, axis=0)
+    miter = normals + prev_normals
+    cos_half = np.hypot(miter[:, 0], miter[:, 1]) / 2.0
+    miter /= np.where(cos_half > 0, 2.0 * cos_half, 1.0)[:, None]
+    return poly + miter * (distance / np.maximum(cos_half, 0.5))[:, None]
+
+def _polygon_commands(poly, alphamax):
+    """potrace 式的多边形平滑，一次性向量化计算一条闭合多边形的全部曲线段
+
+    每个顶点对应一段，起止于相邻两条边的中点、以顶点为控制方向。
+    顶点的 alpha（与 potrace 相同的定义）不小于 alphamax 时视为角点，输出两条直线。
+    """
+    prev = np.roll(poly, 1, axis=0)
+    nxt = np.roll(poly, -1, axis=0)
+    end = (poly + nxt) / 2.0
+    chord = nxt - prev
+    # potrace 的 ddenom 即弦的 L1 长度，dpara 为叉积
+    denom = np.abs(chord).sum(axis=1)
+    cross = (poly - prev)[:, 0] * chord[:, 1] - (poly - prev)[:, 1] * chord[:, 0]
+    dd = np.abs(cross) / np.where(denom > 0, denom, 1.0)
+    alpha = np.where(dd > 1.0, (1.0 - 1.0 / np.maximum(dd, 1.0)) / 0.75, 0.0)
+    alpha = np.where(denom > 0, alpha, 4.0 / 3.0)
+    corner = alpha >= alphamax
+    ratio = (0.5 + 0.5 * np.clip(alpha, 0.55, 1.0))[:, None]
+    c1 = prev + ratio * (poly - prev)
+    c2 = nxt + ratio * (poly - nxt)
+
+    commands = [('M', end[-1].tolist())]
+    for is_corner, vertex, a, b, p in zip(corner.tolist(), poly.tolist(), c1.tolist(), c2.tolist(), end.tolist()):
+        if is_corner:
+            commands.append(('L', vertex))
+            commands.append(('L', p))
+        else:
+            commands.append(('C', a + b + p))
+    commands.append(('Z', []))
+    return commands
+
+def trace_contours(img_np, opttolerance=OPTTOLERANCE, alphamax=ALPHAMAX):
+    """纯 NumPy/OpenCV 描摹：提取轮廓（含孔洞），逼近为多边形后平滑为三次贝塞尔曲线
+
+    opttolerance 为多边形允许偏离轮廓的距离（像素），alphamax 为角点阈值，语义与 potrace 相同。
+    返回与 convert_svg.iter_commands 相同格式的绝对坐标命令列表，
+    坐标为图像像素坐标（y 轴向下），外轮廓与孔洞的方向与 potrace 输出一致。
+    """
+    import cv2
+    mask = (img_np < 128).astype(np.uint8)
+    contours, hierarchy = cv2.findContours(mask, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_NONE)
+    commands = []
+    for contour, (_, _, _, parent) in zip(contours, hierarchy[0] if hierarchy is not None else []):
+        if len(contour) < 3 or cv2.contourArea(contour) <= TURDSIZE:
+            continue
+        poly = cv2.approxPolyDP(contour, opttolerance + PIXEL_QUANTIZATION, True)
+        if len(poly) < 3:
+            continue
+        # 像素中心坐标
+        poly = poly[:, 0, :].astype(np.float64) + 0.5
+        x, y = poly[:, 0], poly[:, 1]
+        area = 0.5 * np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y)
+        # 外轮廓面积为负、孔洞为正（图像坐标系）
+        is_hole = parent != -1
+        if (area > 0) != is_hole:
+            poly = poly[::-1]
+        # 轮廓经过边界像素的中心，向外平移半个像素以贴合像素边缘
+        poly = _offset_polygon(poly, PIXEL_QUANTIZATION)
+        commands.extend(_polygon_commands(poly, alphamax))
+    return commands
+
+def commands_to_svg(commands, width, height):
+    """把绝对坐标命令包装为最小 SVG 文档，便于复用后续的 SVG → 字形流程"""
+    d = []
+    for cmd, params in commands:
+        d.append(cmd)
+        d.extend(f'{v:.2f}' for v in params)
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+            f'viewBox="0 0 {width} {height}"><path d="{" ".join(d)}"/></svg>')
+
+def opencv_trace_to_svg(img_np, svg_path=None):
+    """OpenCV 描摹后端，接口与 bitmap_array_to_svg 相同"""
+    height, width = img_np.shape
+    svg_content = commands_to_svg(trace_contours(img_np), width, height)
+    if svg_path:
+        with open(svg_path, 'w', encoding='utf-8') as f:
+            f.write(svg_content)
+    return svg_content
+
+# 可选的描摹后端：输入二值化数组（及调试用的 SVG 路径），返回 SVG 文本
+TRACERS = {
+    'potrace': bitmap_array_to_svg,
+    'opencv': opencv_trace_to_svg,
+}
+
+# 各后端的实现版本，写入描摹缓存键；tracer.py 或 bitmap.py 中会改变 SVG 输出的改动需递增对应版本以使旧缓存失效
+TRACER_VERSIONS = {
+    'potrace': 1,
+    'opencv': 1,
+}
+
+# 支持一次处理多张位图的后端：输入数组列表（及调试用的 SVG 路径列表），返回 (SVG 文本列表, {序号: 错误信息})
+BATCH_TRACERS = {
+    'potrace': bitmap_arrays_to_svg,
+}
@@ -0,0 +1,192 @@
+import argparse
+import logging
+import os
+import time
+from fontTools.ttLib.tables._g_l_y_f import Glyph
+from main import list_images, iter_glyph_entries, init_worker
+from tracer import TRACERS
+from generate_font import new_font_builder, notdef_glyph, setup_metrics, outline_format_for
+from glyph_store import update_derived_tables
+from cache import GlyphCache
+from webfont import font_flavor
+
+log = logging.getLogger(__name__)
+
+# 轮询输入目录的间隔（秒）
+POLL_INTERVAL = 0.2
+
+class FontSession:
+    """常驻内存的 TrueType 字体，按图像文件增量替换字形后原子地写出
+
+    每个字形只在其图像变化时重新处理，并立即编译为 glyf 字节、以未展开的 Glyph 保存；
+    保存时 glyf 直接拼接这些字节，head/maxp/hhea 由记录的边界框与点数算出
+    （见 glyph_store.update_derived_tables），不再逐个重新编译全部字形。
+    写出的字体与对同一目录完整构建的结果相同。
+    """
+
+    def __init__(self, output_font_path):
+        self.output_font_path = output_font_path
+        self.flavor = font_flavor(output_font_path)
+        # 图像文件名 → (字形名, 字符编码, 未展开的字形, (xMin, yMin, xMax, yMax, 点数, 轮廓数))
+        self.entries = {}
+        self.notdef = self._compact(notdef_glyph())
+        self.fb = new_font_builder(output_font_path)
+        self.fb.font.recalcBBoxes = False
+
+    @staticmethod
+    def _compact(glyph):
+        """编译字形，返回 (只含字节的 Glyph, 度量)"""
+        data = glyph.compile(None)
+        if glyph.numberOfContours:
+            metrics = (glyph.xMin, glyph.yMin, glyph.xMax, glyph.yMax,
+                       len(glyph.coordinates), len(glyph.endPtsOfContours))
+        else:
+            metrics = (0, 0, 0, 0, 0, 0)
+        return Glyph(data), metrics
+
+    def update(self, image_filename, entry):
+        """替换一个图像对应的字形；entry 为 None（处理失败）时移除"""
+        if entry is None:
+            self.remove(image_filename)
+            return
+        glyph_name, char_code, glyph = entry
+        self.entries[image_filename] = (glyph_name, char_code) + self._compact(glyph)
+
+    def remove(self, image_filename):
+        self.entries.pop(image_filename, None)
+
+    def save(self):
+        """按文件名顺序组装 glyf、hmtx、cmap 并原子地写出
+
+        与 generate_font.assemble_font 相同，重复的字形名只保留文件名在前的一个；
+        该文件被删除后，下一次保存自动改用其余文件中的同名字形。
+        """
+        font = self.fb.font
+        glyph_order = ['.notdef']
+        glyphs = {'.notdef': self.notdef[0]}
+        char_map = {}
+        bounds, num_points, num_contours = list(self.notdef[1][:4]), [self.notdef[1][4]], [self.notdef[1][5]]
+        for image_filename in sorted(self.entries):
+            glyph_name, char_code, glyph, metrics = self.entries[image_filename]
+            if glyph_name in glyphs:
+                log.warning(f"Skipping duplicate glyph {glyph_name} from {image_filename}: keeping the first one")
+                continue
+            glyph_order.append(glyph_name)
+            glyphs[glyph_name] = glyph
+            char_map[char_code] = glyph_name
+            bounds.extend(metrics[:4])
+            num_points.append(metrics[4])
+            num_contours.append(metrics[5])
+
+        # 与 build_font 相同的设置顺序；字形已编译，不再计算边界框
+        self.fb.setupGlyphOrder(glyph_order)
+        self.fb.setupCharacterMap(char_map)
+        self.fb.setupGlyf(glyphs, calcGlyphBounds=False)
+        setup_metrics(self.fb, glyph_order)
+        update_derived_tables(font, glyph_order, bounds, num_points, num_contours)
+
+        font.flavor = self.flavor
+        tmp_path = self.output_font_path + '.tmp'
+        font.save(tmp_path)
+        os.replace(tmp_path, self.output_font_path)
+        return len(glyph_order) - 1
+
+def snapshot(input_dir):
+    """输入目录中各 PNG 的 (修改时间, 大小)"""
+    states = {}
+    for image_filename in list_images(input_dir):
+        try:
+            stat = os.stat(os.path.join(input_dir, image_filename))
+        except FileNotFoundError:
+            continue
+        states[image_filename] = (stat.st_mtime_ns, stat.st_size)
+    return states
+
+def process_images(input_dir, image_filenames, cache=None, tracer='potrace'):
+    """逐个处理图像，返回 {文件名: (字形名, 字符编码, 字形) 或 None}
+
+    无法读取或处理的图像记录警告后对应 None（字形被移除），不中断监视；该文件下次变化时重试。
+    """
+    entries = {}
+    for image_filename in image_filenames:
+        try:
+            entries[image_filename] = next(iter_glyph_entries(input_dir, [image_filename], cache=cache, tracer=tracer),
+                                           None)
+        except Exception as e:
+            log.warning(f"Failed to process {image_filename}: {e}")
+            entries[image_filename] = None
+    return entries
+
+def watch(input_dir, output_font_path, cache=None, tracer='potrace', interval=POLL_INTERVAL):
+    """完整构建一次，之后轮询输入目录，只重新处理新增或修改的 PNG，并移除已删除的字形
+
+    文件的修改时间与大小在相邻两次轮询中不变时才视为写入完成。
+    """
+    session = FontSession(output_font_path)
+    start = time.perf_counter()
+    states = snapshot(input_dir)
+    for image_filename, entry in process_images(input_dir, list(states), cache, tracer).items():
+        session.update(image_filename, entry)
+    count = session.save()
+    if cache is not None:
+        cache.save()
+    print(f"Built {output_font_path}: {count} glyphs in {time.perf_counter() - start:.2f}s, watching {input_dir}")
+
+    previous = states
+    try:
+        while True:
+            time.sleep(interval)
+            current = snapshot(input_dir)
+            removed = [image_filename for image_filename in states if image_filename not in current]
+            # 只处理与上一次轮询相比不再变化的文件，避免读到写了一半的图像
+            ready = [image_filename for image_filename, state in current.items()
+                     if state != states.get(image_filename) and state == previous.get(image_filename)]
+            previous = current
+            if not removed and not ready:
+                continue
+
+            start = time.perf_counter()
+            for image_filename in removed:
+                session.remove(image_filename)
+                del states[image_filename]
+                log.info(f"Removed {image_filename}")
+            for image_filename, entry in process_images(input_dir, ready, cache, tracer).items():
+                session.update(image_filename, entry)
+                states[image_filename] = current[image_filename]
+                log.info(f"Updated {image_filename}")
+            count = session.save()
+            if cache is not None:
+                cache.save()
+            print(f"Updated {output_font_path}: {len(ready)} changed, {len(removed)} removed, {count} glyphs "
+                  f"in {time.perf_counter() - start:.3f}s")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if cache is not None:
+            cache.save()
+            print(cache.stats_line())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the font incrementally whenever glyph images change.")
+    parser.add_argument('input_dir', type=str, help='Directory containing the glyph images')
+    parser.add_argument('output_font_path', type=str, help='Output path for the generated font file')
+    parser.add_argument('--tracer', choices=sorted(TRACERS), default='potrace', help='Bitmap tracing backend')
+    parser.add_argument('--cache', type=str, default=None, help='Directory of the incremental build cache')
+    parser.add_argument('--cache-size', type=int, default=512, help='Build cache size limit in MB')
+    parser.add_argument('--simplify', type=float, default=0.0,
+                        help='Outline simplification tolerance in font units (0 = off)')
+    parser.add_argument('--normalize', type=int, default=0,
+                        help='Crop each image to its ink box and scale that box to N pixels before tracing (0 = off)')
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL, help='Polling interval in seconds')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Log every updated glyph')
+    args = parser.parse_args()
+    if outline_format_for(args.output_font_path) != 'truetype':
+        parser.error('watch mode writes TrueType outlines; use a .ttf, .woff or .woff2 output path')
+    try:
+        font_flavor(args.output_font_path)
+    except ImportError as e:
+        parser.error(str(e))
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format='%(message)s')
+    init_worker(args.simplify, args.normalize)
+    cache = GlyphCache(args.cache, args.cache_size * 1024 * 1024) if args.cache else None
+    watch(args.input_dir, args.output_font_path, cache, args.tracer, args.interval)
@@ -0,0 +1,166 @@
+import argparse
+import copy
+import hashlib
+import io
+import os
+from collections import OrderedDict
+from fontTools.ttLib import TTFont
+
+# 输出文件扩展名对应的 WOFF 封装格式，其余扩展名输出未压缩的 TTF
+FLAVORS = {'.woff': 'woff', '.woff2': 'woff2'}
+# 子集缓存的默认容量上限（字节）
+SUBSET_CACHE_BYTES = 64 * 1024 * 1024
+
+def check_flavor(flavor):
+    """WOFF2 需要可选依赖 brotli，缺少时抛出 ImportError"""
+    if flavor == 'woff2':
+        try:
+            import brotli  # noqa: F401
+        except ImportError:
+            raise ImportError("WOFF2 output requires the brotli package (pip install brotli)") from None
+
+def font_flavor(output_font_path):
+    """由输出路径的扩展名决定封装格式，返回 'woff'、'woff2' 或 None"""
+    flavor = FLAVORS.get(os.path.splitext(output_font_path)[1].lower())
+    check_flavor(flavor)
+    return flavor
+
+def compress_font(sfnt_path, output_font_path, flavor):
+    """把已写好的 TTF 重新封装为 WOFF/WOFF2，各表按原始字节复制，不做解析"""
+    font = TTFont(sfnt_path, recalcBBoxes=False, recalcTimestamp=False)
+    font.flavor = flavor
+    font.save(output_font_path, reorderTables=False)
+    font.close()
+
+def _fork(master):
+    """为一次子集化复制母字体：各表浅复制，子集化会整体替换的容器另行复制，字形对象与母字体共享
+
+    子集化对共享字形只会调用 trim()（去掉 data 末尾的填充），不影响母字体再次子集化的结果。
+    保存前须用 _unshare_glyphs 复制保留下来的字形：重新计算边界框时会就地展开字形。
+    """
+    # 与 fontTools.subset 一样在保存时重新计算 head/hhea/maxp 与 CFF FontBBox
+    font = TTFont(recalcTimestamp=False)
+    font.sfntVersion = master.sfntVersion
+    font.setGlyphOrder(list(master.getGlyphOrder()))
+    for tag in master.keys():
+        if tag == 'GlyphOrder':
+            continue
+        table = copy.copy(master[tag])
+        if tag == 'glyf':
+            table.glyphs = dict(table.glyphs)
+            table.glyphOrder = list(table.glyphOrder)
+        elif tag in ('hmtx', 'vmtx'):
+            table.metrics = dict(table.metrics)
+        elif tag == 'cmap':
+            table.tables = [copy.copy(subtable) for subtable in table.tables]
+            for subtable in table.tables:
+                subtable.cmap = dict(subtable.cmap)
+        elif tag == 'name':
+            table.names = list(table.names)
+        elif tag == 'post':
+            for attr in ('extraNames', 'mapping'):
+                if hasattr(table, attr):
+                    setattr(table, attr, copy.copy(getattr(table, attr)))
+        elif tag not in ('head', 'hhea', 'maxp', 'OS/2', 'loca'):
+            # 其他表（例如外部字体的 GSUB）子集化时会就地修改，整表深复制
+            table = copy.deepcopy(table)
+        font[tag] = table
+    return font
+
+def _unshare_glyphs(font):
+    """子集中保留的字形浅复制一份，保存时展开的是副本，母字体中的字形保持字节形式"""
+    if 'glyf' in font:
+        glyphs = font['glyf'].glyphs
+        for name, glyph in glyphs.items():
+            glyphs[name] = copy.copy(glyph)
+
+class SubsetCache:
+    """常驻内存的母字体，按需为一段文本或一组码位生成子集字体
+
+    母字体只解析一次；子集按 (字体中存在的码位集合, 封装格式) 的哈希缓存，
+    按总字节数上限做 LRU 淘汰，常见页面的重复请求不再子集化与压缩。
+    """
+
+    def __init__(self, font_path, flavor='woff2', max_bytes=SUBSET_CACHE_BYTES):
+        check_flavor(flavor)
+        self.flavor = flavor
+        self.max_bytes = max_bytes
+        self.master = TTFont(font_path, recalcBBoxes=False, recalcTimestamp=False)
+        # 预先解析各表；glyf 中的字形保持未展开的字节形式，子集化时直接复制
+        for tag in self.master.keys():
+            self.master[tag]
+        self.codepoints = frozenset(self.master.getBestCmap())
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _codepoints(self, text=None, codepoints=None):
+        """请求的码位中字体实际包含的部分，排序后返回"""
+        requested = set(codepoints or ())
+        if text:
+            requested.update(map(ord, text))
+        return sorted(requested & self.codepoints)
+
+    def key(self, text=None, codepoints=None):
+        """子集的缓存键；只含字体中没有的字符的请求与空请求得到同一个键"""
+        digest = hashlib.sha256(','.join(map(str, self._codepoints(text, codepoints))).encode('ascii'))
+        digest.update(str(self.flavor).encode('ascii'))
+        return digest.hexdigest()
+
+    def subset(self, text=None, codepoints=None):
+        """返回包含 text 中字符与 codepoints 的子集字体字节"""
+        unicodes = self._codepoints(text, codepoints)
+        key = self.key(codepoints=unicodes)
+        data = self.entries.get(key)
+        if data is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return data
+        self.misses += 1
+
+        # 子集化模块导入较慢，构建字体时用不到
+        from fontTools import subset
+        font = _fork(self.master)
+        options = subset.Options()
+        options.flavor = self.flavor
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(unicodes=unicodes)
+        subsetter.subset(font)
+        _unshare_glyphs(font)
+        out = io.BytesIO()
+        font.flavor = self.flavor
+        font.save(out)
+        data = out.getvalue()
+
+        self.entries[key] = data
+        self.total_bytes += len(data)
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            _, old = self.entries.popitem(last=False)
+            self.total_bytes -= len(old)
+        return data
+
+    def stats_line(self):
+        return (f"Subset cache: {self.hits} hits, {self.misses} misses, "
+                f"{len(self.entries)} entries, {self.total_bytes / (1024 * 1024):.1f} MB")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Subset a generated font for one page of text.")
+    parser.add_argument('font_path', type=str, help='Master font built by main.py')
+    parser.add_argument('output_path', type=str, help='Output subset font (.woff2, .woff or .ttf)')
+    parser.add_argument('--text', type=str, default='', help='Characters to keep')
+    parser.add_argument('--text-file', type=str, default=None, help='UTF-8 file whose characters are kept')
+    args = parser.parse_args()
+
+    text = args.text
+    if args.text_file:
+        with open(args.text_file, 'r', encoding='utf-8') as f:
+            text += f.read()
+    try:
+        flavor = font_flavor(args.output_path)
+    except ImportError as e:
+        parser.error(str(e))
+    data = SubsetCache(args.font_path, flavor).subset(text)
+    with open(args.output_path, 'wb') as f:
+        f.write(data)
+    print(f"Subset written to {args.output_path}: {len(data)} bytes")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# src 下的模块以顶层名称相互导入，与 python ./src/main.py 的运行方式一致
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
@@ -0,0 +1,28 @@
+from pytest import approx
+
+from convert_svg import compile_path, iter_commands
+
+def commands(d):
+    return list(iter_commands(*compile_path(d)))
+
+def test_smooth_cubic_after_arc_starts_at_current_point():
+    # 上一条命令不是 C/S 时，S 的第一控制点为当前点
+    letter, params = commands('M0 0 A10 10 0 0 1 20 0 S30 10 40 0')[-1]
+    assert letter == 'C'
+    assert params == approx([20, 0, 30, 10, 40, 0])
+
+def test_smooth_cubic_reflects_previous_control_point():
+    letter, params = commands('M0 0 C0 10 10 10 10 0 S20 -10 20 0')[-1]
+    assert letter == 'C'
+    assert params == approx([10, -10, 20, -10, 20, 0])
+
+def test_smooth_quadratic_after_quadratic_and_line():
+    assert commands('M0 0 Q5 10 10 0 T20 0') == [('M', [0, 0]), ('Q', [5, 10, 10, 0]), ('Q', [15, -10, 20, 0])]
+    assert commands('M0 0 L10 0 T20 0')[-1] == ('Q', [10, 0, 20, 0])
+
+def test_implicit_lineto_after_moveto():
+    assert commands('M1 2 3 4 5 6') == [('M', [1, 2]), ('L', [3, 4]), ('L', [5, 6])]
+    assert commands('m1 2 3 4 z') == [('M', [1, 2]), ('L', [4, 6]), ('Z', [])]
+
+def test_arc_flags_are_single_digits():
+    assert commands('M0 0 a10 10 0 0120 0') == commands('M0 0 a10 10 0 0 1 20 0')
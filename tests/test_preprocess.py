@@ -0,0 +1,52 @@
+import glob
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import preprocess
+from preprocess import preprocess_image_otsu, preprocess_images_otsu
+
+SAMPLE_IMAGES = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'images', '*', '*.png')))
+
+@pytest.fixture(params=[0, 64], ids=['plain', 'normalize'])
+def normalize(request, monkeypatch):
+    monkeypatch.setattr(preprocess, 'NORMALIZE_SIZE', request.param)
+    return request.param
+
+@pytest.fixture(scope='module')
+def odd_images(tmp_path_factory):
+    """奇数与不对称尺寸的合成字形，含同尺寸的多张图像（同一堆栈）以及灰度、RGB 与纯色图像"""
+    directory = tmp_path_factory.mktemp('odd')
+    rng = np.random.default_rng(0)
+    paths = []
+    for index, (height, width) in enumerate([(37, 53), (101, 99), (37, 53), (1, 1), (3, 7), (64, 255), (101, 99)]):
+        img = np.full((height, width), 230, dtype=np.uint8)
+        img[height // 4:height - height // 4, width // 3:width - width // 3] = 20
+        img = np.clip(img + rng.integers(-25, 25, img.shape), 0, 255).astype(np.uint8)
+        if index == 3:
+            img[:] = 128
+        image = Image.fromarray(img)
+        if index % 2:
+            image = image.convert('RGB')
+        path = str(directory / f'{index}.png')
+        image.save(path)
+        paths.append(path)
+    return paths
+
+def assert_batch_matches_single(paths):
+    batch = preprocess_images_otsu(paths)
+    assert len(batch) == len(paths)
+    for path, img_np in zip(paths, batch):
+        np.testing.assert_array_equal(img_np, preprocess_image_otsu(path), err_msg=path)
+
+def test_sample_images(normalize):
+    assert SAMPLE_IMAGES
+    assert_batch_matches_single(SAMPLE_IMAGES)
+
+def test_odd_sizes(normalize, odd_images):
+    assert_batch_matches_single(odd_images)
+
+def test_empty_batch(normalize):
+    assert preprocess_images_otsu([]) == []
@@ -0,0 +1,17 @@
+import base64
+import json
+
+import pytest
+
+from server import parse_job
+
+PNG = base64.b64encode(b'\x89PNG\r\n\x1a\n').decode('ascii')
+
+def test_parse_job_collects_glyphs_by_character():
+    job = parse_job(json.dumps({'glyphs': {'A': PNG, 'U+0042': PNG}, 'format': 'ttf'}).encode('utf-8'))
+    assert sorted(job.glyphs) == ['A', 'B']
+
+def test_parse_job_rejects_keys_naming_the_same_character():
+    body = json.dumps({'glyphs': {'A': PNG, 'U+0041': PNG}}).encode('utf-8')
+    with pytest.raises(ValueError, match='U\\+0041'):
+        parse_job(body)
@@ -0,0 +1,46 @@
+import io
+import os
+
+import pytest
+from fontTools import subset
+from fontTools.ttLib import TTFont
+
+from generate_font import build_font, glyph_name_for
+from webfont import SubsetCache
+
+SAMPLE_FONT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'fonts', 'test1-number.ttf')
+
+@pytest.fixture(scope='module', params=['ttf', 'otf'])
+def master_path(request, tmp_path_factory):
+    """由示例字体的数字字形构建母字体，otf 为 CFF 轮廓"""
+    sample = TTFont(SAMPLE_FONT)
+    glyf = sample['glyf']
+    entries = [(glyph_name_for(chr(code), code), code, glyf[name]) for code, name in sorted(sample.getBestCmap().items())]
+    path = str(tmp_path_factory.mktemp('master') / f'master.{request.param}')
+    assert build_font(entries, path)
+    return path
+
+def fresh_subset(path, text, flavor):
+    font = TTFont(path, recalcTimestamp=False)
+    options = subset.Options()
+    options.flavor = flavor
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(text=text)
+    subsetter.subset(font)
+    out = io.BytesIO()
+    font.flavor = flavor
+    font.save(out)
+    return out.getvalue()
+
+@pytest.mark.parametrize('flavor', [None, 'woff'])
+def test_cached_subset_matches_fresh_subset(master_path, flavor):
+    cache = SubsetCache(master_path, flavor)
+    for text in ['1', '0123', '9876543210', '', '1']:
+        assert cache.subset(text) == fresh_subset(master_path, text, flavor), text
+    assert cache.hits == 1
+
+def test_subset_recalculates_bounds(master_path):
+    font = TTFont(io.BytesIO(SubsetCache(master_path, None).subset('1')))
+    master = TTFont(master_path)
+    assert font.sfntVersion == master.sfntVersion
+    assert (font['head'].xMin, font['head'].yMax) != (master['head'].xMin, master['head'].yMax)